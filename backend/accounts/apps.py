@@ -1,7 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
-    
\ No newline at end of file
+
+    def ready(self):
+        from . import signals
+
+        post_migrate.connect(
+            signals.repair_search_index_after_migrate, sender=self, dispatch_uid='accounts:repair_search_index',
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounts.search import FTS_TABLE, fts5_enabled, rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Recompute user search documents and rebuild the directory search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users updated per query',
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_search_documents(batch_size=options['batch_size'])
+
+        if fts5_enabled():
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search index for {updated} users'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_options_user_age_user_allow_peer_matching_and_more'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-date_joined'], name='accounts_user_joined_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+from accounts.search import build_search_document, install_search_index, uninstall_search_index
+
+
+def backfill_search_documents(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    batch = []
+    for user in User.objects.iterator(chunk_size=1000):
+        user.search_document = build_search_document(user)
+        batch.append(user)
+        if len(batch) >= 1000:
+            User.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseU
 from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .permissions import Capability, capabilities_for
 
 class UserManager(BaseUserManager):
     def create_user(self, email, username, password=None, **extra_fields):
@@ -86,6 +87,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(default=timezone.now)
     last_active = models.DateTimeField(auto_now=True)
 
+    # Denormalized text used by the admin user directory search index
+    search_document = models.TextField(blank=True, default='', editable=False)
+
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
@@ -95,10 +99,22 @@ class User(AbstractBaseUser, PermissionsMixin):
         db_table = 'accounts_user'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            models.Index(fields=['-date_joined'], name='accounts_user_joined_idx'),
+        ]
 
     def __str__(self):
         return f"{self.email} ({self.get_role_display()})"
 
+    def save(self, *args, **kwargs):
+        from .search import SEARCH_FIELDS, build_search_document
+
+        self.search_document = build_search_document(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(SEARCH_FIELDS):
+            kwargs['update_fields'] = set(update_fields) | {'search_document'}
+        super().save(*args, **kwargs)
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
@@ -110,6 +126,15 @@ class User(AbstractBaseUser, PermissionsMixin):
             return f"Anonymous User {self.id}"
         return self.full_name or self.username
 
+    @property
+    def capabilities(self):
+        """Precompiled capability bitset for this user's role and staff flag"""
+        return capabilities_for(self.role, self.is_staff)
+
+    def has_capability(self, capability):
+        """Check a capability with a single bit test"""
+        return self.capabilities & capability == capability
+
     def is_guide(self):
         """Check if user is a guide/mentor"""
         return self.role == 'guide'
@@ -120,5 +145,5 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def can_moderate(self):
         """Check if user can moderate community content"""
-        return self.role in ['guide', 'admin'] or self.is_staff
+        return self.has_capability(Capability.MODERATE)
         
\ No newline at end of file
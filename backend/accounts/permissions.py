@@ -1,5 +1,119 @@
+"""
+Role-based access policies.
+
+Each role is compiled once into a :class:`Capability` bitset; ``is_staff``
+adds the staff capabilities on top. The authenticated user exposes its set
+as ``user.capabilities`` so a permission check is a single bit test, and
+views declare what they need with :func:`require` instead of comparing
+role strings.
+"""
+from enum import IntFlag, auto
+
 from rest_framework import permissions
 
+
+class Capability(IntFlag):
+    VIEW_UNPUBLISHED_CONTENT = auto()
+    CREATE_CONTENT = auto()
+    EDIT_ANY_CONTENT = auto()
+    DELETE_ANY_CONTENT = auto()
+    PUBLISH_CONTENT = auto()
+    MODERATE = auto()
+    VIEW_ALL_CRISIS_ALERTS = auto()
+    RESPOND_TO_CRISIS = auto()
+    VIEW_STATS = auto()
+    VIEW_ADMIN_STATS = auto()
+    MANAGE_PLATFORM = auto()
+    MANAGE_USERS = auto()
+    BROWSE_USERS = auto()
+    REQUEST_ASSESSMENTS = auto()
+    ASSIGN_ASSESSMENTS = auto()
+    REVIEW_ASSESSMENT_REQUESTS = auto()
+    GUIDE_WORKSPACE = auto()
+
+
+NO_CAPABILITIES = Capability(0)
+
+_STAFF_SHARED = (
+    Capability.VIEW_UNPUBLISHED_CONTENT |
+    Capability.CREATE_CONTENT |
+    Capability.EDIT_ANY_CONTENT |
+    Capability.MODERATE |
+    Capability.VIEW_ALL_CRISIS_ALERTS |
+    Capability.RESPOND_TO_CRISIS |
+    Capability.VIEW_STATS
+)
+
+ROLE_CAPABILITIES = {
+    'user': NO_CAPABILITIES,
+    'guide': (
+        _STAFF_SHARED |
+        Capability.BROWSE_USERS |
+        Capability.REQUEST_ASSESSMENTS |
+        Capability.ASSIGN_ASSESSMENTS |
+        Capability.GUIDE_WORKSPACE
+    ),
+    'admin': (
+        _STAFF_SHARED |
+        Capability.DELETE_ANY_CONTENT |
+        Capability.PUBLISH_CONTENT |
+        Capability.VIEW_ADMIN_STATS |
+        Capability.MANAGE_PLATFORM |
+        Capability.MANAGE_USERS |
+        Capability.REVIEW_ASSESSMENT_REQUESTS
+    ),
+}
+
+# Django staff flag grants user management and moderation whatever the role
+STAFF_CAPABILITIES = Capability.MANAGE_USERS | Capability.BROWSE_USERS | Capability.MODERATE
+
+_COMPILED = {
+    (role, is_staff): capabilities | (STAFF_CAPABILITIES if is_staff else NO_CAPABILITIES)
+    for role, capabilities in ROLE_CAPABILITIES.items()
+    for is_staff in (False, True)
+}
+
+
+def capabilities_for(role, is_staff=False):
+    """Return the precompiled capability set for a role"""
+    return _COMPILED.get(
+        (role, bool(is_staff)),
+        STAFF_CAPABILITIES if is_staff else NO_CAPABILITIES,
+    )
+
+
+def has_capability(user, capability):
+    """Bit test usable with anonymous users as well"""
+    if not (user and user.is_authenticated):
+        return False
+    return user.has_capability(capability)
+
+
+class CapabilityPermission(permissions.BasePermission):
+    """
+    Grant access to users holding ``capability``. ``methods`` limits the
+    check to the given HTTP methods; other methods are let through.
+    """
+    capability = NO_CAPABILITIES
+    methods = None
+
+    def has_permission(self, request, view):
+        if self.methods is not None and request.method not in self.methods:
+            return True
+        return has_capability(request.user, self.capability)
+
+
+def require(capability, message=None, methods=None):
+    """Build a permission class declaring the capability a view needs"""
+    attrs = {'capability': capability, 'methods': methods}
+    if message:
+        attrs['message'] = message
+    return type(f'Require{capability.name or "Capabilities"}', (CapabilityPermission,), attrs)
+
+
+IsPlatformAdmin = require(Capability.MANAGE_PLATFORM, "Admin access required")
+IsGuide = require(Capability.GUIDE_WORKSPACE, "Guide access required")
+
 class IsGuideOrAdmin(permissions.BasePermission):
     """
     Permission class that allows access only to guides and admins
@@ -8,7 +122,8 @@ class IsGuideOrAdmin(permissions.BasePermission):
         return (
             request.user and 
             request.user.is_authenticated and 
-            (request.user.is_guide() or request.user.is_staff or request.user.role == 'admin')
+            (request.user.is_guide() or request.user.is_staff or
+             has_capability(request.user, Capability.MANAGE_PLATFORM))
         )
 
 class IsStandardUser(permissions.BasePermission):
@@ -0,0 +1,219 @@
+"""
+Search index for the admin user directory.
+
+Every user row carries a lowercased ``search_document`` built from the
+searchable profile fields. On Postgres it is covered by a ``pg_trgm`` GIN
+index so substring lookups stay index scans; on SQLite it feeds an FTS5
+external-content table kept current by triggers.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ['email', 'username', 'first_name', 'last_name', 'role', 'specializations']
+
+FTS_TABLE = 'accounts_user_fts'
+FTS_TRIGGERS = ('accounts_user_fts_ai', 'accounts_user_fts_ad', 'accounts_user_fts_au')
+
+AGE_BANDS = {
+    '13-15': (13, 15),
+    '16-18': (16, 18),
+    '19-23': (19, 23),
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_search_document(user):
+    """Flatten the searchable fields of a user into one lowercased string"""
+    specializations = user.specializations or []
+    if not isinstance(specializations, (list, tuple)):
+        specializations = [specializations]
+    parts = [
+        user.email, user.username, user.first_name, user.last_name, user.role,
+        ' '.join(str(item) for item in specializations),
+    ]
+    return ' '.join(str(part) for part in parts if part).lower()
+
+
+def tokenize(term):
+    return _TOKEN_RE.findall((term or '').lower())
+
+
+def fts5_enabled(using=None):
+    conn = using or connection
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def search_users(queryset, term):
+    """
+    Filter ``queryset`` down to users matching every token of ``term``.
+
+    Each token is matched as a prefix (FTS5) or substring (trigram), which
+    also serves autocomplete as the admin types.
+    """
+    tokens = tokenize(term)
+    if not tokens:
+        return queryset
+
+    if fts5_enabled():
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+
+    for token in tokens:
+        queryset = queryset.filter(search_document__contains=token)
+    return queryset
+
+
+def filter_users(queryset, params):
+    """Apply the search term and the role/age/onboarding facet filters"""
+    queryset = search_users(queryset, params.get('search') or params.get('q'))
+
+    role = params.get('role')
+    if role:
+        queryset = queryset.filter(role=role)
+
+    age_band = params.get('age_band')
+    if age_band in AGE_BANDS:
+        low, high = AGE_BANDS[age_band]
+        queryset = queryset.filter(age__gte=low, age__lte=high)
+    elif age_band == 'unknown':
+        queryset = queryset.filter(age__isnull=True)
+
+    onboarding = params.get('onboarding_completed')
+    if onboarding is not None and onboarding != '':
+        queryset = queryset.filter(onboarding_completed=onboarding.lower() == 'true')
+
+    return queryset
+
+
+def user_facets(queryset):
+    """Facet counts for a filtered user queryset, computed in a single query"""
+    from .models import User
+
+    aggregates = {'total': Count('id')}
+    for value, _ in User.ROLE_CHOICES:
+        aggregates[f'role_{value}'] = Count('id', filter=Q(role=value))
+    for band, (low, high) in AGE_BANDS.items():
+        aggregates[f'age_{band}'] = Count('id', filter=Q(age__gte=low, age__lte=high))
+    aggregates['age_unknown'] = Count('id', filter=Q(age__isnull=True))
+    aggregates['onboarding_true'] = Count('id', filter=Q(onboarding_completed=True))
+    aggregates['onboarding_false'] = Count('id', filter=Q(onboarding_completed=False))
+
+    counts = queryset.order_by().aggregate(**aggregates)
+    return {
+        'total': counts['total'],
+        'role': {value: counts[f'role_{value}'] for value, _ in User.ROLE_CHOICES},
+        'age_band': {
+            **{band: counts[f'age_{band}'] for band in AGE_BANDS},
+            'unknown': counts['age_unknown'],
+        },
+        'onboarding_completed': {
+            'true': counts['onboarding_true'],
+            'false': counts['onboarding_false'],
+        },
+    }
+
+
+def install_search_index(schema_editor):
+    """Create the vendor specific search index (used by migrations)"""
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS accounts_user_search_trgm '
+            'ON accounts_user USING gin (search_document gin_trgm_ops)'
+        )
+    elif conn.vendor == 'sqlite':
+        _install_fts5(schema_editor)
+
+
+def _install_fts5(schema_editor):
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"search_document, content='accounts_user', content_rowid='id', "
+        f"tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS accounts_user_fts_ai AFTER INSERT ON accounts_user BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS accounts_user_fts_ad AFTER DELETE ON accounts_user BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) "
+        f"VALUES ('delete', old.id, old.search_document); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS accounts_user_fts_au AFTER UPDATE OF search_document ON accounts_user BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) "
+        f"VALUES ('delete', old.id, old.search_document); "
+        f"INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def missing_triggers(using=None):
+    """Names of the FTS5 triggers absent from ``accounts_user``"""
+    conn = using or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", ['accounts_user']
+        )
+        present = {name for name, in cursor.fetchall()}
+    return [trigger for trigger in FTS_TRIGGERS if trigger not in present]
+
+
+def repair_search_index(using=None):
+    """
+    Reinstall missing FTS5 triggers and rebuild the index; returns whether
+    anything was repaired.
+
+    SQLite rebuilds ``accounts_user`` for most schema changes (e.g. any
+    ``AddField`` on ``User``) and drops its triggers with it, after which
+    new and edited users would silently go unindexed. ``post_migrate``
+    runs this after every ``migrate`` (see ``apps``).
+    """
+    conn = using or connection
+    if not fts5_enabled(conn) or not missing_triggers(conn):
+        return False
+    with conn.schema_editor() as schema_editor:
+        _install_fts5(schema_editor)
+    return True
+
+
+def uninstall_search_index(schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS accounts_user_search_trgm')
+    elif conn.vendor == 'sqlite':
+        for trigger in FTS_TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def rebuild_search_documents(batch_size=1000):
+    """Recompute ``search_document`` for every user, in batches"""
+    from .models import User
+
+    updated = 0
+    batch = []
+    for user in User.objects.only('id', *SEARCH_FIELDS).iterator(chunk_size=batch_size):
+        document = build_search_document(user)
+        user.search_document = document
+        batch.append(user)
+        if len(batch) >= batch_size:
+            updated += User.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        updated += User.objects.bulk_update(batch, ['search_document'])
+    return updated
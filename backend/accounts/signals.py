@@ -0,0 +1,19 @@
+"""
+Reinstall the user directory's FTS5 triggers after every ``migrate``.
+
+SQLite rebuilds ``accounts_user`` for most schema changes and drops its
+triggers with it (see ``search.repair_search_index``), so the repair runs
+on ``post_migrate`` rather than in the migration that first created them.
+"""
+import logging
+
+from django.db import connections
+
+from .search import repair_search_index
+
+logger = logging.getLogger('performance')
+
+
+def repair_search_index_after_migrate(sender, using, **kwargs):
+    if repair_search_index(connections[using]):
+        logger.info('Reinstalled the user directory search triggers and rebuilt the index')
@@ -1,3 +1,196 @@
-from django.test import TestCase
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection, models
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import User
+from .permissions import Capability, capabilities_for
+from .search import fts5_enabled, install_search_index, missing_triggers, uninstall_search_index
+
+
+class CapabilityPolicyTest(TestCase):
+    """Precompiled role capabilities and declarative view policies"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.guide = User.objects.create_user(
+            email='guide@example.com', username='guide', password='pass12345', role='guide'
+        )
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', role='admin'
+        )
+        self.client = APIClient()
+
+    def test_role_bitsets(self):
+        self.assertEqual(self.user.capabilities, Capability(0))
+        self.assertTrue(self.guide.has_capability(Capability.MODERATE | Capability.GUIDE_WORKSPACE))
+        self.assertFalse(self.guide.has_capability(Capability.MANAGE_PLATFORM))
+        self.assertTrue(self.admin.has_capability(Capability.MANAGE_PLATFORM | Capability.MODERATE))
+        self.assertFalse(self.admin.has_capability(Capability.GUIDE_WORKSPACE))
+        self.assertIs(capabilities_for('guide'), capabilities_for('guide'))
+
+    def test_staff_flag_adds_staff_capabilities(self):
+        self.user.is_staff = True
+        self.assertTrue(self.user.can_moderate())
+        self.assertTrue(self.user.has_capability(Capability.MANAGE_USERS))
+        self.assertFalse(self.user.has_capability(Capability.MANAGE_PLATFORM))
+
+    def test_admin_policy(self):
+        url = reverse('admin-forum-categories')
+        self.client.force_authenticate(self.guide)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['detail'], 'Admin access required')
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_method_scoped_policy(self):
+        url = reverse('guide-assessment-requests')
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.post(url, {}).status_code, 403)
+
+
+class AdminUserListPaginationTest(TestCase):
+    """Keyset pagination on the admin user directory"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', role='admin'
+        )
+        for i in range(25):
+            User.objects.create_user(
+                email=f'user{i}@example.com', username=f'user{i}', password='pass12345'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get(reverse('admin-user-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 26)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_keyset_mode_walks_all_users(self):
+        response = self.client.get(reverse('admin-user-list'), {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        seen = [row['id'] for row in response.data['results']]
+
+        next_url = response.data['next']
+        self.assertIn('cursor=', next_url)
+        response = self.client.get(next_url)
+        seen += [row['id'] for row in response.data['results']]
+
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(len(seen), 26)
+        self.assertEqual(len(set(seen)), 26)
+
+    def test_keyset_mode_optional_count(self):
+        response = self.client.get(
+            reverse('admin-user-list'), {'pagination': 'cursor', 'include_count': 'true'}
+        )
+        self.assertEqual(response.data['count'], 26)
+
+
+class UserDirectorySearchTest(TestCase):
+    """Admin user directory search, autocomplete and facets"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', role='admin'
+        )
+        self.guide = User.objects.create_user(
+            email='jane.doe@clinic.org', username='janed', password='pass12345',
+            role='guide', first_name='Jane', last_name='Doe', specializations=['Anxiety'],
+        )
+        User.objects.create_user(
+            email='sam@example.com', username='sammy', password='pass12345',
+            age=15, onboarding_completed=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_search_document_is_maintained(self):
+        self.guide.refresh_from_db()
+        self.assertIn('anxiety', self.guide.search_document)
+        self.guide.last_name = 'Smith'
+        self.guide.save(update_fields=['last_name'])
+        self.guide.refresh_from_db()
+        self.assertIn('smith', self.guide.search_document)
+
+    def test_list_search(self):
+        response = self.client.get(reverse('admin-user-list'), {'search': 'anxi'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.guide.id])
+
+    def test_facets(self):
+        response = self.client.get(reverse('admin-user-facets'))
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['role'], {'user': 1, 'guide': 1, 'admin': 1})
+        self.assertEqual(response.data['age_band']['13-15'], 1)
+        self.assertEqual(response.data['onboarding_completed']['true'], 1)
+
+        response = self.client.get(reverse('admin-user-facets'), {'role': 'user'})
+        self.assertEqual(response.data['total'], 1)
+
+
+class UserDirectoryFTS5Test(TransactionTestCase):
+    """Search through the SQLite FTS5 shadow table"""
+
+    def setUp(self):
+        with connection.schema_editor() as schema_editor:
+            install_search_index(schema_editor)
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', role='admin'
+        )
+        self.guide = User.objects.create_user(
+            email='jane@clinic.org', username='janed', password='pass12345',
+            role='guide', first_name='Jane', last_name='Doe',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def tearDown(self):
+        with connection.schema_editor() as schema_editor:
+            uninstall_search_index(schema_editor)
+
+    def test_prefix_autocomplete(self):
+        self.assertTrue(fts5_enabled())
+        response = self.client.get(reverse('admin-user-autocomplete'), {'q': 'jane do'})
+        self.assertEqual([row['id'] for row in response.data], [self.guide.id])
+
+    def test_index_follows_updates(self):
+        self.guide.first_name = 'Janet'
+        self.guide.last_name = 'Rivers'
+        self.guide.save()
+        response = self.client.get(reverse('admin-user-autocomplete'), {'q': 'riv'})
+        self.assertEqual([row['id'] for row in response.data], [self.guide.id])
+        response = self.client.get(reverse('admin-user-autocomplete'), {'q': 'doe'})
+        self.assertEqual(response.data, [])
+
+    def test_triggers_reinstalled_after_a_table_rebuild(self):
+        # Adding a column makes SQLite rebuild accounts_user, dropping its triggers
+        field = models.IntegerField(null=True, default=0)
+        field.set_attributes_from_name('rebuild_probe')
+        with connection.schema_editor() as schema_editor:
+            schema_editor.add_field(User, field)
+        self.addCleanup(self.remove_field, field)
+        self.assertTrue(missing_triggers())
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        self.assertEqual(missing_triggers(), [])
+        added = User.objects.create_user(
+            email='rivers@clinic.org', username='rivers', password='pass12345', first_name='Rowan',
+        )
+        response = self.client.get(reverse('admin-user-autocomplete'), {'q': 'rowan'})
+        self.assertEqual([row['id'] for row in response.data], [added.id])
+        response = self.client.get(reverse('admin-user-autocomplete'), {'q': 'jane'})
+        self.assertEqual([row['id'] for row in response.data], [self.guide.id])
+
+    def remove_field(self, field):
+        with connection.schema_editor() as schema_editor:
+            schema_editor.remove_field(User, field)
 
-# Create your tests here.
@@ -8,7 +8,8 @@ from .views import (
     LoginView, RegisterView, UserListView, UserProfileView,
     UserDetailView, OnboardingView, update_mood_checkin,
     PasswordResetRequestView, PasswordResetConfirmView,
-    AdminUserListView, AdminUserDetailView, debug_user_info
+    AdminUserListView, AdminUserDetailView, AdminUserFacetsView,
+    AdminUserAutocompleteView, debug_user_info
 )
 
 urlpatterns = [
@@ -31,6 +32,8 @@ urlpatterns = [
     
     # Admin User Management
     path('admin/users/', AdminUserListView.as_view(), name='admin-user-list'),
+    path('admin/users/facets/', AdminUserFacetsView.as_view(), name='admin-user-facets'),
+    path('admin/users/autocomplete/', AdminUserAutocompleteView.as_view(), name='admin-user-autocomplete'),
     path('admin/users/<int:pk>/', AdminUserDetailView.as_view(), name='admin-user-detail'),
     
     # Debug endpoint
@@ -11,13 +11,17 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db.models import Q
 from rest_framework_simplejwt.tokens import RefreshToken
+from backend.stats import build_dashboard, conditional_counts
 from .serializers import (
     LoginSerializer, RegisterSerializer, UserSerializer,
     UserProfileSerializer, GuideProfileSerializer, UserPublicSerializer,
     OnboardingSerializer
 )
 from .models import User
+from .permissions import Capability
+from .search import filter_users, search_users, user_facets
 
 User = get_user_model()
 
@@ -114,30 +118,58 @@ class UserListView(generics.ListAPIView):
 
     def get_queryset(self):
         # Only guides can see user lists
-        if not self.request.user.is_guide() and not self.request.user.is_staff:
+        if not self.request.user.has_capability(Capability.BROWSE_USERS):
             return User.objects.none()
-        return User.objects.filter(is_active=True)
+        return filter_users(User.objects.filter(is_active=True), self.request.query_params)
 
 
 class AdminUserListView(generics.ListCreateAPIView):
     """Admin view for managing all users"""
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = '-date_joined'
     
     def get_queryset(self):
         # Only admins can see all users
-        if not (self.request.user.role == 'admin' or self.request.user.is_staff):
+        if not self.request.user.has_capability(Capability.MANAGE_USERS):
             return User.objects.none()
-        return User.objects.all().order_by('-date_joined')
+        return filter_users(User.objects.all(), self.request.query_params).order_by('-date_joined')
     
     def perform_create(self, serializer):
         # Only admins can create users
-        if not (self.request.user.role == 'admin' or self.request.user.is_staff):
-            from rest_framework.exceptions import PermissionDenied
-            raise PermissionDenied("Only admins can create users")
+        if not self.request.user.has_capability(Capability.MANAGE_USERS):
+            raise permissions.PermissionDenied("Only admins can create users")
         serializer.save()
 
 
+class AdminUserFacetsView(APIView):
+    """Role, age band and onboarding facet counts for the admin user directory"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.has_capability(Capability.MANAGE_USERS):
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        queryset = filter_users(User.objects.all(), request.query_params)
+        return Response(user_facets(queryset))
+
+
+class AdminUserAutocompleteView(APIView):
+    """Prefix autocomplete for the admin user directory search box"""
+    permission_classes = [IsAuthenticated]
+    max_results = 10
+
+    def get(self, request):
+        if not request.user.has_capability(Capability.MANAGE_USERS):
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        term = request.query_params.get('q', '')
+        if not term.strip():
+            return Response([])
+        suggestions = search_users(User.objects.all(), term).order_by('-date_joined').values(
+            'id', 'email', 'username', 'first_name', 'last_name', 'role'
+        )[:self.max_results]
+        return Response(list(suggestions))
+
+
 class AdminUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin view for managing individual users"""
     serializer_class = UserSerializer
@@ -145,7 +177,7 @@ class AdminUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         # Only admins can manage users
-        if not (self.request.user.role == 'admin' or self.request.user.is_staff):
+        if not self.request.user.has_capability(Capability.MANAGE_USERS):
             return User.objects.none()
         return User.objects.all()
 
@@ -155,7 +187,16 @@ class AdminUserDetailView(generics.RetrieveUpdateDestroyAPIView):
 def debug_user_info(request):
     """Debug endpoint to check user permissions and data"""
     user = request.user
-    total_users = User.objects.count()
+    database_stats, compute_time_ms = build_dashboard('accounts.debug', {
+        'users': lambda: conditional_counts(
+            User.objects.all(),
+            total_users=None,
+            admin_users=Q(role='admin'),
+            guide_users=Q(role='guide'),
+            regular_users=Q(role='user'),
+            active_users=Q(is_active=True),
+        ),
+    })
     
     return Response({
         "current_user": {
@@ -166,17 +207,13 @@ def debug_user_info(request):
             "is_superuser": user.is_superuser,
         },
         "permissions": {
-            "can_see_admin_users": user.role == 'admin' or user.is_staff,
+            "can_see_admin_users": user.has_capability(Capability.MANAGE_USERS),
             "can_moderate": user.can_moderate(),
             "is_guide": user.is_guide(),
+            "capabilities": [capability.name for capability in Capability if user.has_capability(capability)],
         },
-        "database_stats": {
-            "total_users": total_users,
-            "admin_users": User.objects.filter(role='admin').count(),
-            "guide_users": User.objects.filter(role='guide').count(),
-            "regular_users": User.objects.filter(role='user').count(),
-            "active_users": User.objects.filter(is_active=True).count(),
-        }
+        "database_stats": database_stats,
+        "compute_time_ms": compute_time_ms,
     })
 
 
@@ -0,0 +1,9 @@
+from counters.registry import register
+from .models import Assessment, AssessmentRequest, ClientAssessmentAssignment
+
+register('assessments.requests.total', AssessmentRequest)
+register('assessments.requests.pending', AssessmentRequest, status='pending')
+register('assessments.requests.approved', AssessmentRequest, status='approved')
+register('assessments.requests.rejected', AssessmentRequest, status='rejected')
+register('assessments.assessments.total', Assessment)
+register('assessments.assignments.total', ClientAssessmentAssignment)
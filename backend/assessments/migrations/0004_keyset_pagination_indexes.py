@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0003_remove_clientassessmentassignment_unique_guide_client_assessment_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['user', '-completed_at'], name='assessment_user_completed_idx'),
+        ),
+    ]
@@ -66,6 +66,9 @@ class Assessment(models.Model):
     class Meta:
         db_table = 'assessments_assessment'
         ordering = ['-completed_at']
+        indexes = [
+            models.Index(fields=['user', '-completed_at'], name='assessment_user_completed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.assessment_type.name} ({self.completed_at.date()})"
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db import transaction
 from django.utils import timezone
+from counters.services import counter_stats
 from .models import (
     AssessmentType, AssessmentQuestion, Assessment,
     AssessmentResponse, AssessmentRecommendation, AssessmentRequest, ClientAssessmentAssignment
@@ -13,7 +14,16 @@ from .serializers import (
     AssessmentRequestSerializer, CreateAssessmentRequestSerializer,
     ClientAssessmentAssignmentSerializer, CreateAssignmentSerializer
 )
-from accounts.permissions import HasCompletedOnboarding
+from accounts.permissions import Capability, HasCompletedOnboarding, IsGuide, IsPlatformAdmin, require
+
+CanRequestAssessments = require(
+    Capability.REQUEST_ASSESSMENTS, "Only guides can create assessment requests", methods=('POST',)
+)
+CanAssignAssessments = require(
+    Capability.ASSIGN_ASSESSMENTS, "Only guides can assign assessments", methods=('POST',)
+)
+CanReviewRequests = require(Capability.REVIEW_ASSESSMENT_REQUESTS, "Admin access required")
+CanViewAdminStats = require(Capability.VIEW_ADMIN_STATS, "Admin access required")
 
 class AssessmentTypeListView(generics.ListAPIView):
     """List available assessment types"""
@@ -215,6 +225,7 @@ class UserAssessmentHistoryView(generics.ListAPIView):
     """Get user's assessment history"""
     serializer_class = AssessmentHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = '-completed_at'
 
     def get_queryset(self):
         return Assessment.objects.filter(user=self.request.user).order_by('-completed_at')
@@ -249,7 +260,7 @@ class AssessmentRecommendationsView(generics.ListAPIView):
 
 class GuideAssessmentRequestView(generics.ListCreateAPIView):
     """Guide can view their requests and create new ones"""
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanRequestAssessments]
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -257,28 +268,22 @@ class GuideAssessmentRequestView(generics.ListCreateAPIView):
         return AssessmentRequestSerializer
     
     def get_queryset(self):
-        if not (self.request.user.role == 'guide' or self.request.user.role == 'admin'):
-            return AssessmentRequest.objects.none()
-        
-        if self.request.user.role == 'guide':
-            return AssessmentRequest.objects.filter(requester=self.request.user)
-        else:  # admin can see all requests
+        user = self.request.user
+        if user.has_capability(Capability.REVIEW_ASSESSMENT_REQUESTS):
             return AssessmentRequest.objects.all()
+        if user.has_capability(Capability.REQUEST_ASSESSMENTS):
+            return AssessmentRequest.objects.filter(requester=user)
+        return AssessmentRequest.objects.none()
     
     def perform_create(self, serializer):
-        if self.request.user.role != 'guide':
-            raise permissions.PermissionDenied("Only guides can create assessment requests")
         serializer.save(requester=self.request.user)
 
 class AdminAssessmentRequestView(generics.ListAPIView):
     """Admin view to see all assessment requests"""
     serializer_class = AssessmentRequestSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanReviewRequests]
     
     def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        
         status_filter = self.request.query_params.get('status', None)
         queryset = AssessmentRequest.objects.all()
         
@@ -289,12 +294,9 @@ class AdminAssessmentRequestView(generics.ListAPIView):
 
 class AdminReviewRequestView(APIView):
     """Admin can approve/reject assessment requests"""
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanReviewRequests]
     
     def post(self, request, request_id):
-        if request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        
         try:
             assessment_request = AssessmentRequest.objects.get(id=request_id)
         except AssessmentRequest.DoesNotExist:
@@ -324,7 +326,7 @@ class AdminReviewRequestView(APIView):
 
 class GuideClientAssignmentView(generics.ListCreateAPIView):
     """Guide can assign assessments to their clients"""
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanAssignAssessments]
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -332,49 +334,31 @@ class GuideClientAssignmentView(generics.ListCreateAPIView):
         return ClientAssessmentAssignmentSerializer
     
     def get_queryset(self):
-        if self.request.user.role != 'guide':
+        if not self.request.user.has_capability(Capability.ASSIGN_ASSESSMENTS):
             return ClientAssessmentAssignment.objects.none()
         
         return ClientAssessmentAssignment.objects.filter(guide=self.request.user)
     
     def perform_create(self, serializer):
-        if self.request.user.role != 'guide':
-            raise permissions.PermissionDenied("Only guides can assign assessments")
         serializer.save(guide=self.request.user)
 
 class AdminAssessmentTypeManagementView(generics.ListCreateAPIView):
     """Admin can create new assessment types"""
     serializer_class = AssessmentTypeSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return AssessmentType.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [permissions.IsAuthenticated, IsPlatformAdmin]
+    queryset = AssessmentType.objects.all()
 
 class AdminAssessmentTypeDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete assessment types"""
     serializer_class = AssessmentTypeSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return AssessmentType.objects.all()
+    permission_classes = [permissions.IsAuthenticated, IsPlatformAdmin]
+    queryset = AssessmentType.objects.all()
 
 class GuideAssessmentStatsView(APIView):
     """Guide dashboard statistics"""
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, IsGuide]
     
     def get(self, request):
-        if request.user.role != 'guide':
-            raise permissions.PermissionDenied("Guide access required")
-        
         # Get guide's statistics
         assigned_assessments = ClientAssessmentAssignment.objects.filter(guide=request.user)
         pending_assignments = assigned_assessments.filter(is_completed=False)
@@ -400,33 +384,27 @@ class GuideAssessmentStatsView(APIView):
 
 class AdminDashboardStatsView(APIView):
     """Admin dashboard statistics"""
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, CanViewAdminStats]
     
     def get(self, request):
-        if request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        
-        # Get admin statistics
-        total_requests = AssessmentRequest.objects.count()
-        pending_requests = AssessmentRequest.objects.filter(status='pending').count()
-        approved_requests = AssessmentRequest.objects.filter(status='approved').count()
-        rejected_requests = AssessmentRequest.objects.filter(status='rejected').count()
-        
-        total_assessments = Assessment.objects.count()
-        total_assignments = ClientAssessmentAssignment.objects.count()
+        # Get admin statistics from materialized counters
+        counters = {
+            'total_requests': 'assessments.requests.total',
+            'pending_requests': 'assessments.requests.pending',
+            'approved_requests': 'assessments.requests.approved',
+            'rejected_requests': 'assessments.requests.rejected',
+            'total_assessments': 'assessments.assessments.total',
+            'total_assignments': 'assessments.assignments.total',
+        }
+        stats, read_ms = counter_stats(counters)
         
-        stats = {
-            'total_requests': total_requests,
-            'pending_requests': pending_requests,
-            'approved_requests': approved_requests,
-            'rejected_requests': rejected_requests,
-            'total_assessments': total_assessments,
-            'total_assignments': total_assignments,
+        stats.update({
             'recent_requests': AssessmentRequestSerializer(
                 AssessmentRequest.objects.order_by('-created_at')[:5],
                 many=True
-            ).data
-        }
+            ).data,
+            'compute_time_ms': {'counters': read_ms},
+        })
         
         return Response(stats)
         
\ No newline at end of file
@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections go to the community chat
+(see ``community.chat``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,28 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready
+from community.chat.consumer import chat_application  # noqa: E402
+from community.chat.lifecycle import shutdown  # noqa: E402
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        event = await receive()
+        if event['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif event['type'] == 'lifespan.shutdown':
+            # Store buffered chat messages before the worker exits
+            await shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await chat_application(scope, receive, send)
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+    return await django_application(scope, receive, send)
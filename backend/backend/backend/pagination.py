@@ -0,0 +1,86 @@
+"""
+Pagination classes shared by the platform APIs
+"""
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination over a view's natural ordering.
+
+    Pages are fetched with ``WHERE <ordering column> < <last seen value>``
+    instead of ``OFFSET``, so deep pages cost the same as the first one.
+    The total count is only computed when ``?include_count=true`` is sent.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+    include_count_query_param = 'include_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total_count = None
+        if request.query_params.get(self.include_count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.total_count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # Views declare their natural keyset ordering via ``keyset_ordering``
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering:
+            self.ordering = ordering
+        return super().get_ordering(request, queryset, view)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total_count is not None:
+            payload['count'] = self.total_count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {
+            'type': 'integer',
+            'example': 123,
+        }
+        return response_schema
+
+
+class StandardPagination(PageNumberPagination):
+    """
+    Default page-number pagination with an opt-in keyset mode.
+
+    Clients switch to keyset pagination by sending ``?pagination=cursor``
+    for the first page and following the returned ``next`` links (which
+    carry a ``cursor`` parameter) afterwards.
+    """
+    page_size = 20
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def _use_keyset(self, request, view):
+        if not getattr(view, 'keyset_ordering', None):
+            return False
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor' or
+            self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self._use_keyset(request, view):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
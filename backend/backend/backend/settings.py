@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'content',
     'crisis',
     'guide',
+    'counters',
 
     # Third-party apps
     'rest_framework',
@@ -63,7 +64,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.StandardPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -309,3 +310,16 @@ LOGGING = {
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Real-time chat (community.chat). Point this at Redis when running more
+# than one ASGI worker so rooms and presence are shared between them;
+# left empty, a single worker keeps both in process.
+CHAT_REDIS_URL = os.environ.get('CHAT_REDIS_URL', '')
+
+# Content screening (community.screening). New posts, comments and chat
+# messages are screened by this many background threads per process (0
+# screens inline). SCREENING_CLASSIFIER optionally names a local model:
+# a callable taking a list of texts and returning risk scores in [0, 1].
+SCREENING_WORKERS = int(os.environ.get('SCREENING_WORKERS', 2))
+SCREENING_CLASSIFIER = os.environ.get('SCREENING_CLASSIFIER', '')
+SCREENING_CLASSIFIER_THRESHOLD = float(os.environ.get('SCREENING_CLASSIFIER_THRESHOLD', 0.8))
@@ -0,0 +1,105 @@
+"""
+Shared statistics service for dashboards.
+
+Dashboards are made of tiles. Each tile is computed with one conditional
+aggregation query per table (``Count(filter=Q(...))``) and cached for a
+short TTL. When a tile goes stale, one worker recomputes it while the
+others keep serving the stale value, so an expiring tile never triggers
+a stampede of identical COUNT queries.
+"""
+import time
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+logger = logging.getLogger('performance')
+
+DEFAULT_TTL = 30  # seconds a tile is considered fresh
+STALE_GRACE = 5  # stale values are kept for ttl * STALE_GRACE
+LOCK_TIMEOUT = 10  # seconds a recompute lock is held at most
+LOCK_WAIT = 0.05
+LOCK_RETRIES = 20
+
+CACHE_PREFIX = 'stats'
+
+
+def conditional_counts(queryset, **conditions):
+    """
+    Count rows of ``queryset`` for several conditions in a single query.
+
+    Each keyword maps a result name to a ``Q`` object, ``None`` for the
+    unfiltered total, or a ready-made aggregate expression.
+    """
+    aggregates = {}
+    for name, condition in conditions.items():
+        if condition is None:
+            aggregates[name] = Count('pk')
+        elif isinstance(condition, Q):
+            aggregates[name] = Count('pk', filter=condition)
+        else:
+            aggregates[name] = condition
+    return queryset.order_by().aggregate(**aggregates)
+
+
+def _tile_key(name):
+    return f'{CACHE_PREFIX}:{name}'
+
+
+def _compute(name, compute, ttl):
+    started = time.perf_counter()
+    values = compute()
+    compute_ms = round((time.perf_counter() - started) * 1000, 2)
+    entry = {
+        'values': values,
+        'compute_ms': compute_ms,
+        'fresh_until': time.time() + ttl,
+    }
+    cache.set(_tile_key(name), entry, timeout=ttl * STALE_GRACE)
+    logger.info(f"Computed stats tile {name} in {compute_ms}ms")
+    return entry
+
+
+def get_tile(name, compute, ttl=DEFAULT_TTL):
+    """Return the cached entry for a tile, recomputing it at most once per TTL"""
+    key = _tile_key(name)
+    entry = cache.get(key)
+    if entry and entry['fresh_until'] > time.time():
+        return entry
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            return _compute(name, compute, ttl)
+        finally:
+            cache.delete(lock_key)
+
+    # Another worker is refreshing the tile: serve the stale value if any,
+    # otherwise wait briefly for it to land before computing ourselves.
+    if entry:
+        return entry
+    for _ in range(LOCK_RETRIES):
+        time.sleep(LOCK_WAIT)
+        entry = cache.get(key)
+        if entry:
+            return entry
+    return _compute(name, compute, ttl)
+
+
+def invalidate_tile(name):
+    cache.delete(_tile_key(name))
+
+
+def build_dashboard(dashboard, tiles, ttl=DEFAULT_TTL):
+    """
+    Assemble a dashboard from ``tiles`` (tile name -> zero-argument callable
+    returning a dict of values). The flattened values are returned together
+    with a ``compute_time_ms`` mapping of each tile's last compute time.
+    """
+    values = {}
+    compute_time_ms = {}
+    for tile_name, compute in tiles.items():
+        entry = get_tile(f'{dashboard}:{tile_name}', compute, ttl)
+        values.update(entry['values'])
+        compute_time_ms[tile_name] = entry['compute_ms']
+    return values, compute_time_ms
@@ -0,0 +1,176 @@
+"""
+Per-user activity feed.
+
+A member's posts, comments, likes and peer-support events are merged
+into one stream, newest first, by a single ``UNION ALL`` query. Each
+branch selects the same columns (kind, id, time, post, title, excerpt,
+status), so a page needs no per-row lookups. Pages are keyed on
+``(at, kind, id)`` with kinds ordered by ``KIND_RANK``. The cursor
+condition is pushed into every branch, and on databases that allow it
+each branch is also limited to one page, so deep pages cost the same as
+the first.
+
+The member's totals are counted with scalar subqueries in one query and
+cached per user. Their own writes, matches and moderation of their posts
+drop the cache once they commit; other side effects, such as a post they
+liked being hidden, show after ``COUNTS_TTL``. Counts that depend on
+other people, such as likes received, are not part of it.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+from .models import CommentLike, ForumComment, ForumPost, PeerSupportMatch, PostLike
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+EXCERPT_CHARS = 200
+COUNTS_PREFIX = 'forum:activity:counts'
+COUNTS_TTL = 300
+
+FIELDS = ['kind', 'rank', 'event_id', 'at', 'post_id_', 'title_', 'excerpt', 'status_']
+# Tie-break between events of different kinds at the same instant
+KINDS = ['comment', 'comment_like', 'peer_request', 'peer_support', 'post', 'post_like']
+KIND_RANK = {kind: rank for rank, kind in enumerate(KINDS)}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(event):
+    raw = f"{event['at'].isoformat()}|{event['kind']}|{event['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        at, kind, event_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if kind not in KIND_RANK:
+            raise ValueError(kind)
+        return datetime.fromisoformat(at), kind, int(event_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def _text(value=''):
+    return Value(value, output_field=models.TextField())
+
+
+def _branch(queryset, kind, at, post=None, title=None, excerpt=None, status=None):
+    return queryset.annotate(
+        kind=_text(kind),
+        rank=Value(KIND_RANK[kind]),
+        event_id=F('pk'),
+        at=F(at),
+        post_id_=F(post) if post else Value(None, output_field=models.BigIntegerField()),
+        title_=Coalesce(F(title), _text(), output_field=models.TextField()) if title else _text(),
+        excerpt=Substr(excerpt, 1, EXCERPT_CHARS) if excerpt else _text(),
+        status_=F(status) if status else _text(),
+    ).order_by().values(*FIELDS)
+
+
+def branches(user_id):
+    """The UNION branches of the feed, keyed by their event kind"""
+    return {
+        'comment': _branch(
+            ForumComment.objects.filter(author_id=user_id, is_approved=True), 'comment', 'created_at',
+            post='post_id', title='post__title', excerpt='content',
+        ),
+        'comment_like': _branch(
+            CommentLike.objects.filter(user_id=user_id, comment__is_approved=True), 'comment_like', 'created_at',
+            post='comment__post_id', title='comment__post__title', excerpt='comment__content',
+        ),
+        'peer_request': _branch(
+            PeerSupportMatch.objects.filter(requester_id=user_id), 'peer_request', 'created_at', status='status',
+        ),
+        'peer_support': _branch(
+            PeerSupportMatch.objects.filter(supporter_id=user_id, matched_at__isnull=False),
+            'peer_support', 'matched_at', status='status',
+        ),
+        'post': _branch(
+            ForumPost.objects.filter(author_id=user_id, is_approved=True), 'post', 'created_at',
+            post='pk', title='title', excerpt='content',
+        ),
+        'post_like': _branch(
+            PostLike.objects.filter(user_id=user_id, post__is_approved=True), 'post_like', 'created_at',
+            post='post_id', title='post__title', excerpt='post__content',
+        ),
+    }
+
+
+def _after(kind, before):
+    """Keyset condition of one branch for the cursor ``(at, kind, id)``"""
+    at, cursor_kind, event_id = before
+    if KIND_RANK[kind] < KIND_RANK[cursor_kind]:
+        return Q(at__lte=at)
+    if KIND_RANK[kind] > KIND_RANK[cursor_kind]:
+        return Q(at__lt=at)
+    return Q(at__lt=at) | Q(at=at, event_id__lt=event_id)
+
+
+def feed_page(user_id, cursor=None, limit=DEFAULT_LIMIT):
+    """Return ``(events, next_cursor)`` with up to ``limit`` events older than ``cursor``"""
+    before = decode_cursor(cursor) if cursor else None
+    ordering = ('-at', '-rank', '-event_id')
+    parts = []
+    for kind, branch in branches(user_id).items():
+        if before is not None:
+            branch = branch.filter(_after(kind, before))
+        if connection.features.supports_slicing_ordering_in_compound:
+            branch = branch.order_by('-at', '-event_id')[:limit + 1]
+        parts.append(branch)
+    rows = list(parts[0].union(*parts[1:], all=True).order_by(*ordering)[:limit + 1])
+
+    events = [
+        {
+            'kind': row['kind'], 'id': row['event_id'], 'at': row['at'], 'post': row['post_id_'],
+            'title': row['title_'], 'excerpt': row['excerpt'], 'status': row['status_'],
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor(events[-1]) if len(rows) > limit else None
+    return events, next_cursor
+
+
+def _count(queryset, field):
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field)
+    return Coalesce(Subquery(counted.annotate(total=models.Count('pk')).values('total')), 0)
+
+
+def compute_counts(user_id):
+    return get_user_model().objects.filter(pk=user_id).annotate(
+        posts=_count(ForumPost.objects.filter(is_approved=True), 'author'),
+        comments=_count(ForumComment.objects.filter(is_approved=True), 'author'),
+        post_likes=_count(PostLike.objects.filter(post__is_approved=True), 'user'),
+        comment_likes=_count(CommentLike.objects.filter(comment__is_approved=True), 'user'),
+        peer_requests=_count(PeerSupportMatch.objects.all(), 'requester'),
+        peer_supported=_count(PeerSupportMatch.objects.filter(matched_at__isnull=False), 'supporter'),
+    ).values('posts', 'comments', 'post_likes', 'comment_likes', 'peer_requests', 'peer_supported').first()
+
+
+def _counts_key(user_id):
+    return f'{COUNTS_PREFIX}:{user_id}'
+
+
+def activity_counts(user_id):
+    """The member's totals, cached until their next write"""
+    key = _counts_key(user_id)
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute_counts(user_id)
+        cache.set(key, counts, timeout=COUNTS_TTL)
+    return counts
+
+
+def invalidate_counts(*user_ids):
+    keys = [_counts_key(user_id) for user_id in user_ids if user_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     ForumCategory, ForumPost, ForumComment, PostLike, CommentLike,
-    PeerSupportMatch, ModerationReport, ChatRoom, ChatMessage
+    PeerSupportMatch, ModerationReport, ChatRoom, ChatMessage, ChatArchive
 )
 
 
@@ -48,6 +48,14 @@ class ChatMessageAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
 
 
+@admin.register(ChatArchive)
+class ChatArchiveAdmin(admin.ModelAdmin):
+    list_display = ['room', 'day', 'message_count', 'updated_at']
+    list_filter = ['room']
+    exclude = ['data']
+    readonly_fields = ['room', 'day', 'message_count', 'created_at', 'updated_at']
+
+
 @admin.register(PeerSupportMatch)
 class PeerSupportMatchAdmin(admin.ModelAdmin):
     list_display = ['requester', 'supporter', 'status', 'matched_at', 'created_at']
@@ -58,10 +66,10 @@ class PeerSupportMatchAdmin(admin.ModelAdmin):
 
 @admin.register(ModerationReport)
 class ModerationReportAdmin(admin.ModelAdmin):
-    list_display = ['reporter', 'report_type', 'status', 'moderator', 'created_at']
+    list_display = ['reporter', 'report_type', 'priority', 'status', 'moderator', 'claimed_by', 'created_at']
     list_filter = ['report_type', 'status', 'created_at']
     search_fields = ['reporter__username', 'description']
-    readonly_fields = ['created_at', 'resolved_at']
+    readonly_fields = ['priority', 'created_at', 'resolved_at']
 
 
 admin.site.register(PostLike)
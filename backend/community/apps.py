@@ -1,7 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CommunityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'community'
-    
\ No newline at end of file
+    
+    def ready(self):
+        from . import screening, signals
+
+        screening.connect()
+        # Connected to this app so it runs once per migrate
+        post_migrate.connect(
+            signals.repair_search_index_after_migrate, sender=self, dispatch_uid='community:repair_search_index',
+        )
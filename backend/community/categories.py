@@ -0,0 +1,74 @@
+"""
+Pre-serialized forum category listing.
+
+The category list is the first page of the community, requested by every
+member, and changes only when a category is edited or a post is
+created, approved, hidden or deleted. It is rendered to JSON once and
+cached as bytes together with its ETag; requests serve the bytes as they
+are, and clients revalidating with ``If-None-Match`` get a 304 without a
+body. Counts come from the denormalized ``ForumCategory.post_count``, so
+a rebuild is a single query.
+
+Every write that changes the listing calls ``invalidate_listing``, which
+bumps a generation number once the transaction commits; the body is
+cached under a key that includes the generation read before building it.
+A request that built the listing from data read just before a write
+committed therefore stores it under the old generation, where nobody
+looks any more, instead of overwriting the invalidation for
+``CACHE_TTL``.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .models import ForumCategory
+from .serializers import ForumCategorySerializer
+
+CACHE_KEY = 'forum:categories'
+GENERATION_KEY = 'forum:categories:generation'
+CACHE_TTL = 600  # safety net; writes invalidate the listing
+
+
+def listed_categories():
+    return ForumCategory.objects.filter(is_active=True)
+
+
+def build_listing():
+    """Render the listing as a single page of the paginated response, with its ETag"""
+    results = ForumCategorySerializer(listed_categories(), many=True).data
+    body = JSONRenderer().render({'count': len(results), 'next': None, 'previous': None, 'results': results})
+    return {'body': body, 'count': len(results), 'etag': f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'}
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock so a lost counter never reuses an old key
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def get_listing():
+    # Read before the categories, so a build that races a write is stored
+    # under the generation that write retires
+    key = f'{CACHE_KEY}:{_generation()}'
+    listing = cache.get(key)
+    if listing is None:
+        listing = build_listing()
+        cache.set(key, listing, timeout=CACHE_TTL)
+    return listing
+
+
+def invalidate_listing():
+    transaction.on_commit(_next_generation)
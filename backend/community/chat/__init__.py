@@ -0,0 +1,19 @@
+"""
+Real-time chat for ``ChatRoom`` over ASGI WebSockets.
+
+Clients connect to ``/ws/chat/<room id>/?token=<JWT access token>``.
+
+* ``broker`` fans messages out to every socket of a room. The local
+  broker keeps subscribers in process; with ``CHAT_REDIS_URL`` set,
+  messages travel through Redis pub/sub so rooms span every worker.
+* ``presence`` counts the participants of each room and enforces
+  ``max_participants``, in process or in Redis alike.
+* ``persistence`` batches incoming messages into ``bulk_create`` calls
+  instead of one INSERT per message.
+* ``consumer`` is the WebSocket protocol handler mounted in ``asgi.py``.
+"""
+from django.conf import settings
+
+
+def redis_url():
+    return getattr(settings, 'CHAT_REDIS_URL', '')
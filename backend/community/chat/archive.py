@@ -0,0 +1,129 @@
+"""
+Cold storage for chat history.
+
+Messages older than ``HOT_DAYS`` are moved out of ``ChatMessage`` into
+one ``ChatArchive`` row per room and day: the day's messages as JSON
+lines, oldest first, compressed with zlib. The hot table then only holds
+recent messages, and scrolling back past them reads a few compressed
+blobs instead of a long index range. Archives are decompressed
+incrementally, so a day is streamed rather than inflated in one piece.
+"""
+import json
+import logging
+import zlib
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import ChatArchive, ChatMessage
+
+logger = logging.getLogger('performance')
+
+HOT_DAYS = 30
+COMPRESSION_LEVEL = 6
+READ_CHUNK = 64 * 1024
+
+ARCHIVED_FIELDS = ['id', 'author_id', 'content', 'is_anonymous', 'is_system_message', 'created_at']
+
+
+def _encode(row):
+    return json.dumps({
+        'id': row['id'],
+        'author': row['author_id'],
+        'content': row['content'],
+        'is_anonymous': row['is_anonymous'],
+        'is_system_message': row['is_system_message'],
+        'created_at': row['created_at'].isoformat(),
+    }, separators=(',', ':'))
+
+
+def _sort_key(line):
+    message = json.loads(line)
+    return message['created_at'], message['id']
+
+
+def iter_lines(archive):
+    """Yield the JSON lines of ``archive`` while decompressing it chunk by chunk"""
+    data = bytes(archive.data)
+    decompressor = zlib.decompressobj()
+    buffered = b''
+    for start in range(0, len(data), READ_CHUNK):
+        buffered += decompressor.decompress(data[start:start + READ_CHUNK])
+        *lines, buffered = buffered.split(b'\n')
+        for line in lines:
+            if line:
+                yield line
+    buffered += decompressor.flush()
+    for line in buffered.split(b'\n'):
+        if line:
+            yield line
+
+
+def iter_messages(archive):
+    """Yield the archived messages of ``archive`` as dicts, oldest first"""
+    for line in iter_lines(archive):
+        message = json.loads(line)
+        message['created_at'] = datetime.fromisoformat(message['created_at'])
+        message['room'] = archive.room_id
+        yield message
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    return start, start + timedelta(days=1)
+
+
+def compact_day(room_id, day):
+    """
+    Move the messages of ``room_id`` on ``day`` into its archive, merging
+    with an existing archive of that day; returns the number moved
+    """
+    start, end = _day_bounds(day)
+    with transaction.atomic():
+        messages = ChatMessage.objects.filter(room_id=room_id, created_at__gte=start, created_at__lt=end)
+        rows = list(messages.order_by('created_at', 'id').values(*ARCHIVED_FIELDS))
+        if not rows:
+            return 0
+
+        archive = ChatArchive.objects.select_for_update().filter(room_id=room_id, day=day).first()
+        lines = [line.decode() for line in iter_lines(archive)] if archive else []
+        lines.extend(_encode(row) for row in rows)
+        if archive:
+            # Late arrivals for a day that was already compacted
+            lines.sort(key=_sort_key)
+
+        data = zlib.compress('\n'.join(lines).encode(), COMPRESSION_LEVEL)
+        if archive is None:
+            ChatArchive.objects.create(room_id=room_id, day=day, message_count=len(lines), data=data)
+        else:
+            archive.data = data
+            archive.message_count = len(lines)
+            archive.save(update_fields=['data', 'message_count', 'updated_at'])
+
+        messages.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def compact(older_than_days=HOT_DAYS, room_ids=None):
+    """Archive every room-day older than ``older_than_days``; returns (days, messages)"""
+    cutoff_day = timezone.localdate() - timedelta(days=older_than_days)
+    cutoff, _ = _day_bounds(cutoff_day)
+    old = ChatMessage.objects.filter(created_at__lt=cutoff)
+    if room_ids:
+        old = old.filter(room_id__in=room_ids)
+
+    days = (
+        old.annotate(day=TruncDate('created_at'))
+        .values_list('room_id', 'day')
+        .distinct()
+        .order_by('room_id', 'day')
+    )
+    compacted_days = moved = 0
+    for room_id, day in list(days):
+        count = compact_day(room_id, day)
+        compacted_days += 1
+        moved += count
+        logger.info(f"Archived {count} chat messages of room {room_id} on {day}")
+    return compacted_days, moved
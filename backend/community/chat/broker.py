@@ -0,0 +1,146 @@
+"""
+Room pub/sub for chat sockets.
+
+Every socket owns a bounded queue drained by its own writer task, and a
+room is a set of such queues. Publishing serializes a message once and
+puts the same text on every queue without awaiting any socket, so one
+slow client never holds up the room; a client whose queue overflows is
+disconnected instead of buffering without bound.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from . import redis_url
+
+logger = logging.getLogger('performance')
+
+QUEUE_SIZE = 256
+CHANNEL_PREFIX = 'chat:room:'
+
+
+class Subscription:
+    """One socket's inbox for a room"""
+
+    def __init__(self, room_id, size=QUEUE_SIZE):
+        self.room_id = room_id
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+    def deliver(self, text):
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Wake the writer so it notices and closes the socket
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """
+    In-process pub/sub. Only sockets of the same worker see each other's
+    messages, so it serves single-worker deployments, development and
+    tests; run several workers against the Redis broker.
+    """
+
+    def __init__(self):
+        self.rooms = defaultdict(set)
+
+    async def subscribe(self, room_id):
+        subscription = Subscription(room_id)
+        self.rooms[room_id].add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        subscribers = self.rooms.get(subscription.room_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.rooms[subscription.room_id]
+
+    def fan_out(self, room_id, text):
+        for subscription in tuple(self.rooms.get(room_id, ())):
+            subscription.deliver(text)
+        return len(self.rooms.get(room_id, ()))
+
+    async def publish(self, room_id, text):
+        return self.fan_out(room_id, text)
+
+    async def close(self):
+        self.rooms.clear()
+
+
+class RedisBroker(LocalBroker):
+    """
+    Redis pub/sub shared by all workers. Each worker holds one pub/sub
+    connection subscribed to the rooms it has sockets in, and fans the
+    received messages out locally.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.reader = None
+
+    def channel(self, room_id):
+        return f'{CHANNEL_PREFIX}{room_id}'
+
+    async def subscribe(self, room_id):
+        first = room_id not in self.rooms
+        subscription = await super().subscribe(room_id)
+        if first:
+            await self.pubsub.subscribe(self.channel(room_id))
+            if self.reader is None or self.reader.done():
+                self.reader = asyncio.create_task(self.read())
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        await super().unsubscribe(subscription)
+        if subscription.room_id not in self.rooms:
+            await self.pubsub.unsubscribe(self.channel(subscription.room_id))
+
+    async def publish(self, room_id, text):
+        return await self.redis.publish(self.channel(room_id), text)
+
+    async def read(self):
+        while self.rooms:
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except Exception:
+                logger.exception("Reading chat messages from Redis failed")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None:
+                continue
+            room_id = int(message['channel'].decode()[len(CHANNEL_PREFIX):])
+            self.fan_out(room_id, message['data'].decode())
+
+    async def close(self):
+        if self.reader is not None:
+            self.reader.cancel()
+        await self.pubsub.close()
+        await self.redis.close()
+        await super().close()
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        url = redis_url()
+        _broker = RedisBroker(url) if url else LocalBroker()
+    return _broker
+
+
+def reset_broker():
+    global _broker
+    _broker = None
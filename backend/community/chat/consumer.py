@@ -0,0 +1,195 @@
+"""
+WebSocket protocol for chat rooms.
+
+Client frames::
+
+    {"type": "message", "content": "...", "is_anonymous": true, "nonce": "..."}
+
+Server frames::
+
+    {"type": "message", "message": {...}}    a message posted to the room
+    {"type": "presence", "count": 3}         participant count changed
+    {"type": "error", "error": "..."}        a frame was rejected
+
+Connections are refused with close code 4001 (not authenticated), 4004
+(no such active room) or 4003 (room full). A client that cannot keep up
+with the room is closed with 4008.
+"""
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from ..models import ChatMessage, ChatRoom
+from .broker import get_broker
+from .persistence import get_writer
+from .presence import HEARTBEAT_INTERVAL, get_presence
+
+logger = logging.getLogger('performance')
+
+PATH_RE = re.compile(r'^/ws/chat/(?P<room_id>\d+)/?$')
+MAX_MESSAGE_LENGTH = 2000
+
+CLOSE_UNAUTHENTICATED = 4001
+CLOSE_ROOM_FULL = 4003
+CLOSE_NOT_FOUND = 4004
+CLOSE_TOO_SLOW = 4008
+
+
+def _authenticate(raw_token):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError):
+        return None
+
+
+def _raw_token(scope):
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            parts = value.decode().split()
+            if len(parts) == 2 and parts[0].lower() == 'bearer':
+                return parts[1]
+    return None
+
+
+def _room(room_id):
+    return ChatRoom.objects.filter(pk=room_id, is_active=True).only('id', 'max_participants').first()
+
+
+def _frame(kind, **payload):
+    return json.dumps({'type': kind, **payload})
+
+
+class ChatConnection:
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.broker = get_broker()
+        self.presence = get_presence()
+        self.writer = get_writer()
+        self.subscription = None
+        self.user = None
+        self.room = None
+
+    async def close(self, code):
+        await self.send({'type': 'websocket.close', 'code': code})
+
+    async def send_text(self, text):
+        await self.send({'type': 'websocket.send', 'text': text})
+
+    async def authenticate(self):
+        # An outer middleware (or a test) may have resolved the user already
+        user = self.scope.get('user')
+        if user is None:
+            raw_token = _raw_token(self.scope)
+            if raw_token:
+                user = await sync_to_async(_authenticate)(raw_token)
+        return user if user is not None and user.is_authenticated else None
+
+    async def run(self):
+        event = await self.receive()
+        if event['type'] != 'websocket.connect':
+            return
+
+        match = PATH_RE.match(self.scope['path'])
+        self.user = await self.authenticate()
+        if self.user is None:
+            return await self.close(CLOSE_UNAUTHENTICATED)
+        self.room = await sync_to_async(_room)(int(match['room_id'])) if match else None
+        if self.room is None:
+            return await self.close(CLOSE_NOT_FOUND)
+
+        count = await self.presence.join(self.room.id, self.user.id, self.room.max_participants)
+        if count is None:
+            return await self.close(CLOSE_ROOM_FULL)
+
+        self.subscription = await self.broker.subscribe(self.room.id)
+        await self.send({'type': 'websocket.accept'})
+        writer = asyncio.create_task(self.write())
+        heartbeat = asyncio.create_task(self.heartbeat())
+        try:
+            await self.broker.publish(self.room.id, _frame('presence', count=count))
+            await self.read()
+        finally:
+            writer.cancel()
+            heartbeat.cancel()
+            await self.broker.unsubscribe(self.subscription)
+            count = await self.presence.leave(self.room.id, self.user.id)
+            await self.broker.publish(self.room.id, _frame('presence', count=count))
+
+    async def read(self):
+        while True:
+            event = await self.receive()
+            if event['type'] == 'websocket.disconnect':
+                return
+            if event['type'] == 'websocket.receive':
+                await self.handle(event.get('text') or (event.get('bytes') or b'').decode())
+
+    async def write(self):
+        while True:
+            text = await self.subscription.get()
+            if text is None:
+                logger.warning(f"Closing slow chat socket of user {self.user.id} in room {self.room.id}")
+                return await self.close(CLOSE_TOO_SLOW)
+            await self.send_text(text)
+
+    async def heartbeat(self):
+        """Keep the seat from being pruned as left behind (see ``presence``)"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self.presence.touch(self.room.id, self.user.id)
+            except Exception:
+                logger.exception(f"Chat presence heartbeat of user {self.user.id} in room {self.room.id} failed")
+
+    async def handle(self, text):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return await self.send_text(_frame('error', error='Frames must be JSON'))
+        if not isinstance(data, dict) or data.get('type') != 'message':
+            return await self.send_text(_frame('error', error='Unknown frame type'))
+
+        content = str(data.get('content') or '').strip()
+        if not content or len(content) > MAX_MESSAGE_LENGTH:
+            return await self.send_text(
+                _frame('error', error=f'Messages must be 1-{MAX_MESSAGE_LENGTH} characters')
+            )
+
+        message = ChatMessage(
+            room_id=self.room.id,
+            author_id=self.user.id,
+            content=content,
+            is_anonymous=bool(data.get('is_anonymous', True)),
+            created_at=timezone.now(),
+        )
+        display_name = (
+            f"Anonymous User {self.user.id}" if message.is_anonymous else self.user.display_name
+        )
+        self.writer.add(message)
+        await self.broker.publish(self.room.id, _frame('message', message={
+            'room': self.room.id,
+            'author': self.user.id,
+            'author_display_name': display_name,
+            'content': content,
+            'is_anonymous': message.is_anonymous,
+            'created_at': message.created_at.isoformat(),
+            'nonce': data.get('nonce'),
+        }))
+
+
+async def chat_application(scope, receive, send):
+    """ASGI application for ``websocket`` scopes"""
+    await ChatConnection(scope, receive, send).run()
@@ -0,0 +1,108 @@
+"""
+Room scrollback across the hot message table and the daily archives.
+
+Pages are keyed on ``(created_at, id)`` and served newest first. A page
+is read from the ``(room, created_at, id)`` index while the hot table
+has messages older than the cursor, then continues into the archives of
+earlier days, so clients scroll with one cursor regardless of where the
+messages live.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import ChatArchive, ChatMessage
+from .archive import iter_messages
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    raw = f"{message['created_at'].isoformat()}|{message['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        created_at, message_id = datetime.fromisoformat(created_at), int(message_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    # Cursors we issue carry the offset; a naive one cannot be compared
+    if timezone.is_naive(created_at):
+        raise InvalidCursor(cursor)
+    return created_at, message_id
+
+
+def _older(message, before):
+    return before is None or (message['created_at'], message['id']) < before
+
+
+def _hot_page(room_id, before, limit):
+    messages = ChatMessage.objects.filter(room_id=room_id)
+    if before is not None:
+        created_at, message_id = before
+        messages = messages.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+    rows = messages.order_by('-created_at', '-id').values(
+        'id', 'room_id', 'author_id', 'content', 'is_anonymous', 'is_system_message', 'created_at'
+    )[:limit]
+    return [
+        {
+            'id': row['id'], 'room': row['room_id'], 'author': row['author_id'],
+            'content': row['content'], 'is_anonymous': row['is_anonymous'],
+            'is_system_message': row['is_system_message'], 'created_at': row['created_at'],
+        }
+        for row in rows
+    ]
+
+
+def _archived_page(room_id, before, limit):
+    archives = ChatArchive.objects.filter(room_id=room_id).order_by('-day')
+    if before is not None:
+        archives = archives.filter(day__lte=timezone.localtime(before[0]).date())
+    page = []
+    # Days are fetched one at a time; a page rarely needs more than one or two
+    for archive in archives.iterator(chunk_size=1):
+        older = [message for message in iter_messages(archive) if _older(message, before)]
+        page.extend(reversed(older[-(limit - len(page)):]))
+        if len(page) >= limit:
+            break
+    return page
+
+
+def _display_names(messages):
+    named = {message['author'] for message in messages if not message['is_anonymous']}
+    users = get_user_model().objects.in_bulk(named) if named else {}
+    for message in messages:
+        if message['is_system_message']:
+            name = 'System'
+        elif message['is_anonymous'] or message['author'] not in users:
+            name = f"Anonymous User {message['author']}"
+        else:
+            name = users[message['author']].display_name
+        message['author_display_name'] = name
+    return messages
+
+
+def history_page(room_id, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Return ``(messages, next_cursor)`` with up to ``limit`` messages of
+    the room older than ``cursor``, newest first
+    """
+    before = decode_cursor(cursor) if cursor else None
+    page = _hot_page(room_id, before, limit)
+    if len(page) < limit:
+        last = (page[-1]['created_at'], page[-1]['id']) if page else before
+        page.extend(_archived_page(room_id, last, limit - len(page)))
+    next_cursor = encode_cursor(page[-1]) if len(page) == limit else None
+    return _display_names(page), next_cursor
@@ -0,0 +1,12 @@
+from .broker import get_broker, reset_broker
+from .persistence import get_writer, reset_writer
+from .presence import reset_presence
+
+
+async def shutdown():
+    """Flush pending messages and close the pub/sub connections"""
+    await get_writer().close()
+    await get_broker().close()
+    reset_writer()
+    reset_broker()
+    reset_presence()
@@ -0,0 +1,143 @@
+"""
+Batched storage of chat messages.
+
+Sockets hand messages to ``MessageWriter.add`` and carry on; a single
+background task writes whatever has accumulated with one ``bulk_create``
+every ``FLUSH_INTERVAL`` seconds, or sooner once ``BATCH_SIZE`` messages
+are waiting. Messages are broadcast before they are stored, so a busy
+room costs one INSERT per batch instead of one per message. Stored
+messages are queued for content screening (see ``community.screening``);
+a screening error is logged and never makes a stored batch look failed,
+which would store it twice.
+
+A batch that fails is retried with the next flush. After ``MAX_ATTEMPTS``
+failures it is stored row by row instead, and messages the database
+rejects (e.g. their room or author was deleted) are logged and dropped so
+they cannot hold up the messages behind them. While the database is
+unreachable at most ``MAX_PENDING`` messages wait; later ones are
+broadcast but not stored.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import DataError, IntegrityError, transaction
+
+from ..models import ChatMessage
+from ..screening import screen_chat_messages
+
+logger = logging.getLogger('performance')
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.25
+MAX_ATTEMPTS = 3
+MAX_PENDING = 20 * BATCH_SIZE
+
+
+def _screen(messages):
+    try:
+        screen_chat_messages(messages)
+    except Exception:
+        logger.exception(f"Queueing {len(messages)} stored chat messages for screening failed")
+
+
+def _store(messages):
+    with transaction.atomic():
+        stored = ChatMessage.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+    _screen(stored)
+    return len(stored)
+
+
+def _store_each(messages):
+    """
+    Store messages one at a time, dropping those the database rejects;
+    any other error (e.g. a lost connection) propagates
+    """
+    stored = []
+    for message in messages:
+        try:
+            with transaction.atomic():
+                message.save()
+        except (DataError, IntegrityError):
+            logger.exception(
+                f"Dropping chat message of user {message.author_id} in room {message.room_id}: it cannot be stored"
+            )
+        else:
+            stored.append(message)
+    _screen(stored)
+    return len(stored)
+
+
+class MessageWriter:
+    def __init__(self, batch_size=BATCH_SIZE, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending = []
+        self.wakeup = None
+        self.task = None
+        self.stored = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def add(self, message):
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.error(f"Chat message backlog is full; {self.dropped} messages were not stored")
+            return
+        self.pending.append(message)
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    async def run(self):
+        while self.pending:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        store = _store_each if self.failures >= MAX_ATTEMPTS else _store
+        try:
+            stored = await sync_to_async(store, thread_sensitive=True)(batch)
+        except Exception:
+            # Keep them for the next attempt rather than dropping the conversation
+            self.pending[:0] = batch
+            self.failures += 1
+            logger.exception(f"Storing {len(batch)} chat messages failed (attempt {self.failures})")
+            return 0
+        self.failures = 0
+        self.stored += stored
+        logger.debug(f"Stored {stored} chat messages")
+        return stored
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        while self.pending:
+            if not await self.flush():
+                break
+
+
+_writer = None
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        _writer = MessageWriter()
+    return _writer
+
+
+def reset_writer():
+    global _writer
+    _writer = None
@@ -0,0 +1,162 @@
+"""
+Participant tracking for chat rooms.
+
+A participant is a user with at least one open socket in the room, so a
+user with several tabs open takes a single seat. ``join`` checks the
+room's ``max_participants`` and takes the seat in one atomic step (a
+Lua script on Redis), so concurrent joins cannot overfill a room.
+
+On Redis each member also has a heartbeat time in a sorted set, refreshed
+by every open socket each ``HEARTBEAT_INTERVAL`` seconds. Members not seen
+for ``STALE_AFTER`` seconds, i.e. seats left behind by a worker that
+died, are pruned on every join and leave and are never counted, so they
+cannot keep a busy room's count inflated or its seats taken.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+
+from . import redis_url
+
+KEY_PREFIX = 'chat:presence:'
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL
+KEY_TTL = 24 * 3600  # removes the keys of rooms nobody joins any more
+
+# KEYS[1] room hash of user id -> open sockets, KEYS[2] sorted set of user
+# id by last heartbeat; ARGV[1] heartbeats older than this are stale
+PRUNE = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[1])
+for _, member in ipairs(stale) do
+    redis.call('HDEL', KEYS[1], member)
+end
+if #stale > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[1])
+end
+"""
+
+# ARGV stale before, now, user id, seat limit, ttl
+JOIN_SCRIPT = PRUNE + """
+if redis.call('HEXISTS', KEYS[1], ARGV[3]) == 0 and redis.call('HLEN', KEYS[1]) >= tonumber(ARGV[4]) then
+    return -1
+end
+redis.call('HINCRBY', KEYS[1], ARGV[3], 1)
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return redis.call('HLEN', KEYS[1])
+"""
+
+# ARGV stale before, user id
+LEAVE_SCRIPT = PRUNE + """
+if redis.call('HINCRBY', KEYS[1], ARGV[2], -1) <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[2])
+    redis.call('ZREM', KEYS[2], ARGV[2])
+end
+return redis.call('HLEN', KEYS[1])
+"""
+
+# ARGV now, user id, ttl
+TOUCH_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[2]) == 1 then
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return 0
+"""
+
+
+class LocalPresence:
+    """Participants of the rooms served by this process"""
+
+    def __init__(self):
+        self.rooms = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    async def join(self, room_id, user_id, max_participants):
+        """Take a seat; returns the participant count or None when the room is full"""
+        with self.lock:
+            sockets = self.rooms[room_id]
+            if user_id not in sockets and len(sockets) >= max_participants:
+                return None
+            sockets[user_id] += 1
+            return len(sockets)
+
+    async def leave(self, room_id, user_id):
+        with self.lock:
+            sockets = self.rooms[room_id]
+            sockets[user_id] -= 1
+            if sockets[user_id] <= 0:
+                del sockets[user_id]
+            if not sockets:
+                del self.rooms[room_id]
+                return 0
+            return len(sockets)
+
+    async def touch(self, room_id, user_id):
+        """Heartbeat; nothing to do, as the seats die with the process holding them"""
+
+    def counts(self, room_ids):
+        with self.lock:
+            return {room_id: len(self.rooms.get(room_id, ())) for room_id in room_ids}
+
+
+class RedisPresence:
+    """Participants of every worker, kept in one Redis hash and sorted set per room"""
+
+    def __init__(self, url):
+        import redis
+        import redis.asyncio as async_redis
+
+        self.redis = async_redis.Redis.from_url(url)
+        self.sync_redis = redis.Redis.from_url(url)
+        self.join_script = self.redis.register_script(JOIN_SCRIPT)
+        self.leave_script = self.redis.register_script(LEAVE_SCRIPT)
+        self.touch_script = self.redis.register_script(TOUCH_SCRIPT)
+
+    def keys(self, room_id):
+        # One hash tag so both keys live on the same cluster slot
+        return [f'{KEY_PREFIX}{{{room_id}}}', f'{KEY_PREFIX}{{{room_id}}}:seen']
+
+    async def join(self, room_id, user_id, max_participants):
+        now = time.time()
+        count = await self.join_script(
+            keys=self.keys(room_id), args=[now - STALE_AFTER, now, user_id, max_participants, KEY_TTL],
+        )
+        return None if count < 0 else count
+
+    async def leave(self, room_id, user_id):
+        return await self.leave_script(keys=self.keys(room_id), args=[time.time() - STALE_AFTER, user_id])
+
+    async def touch(self, room_id, user_id):
+        await self.touch_script(keys=self.keys(room_id), args=[time.time(), user_id, KEY_TTL])
+
+    def counts(self, room_ids):
+        room_ids = list(room_ids)
+        stale_before = time.time() - STALE_AFTER
+        with self.sync_redis.pipeline(transaction=False) as pipe:
+            for room_id in room_ids:
+                pipe.zcount(self.keys(room_id)[1], stale_before, '+inf')
+            return dict(zip(room_ids, pipe.execute()))
+
+
+_presence = None
+
+
+def get_presence():
+    global _presence
+    if _presence is None:
+        url = redis_url()
+        _presence = RedisPresence(url) if url else LocalPresence()
+    return _presence
+
+
+def reset_presence():
+    global _presence
+    _presence = None
+
+
+def participant_counts(room_ids):
+    """Open-seat counts for REST listings; one round trip for a page of rooms"""
+    return get_presence().counts(room_ids)
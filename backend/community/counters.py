@@ -0,0 +1,10 @@
+from counters.registry import register
+from .models import ForumCategory, ForumPost, ForumComment, ChatRoom, ModerationReport, PeerSupportMatch
+
+register('community.posts.approved', ForumPost, is_approved=True)
+register('community.comments.approved', ForumComment, is_approved=True)
+register('community.chat_rooms.active', ChatRoom, is_active=True)
+register('community.reports.total', ModerationReport)
+register('community.reports.pending', ModerationReport, status='pending')
+register('community.peer_matches.active', PeerSupportMatch, status='active')
+register('community.categories.total', ForumCategory)
@@ -0,0 +1,140 @@
+"""
+Likes on forum posts and comments.
+
+A like is set by inserting its row in a savepoint once the target is
+known to be approved; the ``(user, target)`` unique constraint rejects a
+repeated or concurrent like, and the foreign key a target deleted in the
+meantime. It is cleared with a single ``DELETE``. The target's
+``like_count`` is only adjusted when that statement changed a row, inside
+the same transaction, so concurrent or repeated requests can neither
+double count nor leave the counter out of step with the like rows.
+
+Feeds ask "which of these did the user like?" through ``liked_ids``,
+which answers a whole page from a cached per-user set of liked ids (one
+query to fill it, none afterwards). Users with very many likes are not
+cached and are answered with one ``IN`` query per page instead.
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .activity import invalidate_counts
+from .models import CommentLike, ForumComment, ForumPost, PostLike
+
+CACHE_PREFIX = 'forum:likes'
+CACHE_TTL = 3600
+MAX_CACHED_LIKES = 5000
+OVERFLOW = 'overflow'  # cached in place of the set for heavy likers
+
+LikeKind = namedtuple('LikeKind', ['name', 'like_model', 'target_model', 'target_field'])
+
+POST = LikeKind('post', PostLike, ForumPost, 'post_id')
+COMMENT = LikeKind('comment', CommentLike, ForumComment, 'comment_id')
+
+
+class LikeTargetNotFound(Exception):
+    pass
+
+
+def _cache_key(kind, user_id):
+    return f'{CACHE_PREFIX}:{kind.name}:{user_id}'
+
+
+def _insert_like(kind, user_id, target_id):
+    if not _exists(kind, target_id):
+        return 0
+    try:
+        with transaction.atomic():
+            kind.like_model.objects.create(user_id=user_id, **{kind.target_field: target_id})
+    except IntegrityError:
+        # Already liked, or the target was deleted since the check
+        return 0
+    return 1
+
+
+def _delete_like(kind, user_id, target_id):
+    deleted, _ = kind.like_model.objects.filter(user_id=user_id, **{kind.target_field: target_id}).delete()
+    return deleted
+
+
+def _changed(kind, user_id, target_id, delta):
+    kind.target_model.objects.filter(pk=target_id).update(
+        like_count=Greatest(F('like_count') + delta, Value(0))
+    )
+    transaction.on_commit(lambda: cache.delete(_cache_key(kind, user_id)))
+    invalidate_counts(user_id)
+    if kind is COMMENT:
+        # like_count is part of the cached comment tree. Imported here as
+        # threads uses the serializers, which use this module.
+        from .threads import invalidate_tree
+        post_id = ForumComment.objects.filter(pk=target_id).values_list('post_id', flat=True).first()
+        if post_id:
+            invalidate_tree(post_id)
+
+
+def set_like(user, kind, target_id, liked):
+    """
+    Make ``user``'s like of ``target_id`` match ``liked``. Idempotent;
+    returns True when a like row was actually added or removed.
+    """
+    with transaction.atomic():
+        if liked:
+            changed = _insert_like(kind, user.id, target_id)
+            if not changed and not _exists(kind, target_id):
+                raise LikeTargetNotFound(target_id)
+        else:
+            changed = _delete_like(kind, user.id, target_id)
+        if changed:
+            _changed(kind, user.id, target_id, 1 if liked else -1)
+    return bool(changed)
+
+
+def toggle_like(user, kind, target_id):
+    """Like ``target_id`` if ``user`` has not yet, unlike it otherwise; returns the new state"""
+    with transaction.atomic():
+        if _delete_like(kind, user.id, target_id):
+            _changed(kind, user.id, target_id, -1)
+            return False
+        if _insert_like(kind, user.id, target_id):
+            _changed(kind, user.id, target_id, 1)
+        elif not _exists(kind, target_id):
+            raise LikeTargetNotFound(target_id)
+        # Otherwise a concurrent request liked it first
+        return True
+
+
+def _exists(kind, target_id):
+    return kind.target_model.objects.filter(pk=target_id, is_approved=True).exists()
+
+
+def _liked_set(kind, user_id):
+    key = _cache_key(kind, user_id)
+    liked = cache.get(key)
+    if liked is not None:
+        return liked
+
+    ids = list(
+        kind.like_model.objects.filter(user_id=user_id)
+        .values_list(kind.target_field, flat=True)[:MAX_CACHED_LIKES + 1]
+    )
+    liked = OVERFLOW if len(ids) > MAX_CACHED_LIKES else frozenset(ids)
+    cache.set(key, liked, timeout=CACHE_TTL)
+    return liked
+
+
+def liked_ids(user, kind, ids):
+    """Return the subset of ``ids`` that ``user`` has liked"""
+    ids = set(ids)
+    if not ids or user is None or not user.is_authenticated:
+        return set()
+
+    liked = _liked_set(kind, user.id)
+    if liked != OVERFLOW:
+        return ids & liked
+    return set(
+        kind.like_model.objects.filter(user_id=user.id, **{f'{kind.target_field}__in': ids})
+        .values_list(kind.target_field, flat=True)
+    )
@@ -0,0 +1,131 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from accounts.models import User
+from community.models import ForumCategory, ForumPost
+from community.search import ranked, search_backend, search_posts
+
+TOPIC_WORDS = [
+    'anxiety', 'panic', 'sleep', 'exam', 'school', 'friends', 'family', 'journaling',
+    'breathing', 'exercise', 'therapy', 'mood', 'stress', 'lonely', 'hopeful', 'routine',
+    'music', 'walk', 'support', 'grief', 'motivation', 'confidence', 'social', 'media',
+    'homework', 'parents', 'relationship', 'coping', 'mindfulness', 'meditation',
+]
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'do', 'fi']
+QUERIES = ['panic', 'exam stress', 'sleep routine', 'mindful', 'journaling support']
+BENCHMARK_CATEGORY = 'Search benchmark'
+BENCHMARK_AUTHOR = 'searchbench'
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic forum corpus and compare indexed search with the old ILIKE scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000, help='Synthetic posts to create (e.g. 5000000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic posts afterwards')
+        parser.add_argument(
+            '--allow-production', action='store_true', help='Run even though DEBUG is off (seeds the live tables)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_production']:
+            raise CommandError(
+                'Refusing to seed synthetic posts with DEBUG off; pass --allow-production to run anyway'
+            )
+        rng = random.Random(42)
+        vocabulary, cum_weights = self.vocabulary(rng)
+        category, _ = ForumCategory.objects.get_or_create(
+            name=BENCHMARK_CATEGORY, defaults={'description': 'Synthetic posts for search benchmarks'}
+        )
+        # A dedicated inactive author that can sign nobody in and support nobody
+        author, _ = User.objects.get_or_create(
+            username=BENCHMARK_AUTHOR,
+            defaults={
+                'email': f'{BENCHMARK_AUTHOR}@example.com', 'password': '!',
+                'is_active': False, 'allow_peer_matching': False,
+            },
+        )
+
+        try:
+            self.seed(category, author, options['posts'], options['batch_size'], rng, vocabulary, cum_weights)
+            self.stdout.write(f"Search backend: {search_backend() or 'substring fallback'}")
+            for query in QUERIES:
+                indexed = self.time_query(
+                    lambda: list(ranked(
+                        search_posts(ForumPost.objects.filter(category=category), query, rank=True),
+                        '-last_activity',
+                    ).values_list('id', flat=True)[:20]),
+                    options['repeat'],
+                )
+                scan = self.time_query(
+                    lambda: list(self.legacy_search(category, query).values_list('id', flat=True)[:20]),
+                    options['repeat'],
+                )
+                self.stdout.write(f'{query!r}: indexed {indexed:.1f}ms, ILIKE scan {scan:.1f}ms')
+        finally:
+            if not options['keep']:
+                self.clean_up(category, author, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+    def vocabulary(self, rng):
+        """Topic words spread through a Zipf-distributed filler vocabulary"""
+        filler = {''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(20000)}
+        words = sorted(filler)
+        rng.shuffle(words)
+        for i, word in enumerate(TOPIC_WORDS):
+            words.insert(10 + i * 40, word)
+        return words, list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    def seed(self, category, author, total, batch_size, rng, vocabulary, cum_weights):
+        existing = ForumPost.objects.filter(category=category).count()
+        created = existing
+        while created < total:
+            size = min(batch_size, total - created)
+            ForumPost.objects.bulk_create([
+                ForumPost(
+                    title=' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=6)).capitalize(),
+                    content=' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=60)),
+                    author=author,
+                    category=category,
+                    # Unapproved, so listings, search and trending never show them
+                    is_approved=False,
+                )
+                for _ in range(size)
+            ])
+            created += size
+            self.stdout.write(f'Seeded {created}/{total} posts')
+
+    def clean_up(self, category, author, batch_size):
+        posts = ForumPost.objects.filter(category=category, author=author)
+        deleted = 0
+        while ids := list(posts.values_list('pk', flat=True)[:batch_size]):
+            deleted += ForumPost.objects.filter(pk__in=ids).delete()[1].get(ForumPost._meta.label, 0)
+            self.stdout.write(f'Deleted {deleted} synthetic posts')
+        if not ForumPost.objects.filter(category=category).exists():
+            category.delete()
+        if not ForumPost.objects.filter(author=author).exists():
+            author.delete()
+
+    def legacy_search(self, category, query):
+        # What DRF SearchFilter used to compile to
+        queryset = ForumPost.objects.filter(category=category)
+        for token in query.split():
+            queryset = queryset.filter(Q(title__icontains=token) | Q(content__icontains=token))
+        return queryset.order_by('-last_activity')
+
+    def time_query(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from accounts.models import User
+from community.matching import MAX_ACTIVE_MATCHES, SupporterIndex, eligible_supporters, run_matching
+from community.models import PeerSupportMatch
+
+TOPICS = [
+    'anxiety', 'stress', 'exams', 'sleep', 'loneliness', 'family', 'friendship', 'grief',
+    'self-esteem', 'motivation', 'bullying', 'social media', 'coping strategies', 'identity',
+]
+GENDERS = ['male', 'female', 'non_binary', '']
+AGE_RANGES = ['13-15', '16-17', '18-20', '21-23', '18-23', '']
+PREFIX = 'peerbench'
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic supporters and pending requests and time a full matching run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000)
+        parser.add_argument('--supporters', type=int, default=20000)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic users and requests')
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        started = time.perf_counter()
+        supporters = User.objects.bulk_create([
+            User(
+                username=f'{PREFIX}s{i}', email=f'{PREFIX}s{i}@example.com', password='!',
+                age=rng.randint(13, 23), gender=rng.choice(GENDERS),
+                specializations=rng.sample(TOPICS, rng.randint(1, 3)),
+            )
+            for i in range(options['supporters'])
+        ], batch_size=2000)
+        requesters = User.objects.bulk_create([
+            User(username=f'{PREFIX}r{i}', email=f'{PREFIX}r{i}@example.com', password='!', age=rng.randint(13, 23))
+            for i in range(options['requests'])
+        ], batch_size=2000)
+        PeerSupportMatch.objects.bulk_create([
+            PeerSupportMatch(
+                requester=requester,
+                preferred_topics=rng.sample(TOPICS, rng.randint(1, 3)),
+                preferred_age_range=rng.choice(AGE_RANGES),
+                preferred_gender=rng.choice(GENDERS),
+            )
+            for requester in requesters
+        ], batch_size=2000)
+        self.stdout.write(
+            f'Seeded {len(supporters)} supporters and {len(requesters)} requests '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+
+        try:
+            started = time.perf_counter()
+            index = SupporterIndex(eligible_supporters())
+            indexed = time.perf_counter() - started
+            assigned = run_matching(index=index)
+            total = time.perf_counter() - started
+            self.stdout.write(
+                f'Indexed {len(index)} supporters in {indexed:.2f}s; matched {len(assigned)} '
+                f'of {len(requesters)} requests in {total:.2f}s total'
+            )
+            overloaded = PeerSupportMatch.objects.filter(
+                supporter__username__startswith=PREFIX, status='active'
+            ).values('supporter').annotate(n=Count('pk')).filter(n__gt=MAX_ACTIVE_MATCHES).count()
+            self.stdout.write(f'Supporters over capacity: {overloaded}')
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith=PREFIX).delete()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
@@ -0,0 +1,46 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from community.screening.lexicon import LEXICON, get_matcher
+from community.screening.matcher import normalize
+
+WORDS = (
+    "i feel really tired today and school is a lot but my friends help me get through the week "
+    "honestly exams sleep family anxious calm better tomorrow talk thanks everyone for listening"
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Measure keyword screening throughput on synthetic messages (single core)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200000)
+        parser.add_argument('--words', type=int, default=20, help='Words per message')
+        parser.add_argument('--flagged', type=float, default=0.01, help='Share of messages containing a term')
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        terms = list(LEXICON)
+        messages = []
+        for _ in range(options['messages']):
+            words = [rng.choice(WORDS) for _ in range(options['words'])]
+            if rng.random() < options['flagged']:
+                words.insert(rng.randrange(len(words)), rng.choice(terms))
+            messages.append(' '.join(words))
+
+        started = time.perf_counter()
+        matcher = get_matcher()
+        compiled = time.perf_counter() - started
+        self.stdout.write(f'Compiled {len(matcher)} terms into {len(matcher.delta)} states in {compiled * 1000:.1f}ms')
+
+        started = time.perf_counter()
+        flagged = sum(1 for message in messages if matcher.find(normalize(message), normalized=True))
+        elapsed = time.perf_counter() - started
+        chars = sum(map(len, messages)) / len(messages)
+        self.stdout.write(
+            f'Screened {len(messages)} messages (~{chars:.0f} chars) in {elapsed:.2f}s: '
+            f'{len(messages) / elapsed:.0f} messages/s, {flagged} flagged'
+        )
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
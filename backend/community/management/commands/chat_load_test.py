@@ -0,0 +1,130 @@
+import asyncio
+import json
+import resource
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from community.chat.consumer import chat_application
+from community.chat.lifecycle import shutdown
+from community.chat.persistence import get_writer
+from community.models import ChatRoom
+
+LOAD_TEST_PREFIX = 'chatload'
+
+
+class Client:
+    """An in-process WebSocket client talking to the ASGI application"""
+
+    def __init__(self, user, room_id):
+        self.inbox = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.latencies = []
+        self.received = 0
+        self.closed_with = None
+        scope = {'type': 'websocket', 'path': f'/ws/chat/{room_id}/', 'query_string': b'', 'headers': [], 'user': user}
+        self.task = asyncio.create_task(chat_application(scope, self.inbox.get, self.on_send))
+
+    async def on_send(self, event):
+        if event['type'] == 'websocket.accept':
+            self.accepted.set()
+        elif event['type'] == 'websocket.close':
+            self.closed_with = event['code']
+            self.accepted.set()
+        else:
+            frame = json.loads(event['text'])
+            if frame['type'] == 'message':
+                self.received += 1
+                self.latencies.append(time.perf_counter() - frame['message']['nonce'])
+
+    async def connect(self):
+        await self.inbox.put({'type': 'websocket.connect'})
+        await self.accepted.wait()
+
+    async def say(self, content):
+        await self.inbox.put({
+            'type': 'websocket.receive',
+            'text': json.dumps({'type': 'message', 'content': content, 'nonce': time.perf_counter()}),
+        })
+
+    async def disconnect(self):
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await self.task
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Open many concurrent chat sockets against the ASGI application in process and measure fan-out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=10000)
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--messages', type=int, default=5, help='Messages sent to each room')
+
+    def handle(self, *args, **options):
+        sockets, room_count = options['sockets'], options['rooms']
+        per_room = -(-sockets // room_count)
+
+        users = User.objects.bulk_create([
+            User(username=f'{LOAD_TEST_PREFIX}{i}', email=f'{LOAD_TEST_PREFIX}{i}@example.com', password='!')
+            for i in range(sockets)
+        ], batch_size=1000)
+        rooms = ChatRoom.objects.bulk_create([
+            ChatRoom(name=f'Load test room {i}', description='Chat load test', max_participants=per_room)
+            for i in range(room_count)
+        ])
+        try:
+            async_to_sync(self.drive)(users, rooms, per_room, options['messages'])
+        finally:
+            ChatRoom.objects.filter(pk__in=[room.pk for room in rooms]).delete()
+            User.objects.filter(username__startswith=LOAD_TEST_PREFIX).delete()
+
+    async def drive(self, users, rooms, per_room, messages):
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        clients = [Client(user, rooms[i // per_room].pk) for i, user in enumerate(users)]
+        await asyncio.gather(*(client.connect() for client in clients))
+        connect_s = time.perf_counter() - started
+        refused = sum(1 for client in clients if client.closed_with is not None)
+        self.stdout.write(
+            f'Connected {len(clients) - refused} sockets in {len(rooms)} rooms in {connect_s:.2f}s '
+            f'({refused} refused), peak RSS {_rss_mb():.0f}MB (+{_rss_mb() - rss_before:.0f}MB)'
+        )
+
+        expected = sum(
+            min(per_room, len(clients) - i * per_room) * messages for i in range(len(rooms))
+        )
+        started = time.perf_counter()
+        for i in range(len(rooms)):
+            speaker = clients[i * per_room]
+            for n in range(messages):
+                await speaker.say(f'Load test message {n}')
+        while sum(client.received for client in clients) < expected:
+            if time.perf_counter() - started > 60:
+                break
+            await asyncio.sleep(0.01)
+        fan_out_s = time.perf_counter() - started
+        delivered = sum(client.received for client in clients)
+        latencies = sorted(latency for client in clients for latency in client.latencies)
+        if latencies:
+            self.stdout.write(
+                f'Delivered a burst of {delivered}/{expected} messages in {fan_out_s:.2f}s '
+                f'({delivered / fan_out_s:.0f}/s); latency p50 {statistics.median(latencies) * 1000:.1f}ms, '
+                f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms'
+            )
+
+        await get_writer().flush()
+        stored = get_writer().stored
+        started = time.perf_counter()
+        await asyncio.gather(*(client.disconnect() for client in clients))
+        self.stdout.write(
+            f'Stored {stored} messages in batches; disconnected all sockets in {time.perf_counter() - started:.2f}s'
+        )
+        await shutdown()
+        self.stdout.write(self.style.SUCCESS('Chat load test finished'))
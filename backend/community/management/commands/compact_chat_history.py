@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from community.chat.archive import HOT_DAYS, compact
+
+
+class Command(BaseCommand):
+    help = 'Move chat messages older than N days into compressed daily archives (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=HOT_DAYS, help='Keep this many days in the message table')
+        parser.add_argument('--room', type=int, action='append', dest='rooms', help='Only compact these rooms')
+
+    def handle(self, *args, **options):
+        days, moved = compact(options['days'], options['rooms'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} messages into {days} room-days'))
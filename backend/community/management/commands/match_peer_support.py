@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from community.matching import run_matching_job
+
+
+class Command(BaseCommand):
+    help = 'Match pending peer-support requests with eligible supporters (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        assigned = run_matching_job()
+        if assigned is None:
+            self.stdout.write(self.style.WARNING('Another matching run is in progress'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Matched {len(assigned)} peer-support requests'))
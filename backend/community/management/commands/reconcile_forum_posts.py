@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from community.categories import invalidate_listing
+from community.models import ForumCategory, ForumPost
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized comment_count and last_activity of forum posts and post_count of categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_ids', nargs='*', type=int, help='Only reconcile these posts')
+
+    def handle(self, *args, **options):
+        queryset = ForumPost.objects.all()
+        if options['post_ids']:
+            queryset = queryset.filter(pk__in=options['post_ids'])
+
+        before = dict(queryset.values_list('pk', 'comment_count'))
+        updated = queryset.reconcile_comment_stats()
+        drifted = sum(
+            1 for pk, count in queryset.values_list('pk', 'comment_count')
+            if before.get(pk) != count
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled {updated} posts ({drifted} with a drifted comment count)')
+        )
+        if options['post_ids']:
+            return
+
+        before = dict(ForumCategory.objects.values_list('pk', 'post_count'))
+        updated = ForumCategory.objects.reconcile_post_counts()
+        drifted = sum(
+            1 for pk, count in ForumCategory.objects.values_list('pk', 'post_count')
+            if before.get(pk) != count
+        )
+        invalidate_listing()
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled {updated} categories ({drifted} with a drifted post count)')
+        )
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+from community.models import ForumPost
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores of forum posts whose engagement changed (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = ForumPost.objects.refresh_hot_scores(batch_size=options['batch_size'])
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {updated} hot scores in {elapsed:.1f}ms'))
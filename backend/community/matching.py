@@ -0,0 +1,314 @@
+"""
+Peer-support matching engine.
+
+Eligible supporters are users who allow peer matching, are active, are
+not waiting for support themselves and have fewer than
+``MAX_ACTIVE_MATCHES`` active matches. They are loaded once per run into
+a ``SupporterIndex`` of bitsets (Python ints, one bit per supporter):
+one per age, gender, topic and current load. Supporters are numbered by
+rating, best first, so the lowest set bit of any candidate set is its
+best-rated member.
+
+For each pending request, oldest first, the candidate pool is a handful
+of AND/OR operations over those bitsets: the requested age band and
+gender, minus the requester. Within the pool the engine prefers the
+largest topic overlap, then the lowest current load, then the best
+rating. Assignments are written in batches with a compare-and-set
+``UPDATE ... WHERE status = 'pending' AND supporter IS NULL``, so a
+request accepted concurrently (by hand or by another run) is never
+assigned twice. These updates bypass the counter signals, so the
+``community.peer_matches.active`` counter is adjusted by hand.
+"""
+import logging
+import re
+import time
+from collections import defaultdict
+from itertools import combinations
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Avg, Case, Count, Q, Value, When
+from django.utils import timezone
+
+from counters.services import adjust
+from .activity import invalidate_counts
+from .models import PeerSupportMatch
+
+logger = logging.getLogger('performance')
+
+MAX_ACTIVE_MATCHES = 3
+ASSIGN_BATCH_SIZE = 1000
+MAX_TOPICS = 5  # topics of a request considered for overlap tiers
+ON_DEMAND_CANDIDATES = 500
+LOCK_KEY = 'community:matching:lock'
+LOCK_TIMEOUT = 300
+
+NO_PREFERENCE = {'', 'any', 'no_preference', 'prefer_not_to_say'}
+_RANGE_RE = re.compile(r'^\s*(\d+)\s*(?:-\s*(\d+)|(\+))?\s*$')
+
+
+def parse_age_range(value):
+    """'18-23' -> (18, 23), '18+' -> (18, None), '' -> None"""
+    match = _RANGE_RE.match(value or '')
+    if not match:
+        return None
+    low = int(match[1])
+    if match[3]:
+        return low, None
+    high = int(match[2]) if match[2] else low
+    return min(low, high), max(low, high)
+
+
+def normalize_topic(topic):
+    return str(topic).strip().lower()
+
+
+def lowest_bit(bits):
+    return (bits & -bits).bit_length() - 1
+
+
+class SupporterIndex:
+    """Bitset index over the supporters eligible for one matching run"""
+
+    def __init__(self, supporters):
+        # supporters: dicts with id, age, gender, topics, load, rating
+        supporters = sorted(supporters, key=lambda s: (-(s['rating'] or 0), s['id']))
+        self.ids = [supporter['id'] for supporter in supporters]
+        self.position = {supporter_id: i for i, supporter_id in enumerate(self.ids)}
+        self.by_age = defaultdict(int)
+        self.by_gender = defaultdict(int)
+        self.by_topic = defaultdict(int)
+        self.by_load = defaultdict(int)
+        self.all = 0
+        for i, supporter in enumerate(supporters):
+            bit = 1 << i
+            self.all |= bit
+            if supporter['age'] is not None:
+                self.by_age[supporter['age']] |= bit
+            if supporter['gender']:
+                self.by_gender[supporter['gender']] |= bit
+            for topic in supporter['topics']:
+                self.by_topic[normalize_topic(topic)] |= bit
+            self.by_load[supporter['load']] |= bit
+        self.available = 0
+        for load in range(MAX_ACTIVE_MATCHES):
+            self.available |= self.by_load[load]
+        self._pools = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def pool(self, age_range, gender):
+        """Supporters satisfying the age and gender constraints (cached per constraint)"""
+        key = (age_range, gender)
+        if key not in self._pools:
+            bits = self.all
+            if age_range is not None:
+                low, high = age_range
+                ages = 0
+                for age, age_bits in self.by_age.items():
+                    if age >= low and (high is None or age <= high):
+                        ages |= age_bits
+                bits &= ages
+            if gender not in NO_PREFERENCE:
+                bits &= self.by_gender.get(gender, 0)
+            self._pools[key] = bits
+        return self._pools[key]
+
+    def choose(self, request):
+        """Return the best available supporter id for ``request`` (a dict), or None"""
+        candidates = self.pool(parse_age_range(request['preferred_age_range']), request['preferred_gender'])
+        candidates &= self.available
+        requester = self.position.get(request['requester_id'])
+        if requester is not None:
+            candidates &= ~(1 << requester)
+        if not candidates:
+            return None
+
+        topics = {normalize_topic(topic) for topic in request['preferred_topics'] or []}
+        topic_bits = [self.by_topic.get(topic, 0) & candidates for topic in sorted(topics)[:MAX_TOPICS]]
+        topic_bits = [bits for bits in topic_bits if bits]
+        tier = candidates
+        # Supporters sharing at least k of the requested topics, largest k first
+        for k in range(len(topic_bits), 0, -1):
+            shared = 0
+            for combo in combinations(topic_bits, k):
+                both = combo[0]
+                for bits in combo[1:]:
+                    both &= bits
+                shared |= both
+            if shared:
+                tier = shared
+                break
+
+        for load in range(MAX_ACTIVE_MATCHES):
+            least_loaded = tier & self.by_load[load]
+            if least_loaded:
+                position = lowest_bit(least_loaded)
+                self._assign(position, load)
+                return self.ids[position]
+        return None
+
+    def _assign(self, position, load):
+        bit = 1 << position
+        self.by_load[load] &= ~bit
+        self.by_load[load + 1] |= bit
+        if load + 1 >= MAX_ACTIVE_MATCHES:
+            self.available &= ~bit
+
+    def release(self, supporter_id):
+        """Undo an assignment that lost the compare-and-set"""
+        position = self.position[supporter_id]
+        bit = 1 << position
+        for load in range(1, MAX_ACTIVE_MATCHES + 1):
+            if self.by_load[load] & bit:
+                self.by_load[load] &= ~bit
+                self.by_load[load - 1] |= bit
+                self.available |= bit
+                return
+
+
+def _available(users):
+    """``users`` who can take on another match, annotated with their load"""
+    waiting = PeerSupportMatch.objects.filter(status='pending').values('requester_id')
+    return (
+        users.filter(allow_peer_matching=True, is_active=True)
+        .exclude(pk__in=waiting)
+        .annotate(load=Count('support_provided', filter=Q(support_provided__status='active')))
+        .filter(load__lt=MAX_ACTIVE_MATCHES)
+    )
+
+
+def eligible_supporters(users=None):
+    """Supporter rows for the index; ``users`` narrows the candidate users"""
+    User = get_user_model()
+    users = users if users is not None else User.objects.all()
+    rows = (
+        _available(users)
+        .annotate(
+            rating=Avg('support_provided__supporter_rating', filter=Q(support_provided__status='completed')),
+        )
+        .values('id', 'age', 'gender', 'specializations', 'load', 'rating')
+    )
+    supporters = {}
+    for row in rows:
+        row['topics'] = set(row.pop('specializations') or [])
+        supporters[row['id']] = row
+
+    # Topics a supporter has already helped with count as experience
+    helped = PeerSupportMatch.objects.filter(
+        status='completed', supporter_id__in=list(supporters)
+    ).values_list('supporter_id', 'preferred_topics')
+    for supporter_id, topics in helped:
+        supporters[supporter_id]['topics'].update(topics or [])
+    return list(supporters.values())
+
+
+def _assign_batch(assignments, index):
+    """Compare-and-set a batch of ``{match_id: supporter_id}``; returns the ids that were assigned"""
+    now = timezone.now()
+    batch = PeerSupportMatch.objects.filter(pk__in=list(assignments))
+    with transaction.atomic():
+        batch.filter(status='pending', supporter__isnull=True).update(
+            supporter_id=Case(
+                *[When(pk=pk, then=Value(supporter)) for pk, supporter in assignments.items()],
+                output_field=models.BigIntegerField(),
+            ),
+            status='active',
+            matched_at=now,
+        )
+        # Our rows stay locked until commit; any other supporter or match
+        # time means a concurrent accept won the row
+        won = {
+            pk for pk, supporter, matched_at in batch.values_list('pk', 'supporter_id', 'matched_at')
+            if supporter == assignments[pk] and matched_at == now
+        }
+        adjust('community.peer_matches.active', len(won))
+    invalidate_counts(*{assignments[pk] for pk in won})
+    for pk, supporter in assignments.items():
+        if pk not in won:
+            index.release(supporter)
+    return won
+
+
+def run_matching(requests=None, index=None, batch_size=ASSIGN_BATCH_SIZE):
+    """
+    Match pending requests (all of them by default) with supporters;
+    returns a dict of ``{match_id: supporter_id}`` that were assigned
+    """
+    started = time.perf_counter()
+    if requests is None:
+        requests = PeerSupportMatch.objects.filter(status='pending', supporter__isnull=True)
+    # Read up front: the rows are updated while we go
+    rows = list(requests.order_by('created_at', 'id').values(
+        'id', 'requester_id', 'preferred_topics', 'preferred_age_range', 'preferred_gender'
+    ))
+    if index is None:
+        index = SupporterIndex(eligible_supporters())
+
+    assigned = {}
+    batch = {}
+    for request in rows:
+        supporter = index.choose(request)
+        if supporter is None:
+            continue
+        batch[request['id']] = supporter
+        if len(batch) >= batch_size:
+            won = _assign_batch(batch, index)
+            assigned.update((pk, batch[pk]) for pk in won)
+            batch = {}
+    if batch:
+        won = _assign_batch(batch, index)
+        assigned.update((pk, batch[pk]) for pk in won)
+
+    logger.info(
+        f"Peer matching assigned {len(assigned)} requests from {len(index)} supporters "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return assigned
+
+
+def run_matching_job():
+    """Periodic batch run; skipped while another run holds the lock"""
+    if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+        return None
+    try:
+        return run_matching()
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def match_now(match):
+    """
+    Try to match one new request right away against a narrowed candidate
+    set: the most recently active of the eligible supporters matching the
+    age and gender, all filtered in SQL
+    """
+    User = get_user_model()
+    users = User.objects.exclude(pk=match.requester_id)
+    age_range = parse_age_range(match.preferred_age_range)
+    if age_range is not None:
+        low, high = age_range
+        users = users.filter(age__gte=low)
+        if high is not None:
+            users = users.filter(age__lte=high)
+    if match.preferred_gender not in NO_PREFERENCE:
+        users = users.filter(gender=match.preferred_gender)
+    candidate_ids = _available(users).order_by('-last_active').values('pk')[:ON_DEMAND_CANDIDATES]
+    index = SupporterIndex(eligible_supporters(User.objects.filter(pk__in=candidate_ids)))
+    assigned = run_matching(PeerSupportMatch.objects.filter(pk=match.pk), index=index)
+    return assigned.get(match.pk)
+
+
+def accept(match_id, supporter):
+    """Manually accept a pending request; False if someone else got there first"""
+    accepted = bool(
+        PeerSupportMatch.objects.filter(pk=match_id, status='pending', supporter__isnull=True)
+        .exclude(requester=supporter)
+        .update(supporter=supporter, status='active', matched_at=timezone.now())
+    )
+    if accepted:
+        invalidate_counts(supporter.pk)
+        adjust('community.peer_matches.active', 1)
+    return accepted
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='forumpost',
+            index=models.Index(fields=['-last_activity'], name='forum_post_activity_idx'),
+        ),
+    ]
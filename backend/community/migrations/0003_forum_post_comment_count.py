@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:32
+
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_comment_stats(apps, schema_editor):
+    ForumPost = apps.get_model('community', 'ForumPost')
+    ForumComment = apps.get_model('community', 'ForumComment')
+    approved = ForumComment.objects.filter(post=OuterRef('pk'), is_approved=True).order_by().values('post')
+    ForumPost.objects.update(
+        comment_count=Coalesce(Subquery(approved.annotate(total=models.Count('pk')).values('total')), 0),
+        last_activity=Greatest(
+            F('created_at'),
+            Coalesce(Subquery(approved.annotate(latest=Max('created_at')).values('latest')), F('created_at')),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, help_text='Approved comments'),
+        ),
+        migrations.RunPython(backfill_comment_stats, migrations.RunPython.noop),
+    ]
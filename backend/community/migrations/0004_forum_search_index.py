@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:58
+
+from django.db import migrations
+
+from community.search import install_search_index, uninstall_search_index
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0003_forum_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
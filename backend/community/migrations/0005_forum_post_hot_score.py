@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+from community.trending import refresh_hot_scores
+
+
+def backfill_hot_scores(apps, schema_editor):
+    ForumPost = apps.get_model('community', 'ForumPost')
+    refresh_hot_scores(ForumPost.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_forum_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumpost',
+            name='hot_engagement',
+            field=models.PositiveIntegerField(default=0, help_text='Engagement points hot_score was computed from'),
+        ),
+        migrations.AddField(
+            model_name='forumpost',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='forumpost',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-hot_score', '-id'], name='forum_post_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forumpost',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['category', '-hot_score', '-id'], name='forum_post_cat_hot_idx'),
+        ),
+        migrations.RunPython(backfill_hot_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0005_forum_post_hot_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON lines, oldest message first')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'community_chat_archive',
+                'ordering': ['room', '-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'created_at', 'id'], name='chat_message_room_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatarchive',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='community.chatroom'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chatarchive',
+            unique_together={('room', 'day')},
+        ),
+    ]
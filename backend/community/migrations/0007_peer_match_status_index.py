@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0006_chat_history_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='peersupportmatch',
+            index=models.Index(fields=['status', 'created_at'], name='peer_match_status_idx'),
+        ),
+    ]
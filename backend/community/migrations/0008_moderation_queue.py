@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# ModerationReport.SEVERITY at the time of this migration
+SEVERITY = {
+    'crisis': 100,
+    'self_harm': 90,
+    'harassment': 60,
+    'inappropriate_content': 40,
+    'other': 20,
+    'spam': 10,
+}
+
+
+def backfill_priority(apps, schema_editor):
+    ModerationReport = apps.get_model('community', 'ModerationReport')
+    for report_type, priority in SEVERITY.items():
+        ModerationReport.objects.filter(report_type=report_type).update(priority=priority)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_peer_match_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationreport',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationreport',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_reports', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='moderationreport',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Severity of the report type, see SEVERITY'),
+        ),
+        migrations.AddIndex(
+            model_name='moderationreport',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-priority', 'created_at', 'id'], name='moderation_queue_idx'),
+        ),
+        migrations.RunPython(backfill_priority, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0008_moderation_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='moderationreport',
+            name='reporter',
+            field=models.ForeignKey(blank=True, help_text='Empty for reports raised by automated screening', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reports_made', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
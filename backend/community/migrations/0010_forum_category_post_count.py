@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:15
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_post_counts(apps, schema_editor):
+    ForumCategory = apps.get_model('community', 'ForumCategory')
+    ForumPost = apps.get_model('community', 'ForumPost')
+    approved = ForumPost.objects.filter(category=OuterRef('pk'), is_approved=True).order_by().values('category')
+    ForumCategory.objects.update(
+        post_count=Coalesce(Subquery(approved.annotate(total=models.Count('pk')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0009_automated_reports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumcategory',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, help_text='Approved posts'),
+        ),
+        migrations.RunPython(backfill_post_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0010_forum_category_post_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commentlike',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='comment_like_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forumcomment',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['author', '-created_at', '-id'], name='forum_comment_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forumpost',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['author', '-created_at', '-id'], name='forum_post_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peersupportmatch',
+            index=models.Index(fields=['requester', '-created_at', '-id'], name='peer_match_requester_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peersupportmatch',
+            index=models.Index(condition=models.Q(('matched_at__isnull', False)), fields=['supporter', '-matched_at', '-id'], name='peer_match_supporter_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postlike',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='post_like_user_idx'),
+        ),
+    ]
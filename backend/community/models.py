@@ -1,8 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinLengthValidator, MinValueValidator, MaxValueValidator
 
+from .trending import engagement, hot_score, refresh_hot_scores
+
+class ForumCategoryQuerySet(models.QuerySet):
+    def record_post(self, category_id, delta):
+        """Apply an approved-post change to ``post_count`` in a single UPDATE"""
+        return self.filter(pk=category_id).update(post_count=Greatest(F('post_count') + delta, Value(0)))
+
+    def reconcile_post_counts(self):
+        """Recompute post_count from the posts table"""
+        return self.update(**post_count_updates(ForumPost))
+
 class ForumCategory(models.Model):
     """Categories for organizing forum discussions"""
     name = models.CharField(max_length=100, unique=True)
@@ -11,8 +24,11 @@ class ForumCategory(models.Model):
     color = models.CharField(max_length=7, default="#3B82F6", help_text="Hex color code")
     is_active = models.BooleanField(default=True)
     order = models.PositiveIntegerField(default=0)
+    post_count = models.PositiveIntegerField(default=0, help_text="Approved posts")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ForumCategoryQuerySet.as_manager()
+
     class Meta:
         db_table = 'community_forum_category'
         verbose_name = 'Forum Category'
@@ -22,6 +38,62 @@ class ForumCategory(models.Model):
     def __str__(self):
         return self.name
 
+def comment_stats_updates(comment_model):
+    """
+    ``update()`` kwargs recomputing a post's denormalized comment columns
+    with correlated subqueries over ``comment_model``
+    """
+    approved = comment_model.objects.filter(
+        post=OuterRef('pk'), is_approved=True
+    ).order_by().values('post')
+    return {
+        'comment_count': Coalesce(
+            Subquery(approved.annotate(total=models.Count('pk')).values('total')), 0
+        ),
+        'last_activity': Greatest(
+            F('created_at'),
+            Coalesce(
+                Subquery(approved.annotate(latest=Max('created_at')).values('latest')),
+                F('created_at'),
+            ),
+        ),
+    }
+
+def post_count_updates(post_model):
+    """
+    ``update()`` kwargs recomputing a category's approved post count from
+    ``post_model``
+    """
+    approved = post_model.objects.filter(category=OuterRef('pk'), is_approved=True).order_by().values('category')
+    return {
+        'post_count': Coalesce(Subquery(approved.annotate(total=models.Count('pk')).values('total')), 0),
+    }
+
+class ForumPostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Join author and category so a page of posts serializes in one query"""
+        return self.select_related('author', 'category')
+
+    def record_comment(self, post_id, delta, activity_at=None):
+        """
+        Apply an approved-comment change to the denormalized columns of a
+        post in a single UPDATE, never moving last_activity backwards
+        """
+        updates = {'comment_count': Greatest(F('comment_count') + delta, Value(0))}
+        if activity_at is not None:
+            updates['last_activity'] = Greatest(F('last_activity'), Value(activity_at))
+        return self.filter(pk=post_id).update(**updates)
+
+    def reconcile_comment_stats(self):
+        """Recompute comment_count and last_activity from the comments table"""
+        return self.update(**comment_stats_updates(ForumComment))
+
+    def trending(self):
+        return self.filter(is_approved=True).order_by('-hot_score', '-id')
+
+    def refresh_hot_scores(self, batch_size=1000):
+        return refresh_hot_scores(self, batch_size)
+
 class ForumPost(models.Model):
     """Main forum posts/topics"""
     MOOD_CHOICES = [
@@ -45,6 +117,11 @@ class ForumPost(models.Model):
     # Engagement tracking
     view_count = models.PositiveIntegerField(default=0)
     like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0, help_text="Approved comments")
+
+    # Trending rank, refreshed by refresh_hot_scores (see community.trending)
+    hot_score = models.FloatField(default=0)
+    hot_engagement = models.PositiveIntegerField(default=0, help_text="Engagement points hot_score was computed from")
 
     # Mood context
     author_mood = models.CharField(max_length=20, choices=MOOD_CHOICES, blank=True)
@@ -54,17 +131,48 @@ class ForumPost(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_activity = models.DateTimeField(auto_now_add=True)
 
+    objects = ForumPostQuerySet.as_manager()
+
     class Meta:
         db_table = 'community_forum_post'
         ordering = ['-last_activity']
+        indexes = [
+            models.Index(fields=['-last_activity'], name='forum_post_activity_idx'),
+            models.Index(
+                fields=['-hot_score', '-id'], name='forum_post_hot_idx', condition=models.Q(is_approved=True)
+            ),
+            models.Index(
+                fields=['category', '-hot_score', '-id'], name='forum_post_cat_hot_idx',
+                condition=models.Q(is_approved=True),
+            ),
+            # Activity feed (see ``activity``)
+            models.Index(
+                fields=['author', '-created_at', '-id'], name='forum_post_author_idx',
+                condition=models.Q(is_approved=True),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.hot_score:
+            # Ranked by recency alone until it gets engagement
+            self.hot_engagement = engagement(self.like_count, self.comment_count, self.view_count)
+            self.hot_score = hot_score(self.hot_engagement, timezone.now())
+        # The category's post_count is updated by signal handlers and must
+        # commit together with the post
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
     @property
     def author_display_name(self):
         if self.is_anonymous:
-            return f"Anonymous User {self.author.id}"
+            return f"Anonymous User {self.author_id}"
         return self.author.display_name
 
 class ForumComment(models.Model):
@@ -88,14 +196,31 @@ class ForumComment(models.Model):
     class Meta:
         db_table = 'community_forum_comment'
         ordering = ['created_at']
+        indexes = [
+            # Activity feed (see ``activity``)
+            models.Index(
+                fields=['author', '-created_at', '-id'], name='forum_comment_author_idx',
+                condition=models.Q(is_approved=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Comment on {self.post.title}"
 
+    def save(self, *args, **kwargs):
+        # The post's comment_count/last_activity are updated by signal
+        # handlers and must commit together with the comment
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
     @property
     def author_display_name(self):
         if self.is_anonymous:
-            return f"Anonymous User {self.author.id}"
+            return f"Anonymous User {self.author_id}"
         return self.author.display_name
 
 class PostLike(models.Model):
@@ -107,6 +232,7 @@ class PostLike(models.Model):
     class Meta:
         db_table = 'community_post_like'
         unique_together = ['user', 'post']
+        indexes = [models.Index(fields=['user', '-created_at', '-id'], name='post_like_user_idx')]
 
 class CommentLike(models.Model):
     """Track likes on comments"""
@@ -117,6 +243,7 @@ class CommentLike(models.Model):
     class Meta:
         db_table = 'community_comment_like'
         unique_together = ['user', 'comment']
+        indexes = [models.Index(fields=['user', '-created_at', '-id'], name='comment_like_user_idx')]
 
 class PeerSupportMatch(models.Model):
     """Peer-to-peer support matching system"""
@@ -160,10 +287,36 @@ class PeerSupportMatch(models.Model):
     class Meta:
         db_table = 'community_peer_support_match'
         ordering = ['-created_at']
+        indexes = [
+            # Pending requests in arrival order for the matching engine
+            models.Index(fields=['status', 'created_at'], name='peer_match_status_idx'),
+            # Activity feed (see ``activity``)
+            models.Index(fields=['requester', '-created_at', '-id'], name='peer_match_requester_idx'),
+            models.Index(
+                fields=['supporter', '-matched_at', '-id'], name='peer_match_supporter_idx',
+                condition=models.Q(matched_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"Support match: {self.requester.username} - {self.status}"
 
+class ModerationReportQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Join the people and content a page of reports serializes"""
+        return self.select_related('reporter', 'moderator', 'claimed_by', 'reported_post', 'reported_comment')
+
+    def queue(self):
+        """Pending reports, most severe first and oldest first within a severity"""
+        return self.filter(status='pending').order_by('-priority', 'created_at', 'id')
+
+    def claimable(self, now=None):
+        """Pending reports nobody holds an unexpired claim on"""
+        now = now or timezone.now()
+        return self.filter(status='pending').filter(
+            models.Q(claimed_by__isnull=True) | models.Q(claim_expires_at__lte=now)
+        )
+
 class ModerationReport(models.Model):
     """Reports for inappropriate content"""
     REPORT_TYPES = [
@@ -175,6 +328,16 @@ class ModerationReport(models.Model):
         ('other', 'Other'),
     ]
 
+    # Queue priority per report type; safety reports jump the queue
+    SEVERITY = {
+        'crisis': 100,
+        'self_harm': 90,
+        'harassment': 60,
+        'inappropriate_content': 40,
+        'other': 20,
+        'spam': 10,
+    }
+
     STATUS_CHOICES = [
         ('pending', 'Pending Review'),
         ('reviewed', 'Reviewed'),
@@ -182,7 +345,13 @@ class ModerationReport(models.Model):
         ('dismissed', 'Dismissed'),
     ]
 
-    reporter = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reports_made')
+    reporter = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='reports_made',
+        help_text="Empty for reports raised by automated screening"
+    )
     report_type = models.CharField(max_length=30, choices=REPORT_TYPES)
     description = models.TextField()
 
@@ -207,12 +376,35 @@ class ModerationReport(models.Model):
     moderator_notes = models.TextField(blank=True)
     action_taken = models.TextField(blank=True)
 
+    # Triage queue
+    priority = models.PositiveSmallIntegerField(default=0, help_text="Severity of the report type, see SEVERITY")
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='claimed_reports'
+    )
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    objects = ModerationReportQuerySet.as_manager()
+
     class Meta:
         db_table = 'community_moderation_report'
         ordering = ['-created_at']
+        indexes = [
+            # The moderation queue only ever reads pending reports
+            models.Index(
+                fields=['-priority', 'created_at', 'id'], name='moderation_queue_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.priority = self.SEVERITY.get(self.report_type, 0)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Report: {self.report_type} - {self.status}"
@@ -254,6 +446,10 @@ class ChatMessage(models.Model):
     class Meta:
         db_table = 'community_chat_message'
         ordering = ['created_at']
+        indexes = [
+            # Room history scrollback and per-day compaction
+            models.Index(fields=['room', 'created_at', 'id'], name='chat_message_room_idx'),
+        ]
 
     def __str__(self):
         return f"{self.room.name}: {self.content[:50]}"
@@ -263,6 +459,23 @@ class ChatMessage(models.Model):
         if self.is_system_message:
             return "System"
         if self.is_anonymous:
-            return f"Anonymous User {self.author.id}"
+            return f"Anonymous User {self.author_id}"
         return self.author.display_name
-        
\ No newline at end of file
+
+class ChatArchive(models.Model):
+    """A room's messages of one day, compacted out of the message table (see community.chat.archive)"""
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='archives')
+    day = models.DateField()
+    message_count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField(help_text="zlib-compressed JSON lines, oldest message first")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'community_chat_archive'
+        ordering = ['room', '-day']
+        unique_together = ['room', 'day']
+
+    def __str__(self):
+        return f"{self.room.name}: {self.day} ({self.message_count} messages)"
@@ -0,0 +1,187 @@
+"""
+Moderation queue with claim/lease semantics.
+
+Pending reports are ordered by ``priority`` (the severity of the report
+type) and then by age, read from the partial ``moderation_queue_idx``
+index. A moderator pulls work by claiming the next few reports for a
+lease period; claimed reports are skipped by everyone else until they are
+resolved, released, or the lease runs out. A moderator who goes away
+therefore never strands work for longer than one lease.
+
+Claiming is a short ``SELECT ... FOR UPDATE SKIP LOCKED`` (where the
+database supports it) followed by a compare-and-set ``UPDATE``, so
+moderators pulling at the same time get disjoint reports without
+waiting on each other's row locks.
+
+Resolving, dismissing, hiding the reported content and locking its
+thread go through ``bulk_apply`` whether one report or hundreds are
+handled: the reports are read and locked once, then reports, posts and
+comments get a single ``UPDATE`` each. Hiding a reported comment hides
+that comment only, never the post it replies to; locking acts on the
+comment's post. Those updates bypass model signals, so counters,
+category post counts, post comment counts, the cached comment trees and
+category listing, and the authors' cached activity counts are kept up to
+date here.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from counters.services import adjust
+from .activity import invalidate_counts
+from .categories import invalidate_listing
+from .models import ForumCategory, ForumComment, ForumPost, ModerationReport
+from .threads import invalidate_tree
+
+LEASE = timedelta(minutes=15)
+DEFAULT_CLAIM = 10
+MAX_CLAIM = 50
+MAX_BULK = 500
+OPEN_STATUSES = ('pending', 'reviewed')
+
+# action: (new report status, (post field, value) to apply to the reported post, action_taken)
+ACTIONS = {
+    'resolve': ('resolved', None, ''),
+    'dismiss': ('dismissed', None, ''),
+    'hide_post': ('resolved', ('is_approved', False), 'Post hidden'),
+    'lock_thread': ('resolved', ('is_locked', True), 'Thread locked'),
+}
+COMMENT_HIDDEN = 'Comment hidden'  # action_taken of hide_post on a comment report
+# Report fields a bulk action may select open reports by, with their value type
+BULK_FILTERS = {'report_type': str, 'reported_user': int, 'reported_post': int}
+
+NOT_FOUND = 'not_found'
+ALREADY_CLOSED = 'already_closed'
+CLAIMED = 'claimed'
+NO_POST = 'no_post'
+
+
+def held_by(moderator, now=None):
+    """Pending reports ``moderator`` holds an unexpired claim on"""
+    now = now or timezone.now()
+    return ModerationReport.objects.filter(status='pending', claimed_by=moderator, claim_expires_at__gt=now)
+
+
+def claim(moderator, limit=DEFAULT_CLAIM, lease=LEASE):
+    """
+    Renew the moderator's current claims and top them up to ``limit``
+    from the head of the queue; returns the claimed reports in queue order
+    """
+    now = timezone.now()
+    expires = now + lease
+    renewed = held_by(moderator, now).update(claim_expires_at=expires)
+    wanted = limit - renewed
+    if wanted > 0:
+        with transaction.atomic():
+            candidates = ModerationReport.objects.claimable(now).queue().values_list('pk', flat=True)
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            ids = list(candidates[:wanted])
+            # Re-checked in the UPDATE: without SKIP LOCKED another claim may have won
+            ModerationReport.objects.claimable(now).filter(pk__in=ids).update(
+                claimed_by=moderator, claim_expires_at=expires
+            )
+    return held_by(moderator, now).queue().for_listing()
+
+
+def release(moderator, report_ids=None):
+    """Hand claimed reports back to the queue; returns how many were released"""
+    reports = ModerationReport.objects.filter(status='pending', claimed_by=moderator)
+    if report_ids is not None:
+        reports = reports.filter(pk__in=report_ids)
+    return reports.update(claimed_by=None, claim_expires_at=None)
+
+
+def bulk_apply(moderator, action, report_ids=None, filters=None, notes=''):
+    """
+    Apply ``action`` (see ``ACTIONS``) to the reports in ``report_ids`` or
+    to the open reports matching ``filters`` (at most ``MAX_BULK``) with
+    one UPDATE per table. Returns ``({report_id: outcome}, posts_changed,
+    comments_changed)`` where the outcome is the new report status or one
+    of ``NOT_FOUND``, ``ALREADY_CLOSED``, ``CLAIMED`` and ``NO_POST``.
+    """
+    report_status, post_changes, action_taken = ACTIONS[action]
+    hides = post_changes == ('is_approved', False)
+    now = timezone.now()
+    reports = ModerationReport.objects.all()
+    if report_ids is not None:
+        reports = reports.filter(pk__in=report_ids)
+    if filters:
+        reports = reports.filter(status__in=OPEN_STATUSES, **filters)
+    outcomes = {pk: NOT_FOUND for pk in report_ids or []}
+    applied, reopened, post_ids, comment_ids, comment_reports = [], 0, set(), set(), []
+    with transaction.atomic():
+        rows = (
+            reports.select_for_update(of=('self',)).order_by('pk')
+            .values_list(
+                'pk', 'status', 'claimed_by', 'claim_expires_at',
+                'reported_post', 'reported_comment', 'reported_comment__post',
+            )
+        )
+        for pk, current, claimed_by, expires, post_id, comment_id, comment_post_id in rows[:MAX_BULK]:
+            # Hiding acts on the reported comment alone, not the other replies
+            hides_comment = hides and comment_id is not None
+            post_id = None if hides_comment else post_id or comment_post_id
+            if current not in OPEN_STATUSES:
+                outcomes[pk] = ALREADY_CLOSED
+            elif claimed_by not in (None, moderator.pk) and expires > now:
+                outcomes[pk] = CLAIMED
+            elif post_changes and post_id is None and not hides_comment:
+                outcomes[pk] = NO_POST
+            else:
+                outcomes[pk] = report_status
+                applied.append(pk)
+                reopened += current == 'pending'
+                if hides_comment:
+                    comment_ids.add(comment_id)
+                    comment_reports.append(pk)
+                elif post_id is not None:
+                    post_ids.add(post_id)
+
+        if applied:
+            updates = {
+                'status': report_status, 'moderator': moderator, 'moderator_notes': notes,
+                'resolved_at': now, 'claimed_by': None, 'claim_expires_at': None,
+            }
+            if action_taken:
+                updates['action_taken'] = action_taken
+            ModerationReport.objects.filter(pk__in=applied).update(**updates)
+            if comment_reports:
+                ModerationReport.objects.filter(pk__in=comment_reports).update(action_taken=COMMENT_HIDDEN)
+            # Queryset updates bypass the counter signals
+            adjust('community.reports.pending', -reopened)
+
+        posts_changed = 0
+        if post_changes and post_ids:
+            field, value = post_changes
+            changed = {
+                pk: (category_id, author_id)
+                for pk, category_id, author_id in ForumPost.objects.filter(pk__in=post_ids)
+                .exclude(**{field: value}).values_list('pk', 'category', 'author')
+            }
+            posts_changed = ForumPost.objects.filter(pk__in=list(changed)).update(**{field: value})
+            if field == 'is_approved':
+                adjust('community.posts.approved', -posts_changed)
+                for category_id, hidden in Counter(category for category, _ in changed.values()).items():
+                    ForumCategory.objects.record_post(category_id, -hidden)
+                invalidate_listing()
+                invalidate_counts(*{author for _, author in changed.values()})
+            for post_id in changed:
+                invalidate_tree(post_id)
+
+        comments_changed = 0
+        if comment_ids:
+            changed = {
+                pk: (post_id, author_id)
+                for pk, post_id, author_id in ForumComment.objects.filter(pk__in=comment_ids, is_approved=True)
+                .values_list('pk', 'post', 'author')
+            }
+            comments_changed = ForumComment.objects.filter(pk__in=list(changed)).update(is_approved=False)
+            adjust('community.comments.approved', -comments_changed)
+            for post_id, hidden in Counter(post for post, _ in changed.values()).items():
+                ForumPost.objects.record_comment(post_id, -hidden)
+                invalidate_tree(post_id)
+            invalidate_counts(*{author for _, author in changed.values()})
+    return outcomes, posts_changed, comments_changed
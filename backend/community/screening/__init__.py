@@ -0,0 +1,51 @@
+"""
+Automated screening of new community content for self-harm and crisis
+language.
+
+New forum posts, comments and chat messages are handed to a worker pool
+once their write commits, off the request path:
+
+* ``matcher`` is an Aho–Corasick automaton over the curated ``lexicon``;
+  it scans text in one pass regardless of the number of terms.
+* ``pipeline`` batches the queued items, runs the keyword stage and the
+  optional classifier (``SCREENING_CLASSIFIER``, a dotted path), and
+  records ``keyword_detected``/``sentiment_detected`` crisis alerts plus
+  automated moderation reports.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from .pipeline import Item, get_pipeline
+
+
+def screen_later(source, object_id, author_id, text, **context):
+    """Queue content for screening once the current transaction commits"""
+    item = Item(source, object_id, author_id, text, context)
+    transaction.on_commit(lambda: get_pipeline().submit(item))
+
+
+def screen_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        screen_later(
+            'forum_post', instance.pk, instance.author_id, f"{instance.title}\n{instance.content}",
+            category_id=instance.category_id,
+        )
+
+
+def screen_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        screen_later('forum_comment', instance.pk, instance.author_id, instance.content, post_id=instance.post_id)
+
+
+def screen_chat_messages(messages):
+    """Chat messages are stored with ``bulk_create``, which sends no signals"""
+    for message in messages:
+        if not message.is_system_message:
+            screen_later('chat_message', message.pk, message.author_id, message.content, room_id=message.room_id)
+
+
+def connect():
+    from ..models import ForumComment, ForumPost
+
+    post_save.connect(screen_post, sender=ForumPost, dispatch_uid='community:screen_post')
+    post_save.connect(screen_comment, sender=ForumComment, dispatch_uid='community:screen_comment')
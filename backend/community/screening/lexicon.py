@@ -0,0 +1,81 @@
+"""
+Curated self-harm lexicon for the keyword stage.
+
+Terms map to ``CrisisAlert`` severity levels. Phrases describing intent
+or a plan are ``imminent``; statements of wanting to die or to hurt
+oneself are ``high``; expressions of hopelessness are ``moderate`` and
+only raise a moderation report, not a crisis alert. Terms are matched as
+whole words on case-folded text; list inflections explicitly.
+
+Deployments extend or override entries with ``SCREENING_EXTRA_TERMS``
+(``{term: severity}``) in settings.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+from .matcher import KeywordMatcher
+
+IMMINENT = 'imminent'
+HIGH = 'high'
+MODERATE = 'moderate'
+
+LEXICON = {
+    # Intent or plan
+    'kill myself': IMMINENT,
+    'killing myself': IMMINENT,
+    'going to kill myself': IMMINENT,
+    'end my life': IMMINENT,
+    'ending my life': IMMINENT,
+    'take my own life': IMMINENT,
+    'taking my own life': IMMINENT,
+    'suicide plan': IMMINENT,
+    'planning my suicide': IMMINENT,
+    'suicide note': IMMINENT,
+    'writing my goodbye': IMMINENT,
+    'overdose tonight': IMMINENT,
+    'jump off a bridge': IMMINENT,
+    'this is my last post': IMMINENT,
+    # Wanting to die or to self-harm
+    'suicide': HIGH,
+    'suicidal': HIGH,
+    'want to die': HIGH,
+    'wanna die': HIGH,
+    'wish i was dead': HIGH,
+    'wish i were dead': HIGH,
+    'better off dead': HIGH,
+    'better off without me': HIGH,
+    'no reason to live': HIGH,
+    'nothing to live for': HIGH,
+    "don't want to be alive": HIGH,
+    "don't want to live": HIGH,
+    'self harm': HIGH,
+    'self-harm': HIGH,
+    'selfharm': HIGH,
+    'hurt myself': HIGH,
+    'hurting myself': HIGH,
+    'cut myself': HIGH,
+    'cutting myself': HIGH,
+    'burn myself': HIGH,
+    'overdose': HIGH,
+    'od on': HIGH,
+    # Hopelessness
+    'hopeless': MODERATE,
+    'worthless': MODERATE,
+    "can't go on": MODERATE,
+    'cant go on': MODERATE,
+    "can't do this anymore": MODERATE,
+    'cant do this anymore': MODERATE,
+    'nobody would care': MODERATE,
+    'no one would care': MODERATE,
+    'nobody would miss me': MODERATE,
+    'give up on life': MODERATE,
+    'hate myself': MODERATE,
+    'disappear forever': MODERATE,
+}
+
+
+@lru_cache(maxsize=1)
+def get_matcher():
+    """The compiled matcher for the lexicon plus ``SCREENING_EXTRA_TERMS``"""
+    return KeywordMatcher({**LEXICON, **getattr(settings, 'SCREENING_EXTRA_TERMS', {})})
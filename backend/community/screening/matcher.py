@@ -0,0 +1,74 @@
+"""
+Aho–Corasick multi-pattern keyword matcher.
+
+The lexicon is compiled once into a deterministic automaton: the trie of
+all terms with the failure links folded into each state's transition
+table, so scanning costs one dict lookup per character no matter how
+many terms there are. Text is case-folded and its whitespace collapsed
+before scanning, and hits are only reported on word boundaries.
+"""
+from collections import deque, namedtuple
+
+Match = namedtuple('Match', 'term severity start end')
+
+
+def normalize(text):
+    """Case-fold, unify apostrophes and collapse whitespace"""
+    return ' '.join(text.casefold().replace('’', "'").split())
+
+
+class KeywordMatcher:
+    def __init__(self, lexicon):
+        # lexicon: {term: severity}
+        goto = [{}]
+        terms = [()]
+        for term in lexicon:
+            state = 0
+            for char in normalize(term):
+                following = goto[state].get(char)
+                if following is None:
+                    goto.append({})
+                    terms.append(())
+                    following = goto[state][char] = len(goto) - 1
+                state = following
+            terms[state] = (normalize(term),)
+
+        alphabet = {char for transitions in goto for char in transitions}
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        queue = deque([0])
+        while queue:
+            state = queue.popleft()
+            if state:
+                delta[state] = {**delta[fail[state]], **goto[state]}
+                terms[state] += terms[fail[state]]
+            else:
+                delta[0] = {char: goto[0].get(char, 0) for char in alphabet}
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]][char] if state else 0
+                queue.append(child)
+
+        # Transitions back to the root are the lookup default
+        self.delta = [{char: to for char, to in transitions.items() if to} for transitions in delta]
+        self.terms = terms
+        self.severity = {normalize(term): severity for term, severity in lexicon.items()}
+
+    def __len__(self):
+        return len(self.severity)
+
+    def find(self, text, normalized=False):
+        """Return the ``Match`` es in ``text``, in order of their end"""
+        text = text if normalized else normalize(text)
+        delta, terms = self.delta, self.terms
+        state = 0
+        matches = None
+        for end, char in enumerate(text, 1):
+            state = delta[state].get(char, 0)
+            if terms[state]:
+                for term in terms[state]:
+                    start = end - len(term)
+                    if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                        if matches is None:
+                            matches = []
+                        matches.append(Match(term, self.severity[term], start, end))
+        return matches or []
@@ -0,0 +1,261 @@
+"""
+Screening worker pool.
+
+``submit`` queues an item and returns; up to ``SCREENING_WORKERS``
+threads drain the queue in batches of ``BATCH_SIZE``. A batch runs the
+keyword stage, then the optional classifier on the whole batch, then
+writes its crisis alerts and moderation reports with one ``bulk_create``
+each. With ``SCREENING_WORKERS = 0`` items are screened on the caller's
+thread (tests, management commands); when more than ``MAX_PENDING`` items
+are waiting the caller screens its own item too, so a flood slows posting
+down instead of growing the queue without bound. Items are submitted once
+their content has committed, so a failure is logged, never raised to the
+caller.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from counters.services import record_created
+from crisis.models import CrisisAlert
+from ..models import ModerationReport
+from .lexicon import HIGH, IMMINENT, MODERATE, get_matcher
+from .matcher import normalize
+
+logger = logging.getLogger('performance')
+
+BATCH_SIZE = 200
+MAX_PENDING = 10000
+ALERT_COOLDOWN = timedelta(hours=1)  # one active alert per user and type at a time
+TRIGGER_CHARS = 2000
+METRICS_LOG_INTERVAL = 60
+
+SEVERITY_RANK = {level: rank for rank, (level, _) in enumerate(CrisisAlert.SEVERITY_LEVELS)}
+ALERT_SEVERITIES = {HIGH, IMMINENT}
+
+# source: ModerationReport field pointing at the content
+REPORTED_FIELDS = {'forum_post': 'reported_post_id', 'forum_comment': 'reported_comment_id', 'chat_message': None}
+
+Item = namedtuple('Item', 'source object_id author_id text context')
+
+
+class Metrics:
+    """Running totals of the pipeline, for throughput logging"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.screened = 0
+        self.flagged = 0
+        self.alerts = 0
+        self.reports = 0
+        self.keyword_seconds = 0.0
+        self.classifier_seconds = 0.0
+        self.write_seconds = 0.0
+        self._logged_at = time.monotonic()
+
+    def due(self):
+        """True once per ``METRICS_LOG_INTERVAL`` seconds"""
+        with self._lock:
+            if time.monotonic() - self._logged_at < METRICS_LOG_INTERVAL:
+                return False
+            self._logged_at = time.monotonic()
+            return True
+
+    def add(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            values = {name: value for name, value in vars(self).items() if not name.startswith('_')}
+        values['keyword_per_second'] = (
+            round(values['screened'] / values['keyword_seconds']) if values['keyword_seconds'] else None
+        )
+        return values
+
+
+def load_classifier(path):
+    """
+    Import the optional classifier: a callable (or a class to instantiate)
+    taking a list of texts and returning one risk score in [0, 1] per text
+    """
+    if not path:
+        return None
+    classifier = import_string(path)
+    return classifier() if isinstance(classifier, type) else classifier
+
+
+def classifier_severity(score, threshold):
+    if score is None or score < threshold:
+        return None
+    return HIGH if score >= (1 + threshold) / 2 else MODERATE
+
+
+class ScreeningPipeline:
+    def __init__(self, workers=None, classifier=None, threshold=None):
+        self.workers = settings.SCREENING_WORKERS if workers is None else workers
+        self.classifier = (
+            load_classifier(settings.SCREENING_CLASSIFIER) if classifier is None else classifier
+        )
+        self.threshold = settings.SCREENING_CLASSIFIER_THRESHOLD if threshold is None else threshold
+        self.matcher = get_matcher()
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._running = 0
+        self._executor = (
+            ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='screening') if self.workers else None
+        )
+
+    def submit(self, item):
+        if self._executor is None:
+            self._screen_logged([item])
+            return
+        with self._lock:
+            overflow = len(self._pending) >= MAX_PENDING
+            if not overflow:
+                self._pending.append(item)
+                start = self._running < self.workers
+                if start:
+                    self._running += 1
+        if overflow:
+            logger.warning("Screening queue full; screening on the caller's thread")
+            self._screen_logged([item])
+        elif start:
+            self._executor.submit(self._drain)
+
+    def _drain(self):
+        try:
+            while True:
+                with self._lock:
+                    batch, self._pending = self._pending[:BATCH_SIZE], self._pending[BATCH_SIZE:]
+                    if not batch:
+                        self._running -= 1
+                        return
+                self._screen_logged(batch)
+        finally:
+            close_old_connections()
+
+    def _screen_logged(self, items):
+        try:
+            self.screen(items)
+        except Exception:
+            logger.exception(f"Screening a batch of {len(items)} items failed")
+
+    def close(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def screen(self, items):
+        """Screen a batch and record its alerts and reports; returns the flagged items"""
+        started = time.perf_counter()
+        texts = [normalize(item.text) for item in items]
+        keyword_hits = [self.matcher.find(text, normalized=True) for text in texts]
+        keyword_seconds = time.perf_counter() - started
+
+        scores = [None] * len(items)
+        classifier_seconds = 0.0
+        if self.classifier is not None:
+            started = time.perf_counter()
+            scores = list(self.classifier([item.text for item in items]))
+            classifier_seconds = time.perf_counter() - started
+
+        flagged = []
+        for item, hits, score in zip(items, keyword_hits, scores):
+            keyword_severity = max((hit.severity for hit in hits), key=SEVERITY_RANK.get, default=None)
+            model_severity = classifier_severity(score, self.threshold)
+            if keyword_severity or model_severity:
+                flagged.append((item, hits, keyword_severity, score, model_severity))
+
+        started = time.perf_counter()
+        alerts, reports = self.record(flagged) if flagged else (0, 0)
+        self.metrics.add(
+            screened=len(items), flagged=len(flagged), alerts=alerts, reports=reports,
+            keyword_seconds=keyword_seconds, classifier_seconds=classifier_seconds,
+            write_seconds=time.perf_counter() - started,
+        )
+        logger.debug(
+            f"Screened {len(items)} items in {keyword_seconds * 1000:.1f}ms keyword / "
+            f"{classifier_seconds * 1000:.1f}ms classifier; {len(flagged)} flagged, "
+            f"{alerts} alerts, {reports} reports"
+        )
+        if self.metrics.due():
+            logger.info(f"Screening totals: {self.metrics.snapshot()}")
+        return flagged
+
+    def record(self, flagged):
+        now = timezone.now()
+        recent = set(
+            CrisisAlert.objects.filter(
+                user__in={item.author_id for item, *_ in flagged},
+                alert_type__in=['keyword_detected', 'sentiment_detected'],
+                status='active', created_at__gte=now - ALERT_COOLDOWN,
+            ).values_list('user_id', 'alert_type')
+        )
+        alerts, reports = [], []
+        for item, hits, keyword_severity, score, model_severity in flagged:
+            terms = sorted({hit.term for hit in hits})
+            context = {
+                **item.context, 'source': item.source, 'object_id': item.object_id,
+                'terms': terms, 'classifier_score': score,
+            }
+            if keyword_severity in ALERT_SEVERITIES:
+                alert = ('keyword_detected', keyword_severity)
+            elif model_severity in ALERT_SEVERITIES:
+                alert = ('sentiment_detected', model_severity)
+            else:
+                alert = None
+            if alert and (item.author_id, alert[0]) not in recent:
+                recent.add((item.author_id, alert[0]))
+                alerts.append(CrisisAlert(
+                    user_id=item.author_id, alert_type=alert[0], severity_level=alert[1],
+                    trigger_content=item.text[:TRIGGER_CHARS], context_data=context,
+                ))
+
+            report_type = 'crisis' if keyword_severity == IMMINENT else 'self_harm'
+            found = f"terms: {', '.join(terms)}" if terms else f"classifier score {score:.2f}"
+            report = ModerationReport(
+                reporter=None, report_type=report_type, reported_user_id=item.author_id,
+                priority=ModerationReport.SEVERITY[report_type],
+                description=f"Automated screening of {item.source.replace('_', ' ')} {item.object_id} ({found})",
+            )
+            field = REPORTED_FIELDS[item.source]
+            if field:
+                setattr(report, field, item.object_id)
+            reports.append(report)
+
+        with transaction.atomic():
+            created = CrisisAlert.objects.bulk_create(alerts) + ModerationReport.objects.bulk_create(reports)
+            # bulk_create sends no signals
+            record_created(created)
+        return len(alerts), len(reports)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = ScreeningPipeline()
+    return _pipeline
+
+
+def reset_pipeline():
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.close()
+        _pipeline = None
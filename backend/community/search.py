@@ -0,0 +1,300 @@
+"""
+Full-text search over forum posts and comments.
+
+On Postgres each table carries a generated, weighted ``search_vector``
+tsvector column (title 'A', content 'B') with a GIN index, so the
+database keeps it current on every write. On SQLite the same text feeds
+FTS5 external-content tables kept current by triggers and ranked with
+BM25. Without either index (e.g. a fresh test database) search falls back
+to unranked substring matching.
+
+Highlighting is done in Python on the page of results only, so it costs
+nothing per matching row and looks the same on every backend.
+"""
+import html
+import re
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+POST_TABLE = 'community_forum_post'
+COMMENT_TABLE = 'community_forum_comment'
+POST_FTS_TABLE = 'community_forum_post_fts'
+COMMENT_FTS_TABLE = 'community_forum_comment_fts'
+
+# Relative weight of a title match over a content match
+TITLE_WEIGHT = 4.0
+CONTENT_WEIGHT = 1.0
+PG_CONFIG = 'english'
+
+SNIPPET_WORDS = 30
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(term):
+    return _TOKEN_RE.findall((term or '').lower())
+
+
+def search_backend(using=None):
+    """Return 'postgres', 'fts5' or None for the substring fallback"""
+    conn = using or connection
+    if conn.vendor == 'postgresql':
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = 'search_vector'",
+                [POST_TABLE],
+            )
+            return 'postgres' if cursor.fetchone() else None
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [POST_FTS_TABLE]
+            )
+            return 'fts5' if cursor.fetchone() else None
+    return None
+
+
+def _match(queryset, table, fts_table, text_fields, tokens, rank):
+    backend = search_backend()
+
+    if backend == 'postgres':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        queryset = queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM {table} WHERE search_vector @@ to_tsquery(%s, %s)",
+            [PG_CONFIG, tsquery],
+        ))
+        if rank:
+            queryset = queryset.annotate(score=RawSQL(
+                f"ts_rank_cd({table}.search_vector, to_tsquery(%s, %s), 32)",
+                [PG_CONFIG, tsquery], output_field=FloatField(),
+            ))
+        return queryset
+
+    if backend == 'fts5':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        queryset = queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s", [match]
+        ))
+        if rank:
+            # bm25() can only be computed by the query that evaluates MATCH,
+            # so each matching row is scored by a correlated MATCH restricted
+            # to its rowid, which FTS5 answers by seeking in the doclists.
+            # bm25() is lower for better matches; negate it so higher is better.
+            weights = ', '.join(str(weight) for weight in text_fields.values())
+            queryset = queryset.annotate(score=RawSQL(
+                f"SELECT -bm25({fts_table}, {weights}) FROM {fts_table} "
+                f"WHERE {fts_table} MATCH %s AND {fts_table}.rowid = {table}.id",
+                [match], output_field=FloatField(),
+            ))
+        return queryset
+
+    for token in tokens:
+        condition = Q()
+        for field in text_fields:
+            condition |= Q(**{f'{field}__icontains': token})
+        queryset = queryset.filter(condition)
+    if rank:
+        queryset = queryset.annotate(score=Value(0.0, output_field=FloatField()))
+    return queryset
+
+
+def search_posts(queryset, term, rank=False):
+    """
+    Filter ``queryset`` to posts matching every token of ``term`` (as a
+    prefix). With ``rank`` the posts are annotated with a ``score``,
+    higher meaning more relevant.
+    """
+    tokens = tokenize(term)
+    if not tokens:
+        return queryset
+    return _match(
+        queryset, POST_TABLE, POST_FTS_TABLE,
+        {'title': TITLE_WEIGHT, 'content': CONTENT_WEIGHT}, tokens, rank,
+    )
+
+
+def search_comments(queryset, term, rank=False):
+    tokens = tokenize(term)
+    if not tokens:
+        return queryset
+    return _match(
+        queryset, COMMENT_TABLE, COMMENT_FTS_TABLE,
+        {'content': CONTENT_WEIGHT}, tokens, rank,
+    )
+
+
+def _parse_when(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is not None:
+            parsed = datetime.combine(day, datetime.min.time())
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_forum(queryset, params, date_field='created_at', prefix=''):
+    """Apply the category, mood and date range filters of a search request"""
+    category = params.get('category')
+    if category:
+        queryset = queryset.filter(**{f'{prefix}category_id': category})
+
+    mood = params.get('mood')
+    if mood:
+        queryset = queryset.filter(**{f'{prefix}author_mood': mood})
+
+    since = _parse_when(params.get('since'))
+    if since:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    until = _parse_when(params.get('until'))
+    if until:
+        queryset = queryset.filter(**{f'{date_field}__lte': until})
+    return queryset
+
+
+def ranked(queryset, tie_breaker):
+    return queryset.order_by('-score', tie_breaker)
+
+
+def highlight(text, term, max_words=SNIPPET_WORDS):
+    """
+    Return an HTML-escaped excerpt of ``text`` around the first match with
+    every word starting with a search token wrapped in ``<mark>``
+    """
+    tokens = tokenize(term)
+    words = (text or '').split()
+    if not words:
+        return ''
+
+    def is_match(word):
+        word = word.lower()
+        return any(
+            stripped.startswith(token)
+            for stripped in _TOKEN_RE.findall(word)
+            for token in tokens
+        )
+
+    first = next((i for i, word in enumerate(words) if is_match(word)), 0)
+    start = max(0, min(first - max_words // 3, len(words) - max_words))
+    excerpt = words[start:start + max_words]
+
+    parts = [
+        f'{HIGHLIGHT_OPEN}{html.escape(word)}{HIGHLIGHT_CLOSE}' if is_match(word) else html.escape(word)
+        for word in excerpt
+    ]
+    snippet = ' '.join(parts)
+    if start > 0:
+        snippet = '… ' + snippet
+    if start + max_words < len(words):
+        snippet += ' …'
+    return snippet
+
+
+def install_search_index(schema_editor):
+    """Create the vendor specific search index (used by migrations)"""
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        schema_editor.execute(
+            f"ALTER TABLE {POST_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{PG_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{PG_CONFIG}', coalesce(content, '')), 'B')) STORED"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {COMMENT_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{PG_CONFIG}', coalesce(content, ''))) STORED"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS forum_post_search_gin ON {POST_TABLE} USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS forum_comment_search_gin ON {COMMENT_TABLE} USING gin (search_vector)"
+        )
+    elif conn.vendor == 'sqlite':
+        _install_fts5(schema_editor, POST_TABLE, POST_FTS_TABLE, ['title', 'content'])
+        _install_fts5(schema_editor, COMMENT_TABLE, COMMENT_FTS_TABLE, ['content'])
+
+
+def _install_fts5(schema_editor, table, fts_table, columns):
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', tokenize='porter unicode61')"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def missing_triggers(using=None):
+    """Names of the FTS5 triggers absent from the forum tables"""
+    conn = using or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN (%s, %s)",
+            [POST_TABLE, COMMENT_TABLE],
+        )
+        present = {name for name, in cursor.fetchall()}
+    return [
+        f'{fts_table}_{suffix}'
+        for fts_table in (POST_FTS_TABLE, COMMENT_FTS_TABLE)
+        for suffix in ('ai', 'ad', 'au')
+        if f'{fts_table}_{suffix}' not in present
+    ]
+
+
+def repair_search_index(using=None):
+    """
+    Reinstall missing FTS5 triggers and rebuild the indexes; returns
+    whether anything was repaired.
+
+    SQLite rebuilds a table for most schema changes (e.g. any ``AddField``
+    on ``ForumPost``) and drops its triggers with it, after which new and
+    edited posts would silently go unindexed. ``post_migrate`` runs this
+    after every ``migrate`` (see ``signals``).
+    """
+    conn = using or connection
+    if search_backend(conn) != 'fts5' or not missing_triggers(conn):
+        return False
+    with conn.schema_editor() as schema_editor:
+        _install_fts5(schema_editor, POST_TABLE, POST_FTS_TABLE, ['title', 'content'])
+        _install_fts5(schema_editor, COMMENT_TABLE, COMMENT_FTS_TABLE, ['content'])
+    return True
+
+
+def uninstall_search_index(schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS forum_post_search_gin')
+        schema_editor.execute('DROP INDEX IF EXISTS forum_comment_search_gin')
+        schema_editor.execute(f'ALTER TABLE {POST_TABLE} DROP COLUMN IF EXISTS search_vector')
+        schema_editor.execute(f'ALTER TABLE {COMMENT_TABLE} DROP COLUMN IF EXISTS search_vector')
+    elif conn.vendor == 'sqlite':
+        for fts_table in (POST_FTS_TABLE, COMMENT_FTS_TABLE):
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {fts_table}')
@@ -1,45 +1,84 @@
+from django.db import models
 from rest_framework import serializers
 from .models import (
     ForumCategory, ForumPost, ForumComment, ChatRoom, 
     ChatMessage, PeerSupportMatch, ModerationReport
 )
 from accounts.models import User
+from .search import highlight
+from . import likes
+from .chat.presence import participant_counts
 
 
 class ForumCategorySerializer(serializers.ModelSerializer):
-    post_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = ForumCategory
         fields = ['id', 'name', 'description', 'icon', 'color', 'is_active', 'order', 'post_count']
-    
-    def get_post_count(self, obj):
-        return obj.posts.filter(is_approved=True).count()
+        read_only_fields = ['post_count']
+
+
+class LikedListSerializer(serializers.ListSerializer):
+    """Looks up the requesting user's likes for a whole page at once"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        self.child.liked = likes.liked_ids(
+            getattr(request, 'user', None), self.child.like_kind, [item.pk for item in items]
+        )
+        return super().to_representation(items)
 
 
 class ForumPostSerializer(serializers.ModelSerializer):
     author_display_name = serializers.ReadOnlyField()
-    comment_count = serializers.SerializerMethodField()
     category_name = serializers.CharField(source='category.name', read_only=True)
-    
+    liked_by_me = serializers.SerializerMethodField()
+
+    like_kind = likes.POST
+    liked = None
+
     class Meta:
         model = ForumPost
+        list_serializer_class = LikedListSerializer
         fields = [
             'id', 'title', 'content', 'author', 'author_display_name',
             'category', 'category_name', 'is_anonymous', 'is_pinned', 
             'is_locked', 'view_count', 'like_count', 'author_mood',
-            'created_at', 'updated_at', 'last_activity', 'comment_count'
+            'created_at', 'updated_at', 'last_activity', 'comment_count',
+            'liked_by_me'
+        ]
+        read_only_fields = [
+            'author', 'view_count', 'like_count', 'comment_count',
+            'created_at', 'updated_at', 'last_activity'
         ]
-        read_only_fields = ['author', 'view_count', 'like_count', 'created_at', 'updated_at', 'last_activity']
-    
-    def get_comment_count(self, obj):
-        return obj.comments.filter(is_approved=True).count()
     
+    def get_liked_by_me(self, obj):
+        if self.liked is None:
+            request = self.context.get('request')
+            return obj.pk in likes.liked_ids(getattr(request, 'user', None), self.like_kind, [obj.pk])
+        return obj.pk in self.liked
+
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
 
+class ForumPostSearchSerializer(ForumPostSerializer):
+    """Forum post search hit with relevance score and highlighted excerpts"""
+    score = serializers.FloatField(read_only=True)
+    title_highlight = serializers.SerializerMethodField()
+    snippet = serializers.SerializerMethodField()
+
+    class Meta(ForumPostSerializer.Meta):
+        fields = ForumPostSerializer.Meta.fields + ['score', 'title_highlight', 'snippet']
+
+    def get_title_highlight(self, obj):
+        return highlight(obj.title, self.context.get('search_term'))
+
+    def get_snippet(self, obj):
+        return highlight(obj.content, self.context.get('search_term'))
+
+
 class ForumCommentSerializer(serializers.ModelSerializer):
     author_display_name = serializers.ReadOnlyField()
     
@@ -52,24 +91,55 @@ class ForumCommentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['author', 'like_count', 'created_at', 'updated_at']
     
+    def validate_post(self, post):
+        if post.is_locked:
+            raise serializers.ValidationError("This thread is locked")
+        return post
+
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
 
+class ForumCommentSearchSerializer(ForumCommentSerializer):
+    """Forum comment search hit with the parent post title"""
+    post_title = serializers.CharField(source='post.title', read_only=True)
+    score = serializers.FloatField(read_only=True)
+    snippet = serializers.SerializerMethodField()
+
+    class Meta(ForumCommentSerializer.Meta):
+        fields = ForumCommentSerializer.Meta.fields + ['post_title', 'score', 'snippet']
+
+    def get_snippet(self, obj):
+        return highlight(obj.content, self.context.get('search_term'))
+
+
+class ChatRoomListSerializer(serializers.ListSerializer):
+    """Reads the participant counts of a whole page at once"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.participants = participant_counts([item.pk for item in items])
+        return super().to_representation(items)
+
+
 class ChatRoomSerializer(serializers.ModelSerializer):
     active_participants = serializers.SerializerMethodField()
-    
+
+    participants = None
+
     class Meta:
         model = ChatRoom
+        list_serializer_class = ChatRoomListSerializer
         fields = [
             'id', 'name', 'description', 'topic', 'max_participants',
             'is_active', 'is_moderated', 'active_participants', 'created_at'
         ]
     
     def get_active_participants(self, obj):
-        # In a real implementation, this would track active WebSocket connections
-        return 0
+        if self.participants is None:
+            return participant_counts([obj.pk])[obj.pk]
+        return self.participants.get(obj.pk, 0)
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -116,9 +186,9 @@ class ModerationReportSerializer(serializers.ModelSerializer):
             'id', 'reporter', 'reporter_name', 'report_type', 'description',
             'reported_post', 'reported_comment', 'reported_user',
             'status', 'moderator', 'moderator_name', 'moderator_notes',
-            'action_taken', 'created_at', 'resolved_at'
+            'action_taken', 'priority', 'claimed_by', 'claim_expires_at', 'created_at', 'resolved_at'
         ]
-        read_only_fields = ['reporter', 'created_at', 'resolved_at']
+        read_only_fields = ['reporter', 'priority', 'claimed_by', 'claim_expires_at', 'created_at', 'resolved_at']
     
     def create(self, validated_data):
         validated_data['reporter'] = self.context['request'].user
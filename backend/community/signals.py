@@ -0,0 +1,136 @@
+"""
+Keep the denormalized ``comment_count`` and ``last_activity`` columns of
+forum posts in step with their approved comments.
+
+Creating, approving, unapproving and deleting a comment each issue one
+``UPDATE`` with ``F()`` expressions on the parent post, inside the same
+transaction as the comment write (see ``ForumComment.save``). Bulk
+queryset updates bypass these handlers; ``reconcile_forum_posts`` repairs
+any drift.
+
+Every comment write also drops the post's cached comment tree (see
+``threads``) once the transaction commits.
+
+Posts do the same for the ``post_count`` of their category: creating,
+approving, unapproving, moving and deleting a post adjust the counts and
+drop the cached category listing (see ``categories``).
+
+Posts, comments and peer-support requests also drop their members'
+cached activity counts (see ``activity``).
+
+After every ``migrate`` the forum's FTS5 triggers are reinstalled if a
+table rebuild dropped them (see ``search.repair_search_index``).
+"""
+import logging
+
+from django.db import connections
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .activity import invalidate_counts
+from .categories import invalidate_listing
+from .models import ForumCategory, ForumComment, ForumPost, PeerSupportMatch
+from .search import repair_search_index
+from .threads import invalidate_tree
+
+logger = logging.getLogger('performance')
+
+APPROVAL_ATTR = '_loaded_is_approved'
+LISTING_ATTR = '_loaded_listing'
+
+
+def snapshot_approval(sender, instance, **kwargs):
+    if instance.pk is None or 'is_approved' in instance.get_deferred_fields():
+        value = None
+    else:
+        value = instance.is_approved
+    setattr(instance, APPROVAL_ATTR, value)
+
+
+def update_post_on_comment_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_tree(instance.post_id)
+    previous = False if created else getattr(instance, APPROVAL_ATTR, None)
+    setattr(instance, APPROVAL_ATTR, instance.is_approved)
+    if previous is None or previous == instance.is_approved:
+        return
+
+    invalidate_counts(instance.author_id)
+    if instance.is_approved:
+        ForumPost.objects.record_comment(instance.post_id, 1, activity_at=instance.created_at)
+    else:
+        ForumPost.objects.record_comment(instance.post_id, -1)
+
+
+def update_post_on_comment_delete(sender, instance, **kwargs):
+    invalidate_tree(instance.post_id)
+    invalidate_counts(instance.author_id)
+    if instance.is_approved:
+        ForumPost.objects.record_comment(instance.post_id, -1)
+
+
+def snapshot_listing(sender, instance, **kwargs):
+    if instance.pk is None or {'category_id', 'is_approved'} & instance.get_deferred_fields():
+        value = None
+    else:
+        value = (instance.category_id, instance.is_approved)
+    setattr(instance, LISTING_ATTR, value)
+
+
+def _record_post(category_id, approved, delta):
+    if approved:
+        ForumCategory.objects.record_post(category_id, delta)
+    return approved
+
+
+def update_category_on_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.category_id, instance.is_approved)
+    previous = (None, False) if created else getattr(instance, LISTING_ATTR, None)
+    setattr(instance, LISTING_ATTR, current)
+    if previous is None or previous == current:
+        return
+
+    if previous[1] != current[1]:
+        invalidate_counts(instance.author_id)
+    changed = _record_post(previous[0], previous[1], -1)
+    changed = _record_post(current[0], current[1], 1) or changed
+    if changed:
+        invalidate_listing()
+
+
+def update_category_on_post_delete(sender, instance, **kwargs):
+    invalidate_counts(instance.author_id)
+    if _record_post(instance.category_id, instance.is_approved, -1):
+        invalidate_listing()
+
+
+def invalidate_listing_on_category_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_listing()
+
+
+def invalidate_counts_on_match_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_counts(instance.requester_id, instance.supporter_id)
+
+
+def repair_search_index_after_migrate(sender, using, **kwargs):
+    if repair_search_index(connections[using]):
+        logger.info('Reinstalled the forum search triggers and rebuilt the index')
+
+
+post_init.connect(snapshot_approval, sender=ForumComment, dispatch_uid='community:comment_approval')
+post_save.connect(update_post_on_comment_save, sender=ForumComment, dispatch_uid='community:comment_save')
+post_delete.connect(update_post_on_comment_delete, sender=ForumComment, dispatch_uid='community:comment_delete')
+
+post_init.connect(snapshot_listing, sender=ForumPost, dispatch_uid='community:post_listing')
+post_save.connect(update_category_on_post_save, sender=ForumPost, dispatch_uid='community:post_save')
+post_delete.connect(update_category_on_post_delete, sender=ForumPost, dispatch_uid='community:post_delete')
+post_save.connect(invalidate_listing_on_category_change, sender=ForumCategory, dispatch_uid='community:category_save')
+post_delete.connect(
+    invalidate_listing_on_category_change, sender=ForumCategory, dispatch_uid='community:category_delete'
+)
+post_save.connect(invalidate_counts_on_match_change, sender=PeerSupportMatch, dispatch_uid='community:match_save')
+post_delete.connect(invalidate_counts_on_match_change, sender=PeerSupportMatch, dispatch_uid='community:match_delete')
@@ -1,3 +1,1189 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import DatabaseError, connection, models
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from counters.services import read_counters, reconcile
+from crisis.models import CrisisAlert
+from . import categories
+from .chat.archive import compact
+from .chat.broker import reset_broker
+from .chat.consumer import chat_application
+from .chat.history import encode_cursor
+from .chat.persistence import MAX_ATTEMPTS, MessageWriter, get_writer, reset_writer
+from .chat.presence import RedisPresence, participant_counts, reset_presence
+from .matching import MAX_ACTIVE_MATCHES, ON_DEMAND_CANDIDATES, run_matching
+from .models import (
+    ChatArchive, ChatMessage, ChatRoom, CommentLike, ForumCategory, ForumPost, ForumComment, ModerationReport,
+    PeerSupportMatch, PostLike,
+)
+from .screening import screen_chat_messages
+from .screening.lexicon import get_matcher
+from .screening.pipeline import Item, ScreeningPipeline, reset_pipeline
+from .search import (
+    highlight, install_search_index, missing_triggers, ranked, search_backend, search_posts, uninstall_search_index,
+)
+from .trending import DECAY_SECONDS, hot_score
+
+
+@override_settings(SCREENING_WORKERS=0)
+class CommunityTestCase(TestCase):
+    """Shared fixtures for community API tests"""
+
+    def setUp(self):
+        cache.clear()
+        reset_pipeline()
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', role='admin'
+        )
+        self.category = ForumCategory.objects.create(name='General', description='General talk')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_post(self, author=None, **kwargs):
+        defaults = {
+            'title': 'A post title',
+            'content': 'Some post content here',
+            'author': author or self.user,
+            'category': self.category,
+        }
+        defaults.update(kwargs)
+        return ForumPost.objects.create(**defaults)
+
+
+class CommunityStatsTest(CommunityTestCase):
+    """Aggregated and cached community dashboard"""
+
+    def test_admin_stats(self):
+        post = self.create_post()
+        self.create_post(author=self.admin, is_approved=False)
+        ForumComment.objects.create(post=post, author=self.admin, content='A reply here')
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('community-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_posts'], 1)
+        self.assertEqual(response.data['total_users_active'], 2)
+        self.assertEqual(response.data['posts_this_week'], 2)
+        self.assertEqual(response.data['total_comments'], 1)
+        self.assertEqual(response.data['total_categories'], 1)
+        self.assertIn('posts', response.data['compute_time_ms'])
+
+    def test_tiles_are_cached(self):
+        self.create_post()
+        self.client.get(reverse('community-stats'))
+        # One counter read plus the per-user post count on a warm cache
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('community-stats'))
+        self.assertEqual(response.data['user_posts'], 1)
+        self.assertNotIn('total_users_active', response.data)
+
+
+class ForumCategoryListingTest(CommunityTestCase):
+    """Cached, pre-serialized category listing with denormalized post counts"""
+
+    url = reverse('forum-category-list')
+
+    def counts(self):
+        return {row['name']: row['post_count'] for row in json.loads(self.client.get(self.url).content)['results']}
+
+    def test_listing_is_cached_and_revalidated(self):
+        with self.assertNumQueries(1):
+            first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(json.loads(first.content)['count'], 1)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.description = 'Changed'
+            self.category.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_listing_built_before_a_write_commits_is_not_served(self):
+        build = categories.build_listing
+
+        def build_racing_a_write():
+            listing = build()
+            # The write commits, and invalidates, before this request caches its body
+            with self.captureOnCommitCallbacks(execute=True):
+                self.category.description = 'Changed'
+                self.category.save()
+            return listing
+
+        with patch.object(categories, 'build_listing', build_racing_a_write):
+            stale = json.loads(self.client.get(self.url).content)
+        self.assertEqual(stale['results'][0]['description'], 'General talk')
+        fresh = json.loads(self.client.get(self.url).content)
+        self.assertEqual(fresh['results'][0]['description'], 'Changed')
+
+    def test_post_writes_keep_counts_current(self):
+        other = ForumCategory.objects.create(name='Exams', description='Exam stress')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+            self.create_post(category=other)
+        self.assertEqual(self.counts(), {'General': 1, 'Exams': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.category = other
+            post.save()
+        self.assertEqual(self.counts(), {'General': 0, 'Exams': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.is_approved = False
+            post.save()
+        self.assertEqual(self.counts(), {'General': 0, 'Exams': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ForumPost.objects.get(pk=post.pk).delete()
+            ForumPost.objects.filter(category=other).get().delete()
+        self.assertEqual(self.counts(), {'General': 0, 'Exams': 0})
+
+    def test_hidden_reported_posts_leave_the_counts(self):
+        post = self.create_post()
+        report = ModerationReport.objects.create(
+            reporter=self.user, report_type='spam', description='Spam', reported_post=post
+        )
+        self.assertEqual(self.counts(), {'General': 1})
+        moderator = APIClient()
+        moderator.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            moderator.post(reverse('moderation-bulk'), {'action': 'hide_post', 'reports': [report.pk]}, format='json')
+        self.assertEqual(self.counts(), {'General': 0})
+        call_command('reconcile_forum_posts', stdout=StringIO())
+        self.assertEqual(ForumCategory.objects.get().post_count, 0)
+
+
+class ForumPostListQueryTest(CommunityTestCase):
+    """Forum listing cost does not grow with the page size"""
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = self.create_post(title=f'Post number {i}', is_anonymous=bool(i % 2))
+            ForumComment.objects.create(post=post, author=self.admin, content='A reply here')
+            ForumComment.objects.create(
+                post=post, author=self.admin, content='Hidden reply', is_approved=False
+            )
+
+    def test_list_page_query_count(self):
+        self.create_posts(20)
+        # One COUNT for the paginator, one SELECT for the page and one to
+        # fill the user's cached like set
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('forum-post-list'))
+        self.assertEqual(len(response.data['results']), 20)
+        row = response.data['results'][0]
+        self.assertEqual(row['comment_count'], 1)
+        self.assertEqual(row['category_name'], 'General')
+
+    def test_cursor_page_query_count(self):
+        self.create_posts(20)
+        self.client.get(reverse('forum-post-list'))
+        # Like state now comes from the cache
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('forum-post-list'), {'pagination': 'cursor'})
+        self.assertEqual(len(response.data['results']), 20)
+
+
+class ForumPostDenormalizationTest(CommunityTestCase):
+    """comment_count and last_activity follow comment writes"""
+
+    def refresh(self, post):
+        post.refresh_from_db()
+        return post
+
+    def test_comment_lifecycle(self):
+        post = self.create_post()
+        started = post.last_activity
+
+        comment = ForumComment.objects.create(post=post, author=self.admin, content='A reply here')
+        post = self.refresh(post)
+        self.assertEqual(post.comment_count, 1)
+        self.assertGreaterEqual(post.last_activity, comment.created_at)
+        self.assertGreater(post.last_activity, started)
+
+        comment.is_approved = False
+        comment.save()
+        self.assertEqual(self.refresh(post).comment_count, 0)
+
+        comment = ForumComment.objects.get(pk=comment.pk)
+        comment.is_approved = True
+        comment.save()
+        self.assertEqual(self.refresh(post).comment_count, 1)
+
+        comment.delete()
+        self.assertEqual(self.refresh(post).comment_count, 0)
+
+    def test_unapproved_comments_do_not_count(self):
+        post = self.create_post()
+        ForumComment.objects.create(
+            post=post, author=self.admin, content='Pending reply', is_approved=False
+        )
+        self.assertEqual(self.refresh(post).comment_count, 0)
+
+    def test_reconcile_repairs_bulk_updates(self):
+        post = self.create_post()
+        ForumComment.objects.create(post=post, author=self.admin, content='A reply here')
+        ForumComment.objects.create(post=post, author=self.admin, content='Another reply')
+        # Queryset updates bypass the signal handlers
+        ForumComment.objects.filter(post=post).update(is_approved=False)
+        self.assertEqual(self.refresh(post).comment_count, 2)
+
+        call_command('reconcile_forum_posts', stdout=StringIO())
+        post = self.refresh(post)
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(post.last_activity, post.created_at)
+
+
+class ForumSearchTest(CommunityTestCase):
+    """Forum search without an index falls back to substring matching"""
+
+    def test_list_search_and_filters(self):
+        post = self.create_post(title='Coping with exam anxiety', author_mood='hopeful')
+        self.create_post(title='Sleep routines', content='Winding down before bed helps')
+
+        response = self.client.get(reverse('forum-post-list'), {'search': 'anxi'})
+        self.assertEqual([row['id'] for row in response.data['results']], [post.id])
+
+        response = self.client.get(reverse('forum-search'), {'q': 'exam', 'mood': 'struggling'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_empty_query(self):
+        self.create_post()
+        response = self.client.get(reverse('forum-search'), {'q': ' '})
+        self.assertEqual(response.data['results'], [])
+
+    def test_highlight(self):
+        snippet = highlight('Breathing <b>exercises</b> help with panic', 'exerc panic')
+        self.assertEqual(
+            snippet,
+            'Breathing <mark>&lt;b&gt;exercises&lt;/b&gt;</mark> help with <mark>panic</mark>',
+        )
+
+
+class ForumCommentThreadTest(CommunityTestCase):
+    """Nested comment trees loaded in one query and cached per post"""
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_post()
+        self.url = reverse('forum-post-thread', args=[self.post.pk])
+
+    def comment(self, parent=None, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ForumComment.objects.create(
+                post=self.post, author=self.user, content='A thoughtful reply',
+                parent_comment=parent, **kwargs
+            )
+
+    def test_tree_is_nested_and_cached(self):
+        first = self.comment()
+        reply = self.comment(parent=first)
+        self.comment(parent=reply)
+        second = self.comment()
+        hidden = self.comment(parent=second, is_approved=False)
+        self.comment(parent=hidden)
+
+        # Post, comment tree and the user's like set
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        comments = response.data['comments']
+        self.assertEqual([node['id'] for node in comments], [first.id, second.id])
+        self.assertEqual(comments[0]['replies'][0]['id'], reply.id)
+        self.assertEqual(len(comments[0]['replies'][0]['replies']), 1)
+        # Replies of an unapproved comment are hidden with it
+        self.assertEqual(comments[1]['replies'], [])
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        # A new comment invalidates the cached tree
+        self.comment(parent=second)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['comments'][1]['reply_count'], 1)
+
+    def test_depth_limit_and_load_more(self):
+        root = self.comment()
+        child = self.comment(parent=root)
+        grandchildren = [self.comment(parent=child) for _ in range(3)]
+
+        response = self.client.get(self.url, {'depth': 2})
+        node = response.data['comments'][0]['replies'][0]
+        self.assertEqual(node['replies'], [])
+        self.assertEqual(node['more_replies']['count'], 3)
+
+        response = self.client.get(self.url, {'cursor': node['more_replies']['cursor'], 'replies': 2})
+        self.assertEqual(response.data['parent_comment'], child.id)
+        self.assertEqual([c['id'] for c in response.data['comments']], [g.id for g in grandchildren[:2]])
+
+        response = self.client.get(self.url, {'cursor': response.data['more']['cursor'], 'replies': 2})
+        self.assertEqual([c['id'] for c in response.data['comments']], [grandchildren[2].id])
+        self.assertIsNone(response.data['more'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ForumLikeTest(CommunityTestCase):
+    """Like toggles keep like_count exact and feeds show the user's likes"""
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_post()
+        self.url = reverse('post-like', args=[self.post.pk])
+
+    def like_count(self):
+        return ForumPost.objects.get(pk=self.post.pk).like_count
+
+    def test_toggle(self):
+        response = self.client.post(self.url)
+        self.assertTrue(response.data['liked'])
+        self.assertEqual(self.like_count(), 1)
+
+        response = self.client.post(self.url)
+        self.assertFalse(response.data['liked'])
+        self.assertEqual(self.like_count(), 0)
+        self.assertFalse(PostLike.objects.exists())
+
+    def test_put_and_delete_are_idempotent(self):
+        self.client.put(self.url)
+        self.client.put(self.url)
+        self.assertEqual(self.like_count(), 1)
+        self.assertEqual(PostLike.objects.count(), 1)
+
+        self.client.delete(self.url)
+        response = self.client.delete(self.url)
+        self.assertFalse(response.data['liked'])
+        self.assertEqual(self.like_count(), 0)
+
+    def test_missing_or_unapproved_target(self):
+        hidden = self.create_post(is_approved=False)
+        response = self.client.post(reverse('post-like', args=[hidden.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.put(reverse('post-like', args=[999])).status_code, 404)
+
+    def test_feed_shows_liked_by_me(self):
+        other = self.create_post(title='Another post title')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url)
+
+        response = self.client.get(reverse('forum-post-list'))
+        liked = {row['id']: row['liked_by_me'] for row in response.data['results']}
+        self.assertEqual(liked, {self.post.id: True, other.id: False})
+
+        # Unliking drops the cached like set
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url)
+        response = self.client.get(reverse('forum-post-detail', args=[self.post.pk]))
+        self.assertFalse(response.data['liked_by_me'])
+
+    def test_comment_likes_in_thread(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = ForumComment.objects.create(post=self.post, author=self.admin, content='A kind reply')
+        thread_url = reverse('forum-post-thread', args=[self.post.pk])
+        self.client.get(thread_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('comment-like', args=[comment.pk]))
+        self.assertEqual(CommentLike.objects.count(), 1)
+
+        node = self.client.get(thread_url).data['comments'][0]
+        self.assertEqual(node['like_count'], 1)
+        self.assertTrue(node['liked_by_me'])
+
+
+class ForumTrendingTest(CommunityTestCase):
+    """Trending feed ordered by precomputed, time-decayed hot scores"""
+
+    def test_scores_follow_engagement_and_age(self):
+        now = timezone.now()
+        self.assertGreater(hot_score(10, now), hot_score(10, now - timedelta(days=1)))
+        self.assertGreater(hot_score(100, now), hot_score(10, now))
+        # Ten times the engagement is worth DECAY_SECONDS of recency
+        self.assertAlmostEqual(
+            hot_score(100, now - timedelta(seconds=DECAY_SECONDS)), hot_score(10, now), places=5
+        )
+
+    def test_refresh_only_touches_changed_posts(self):
+        quiet = self.create_post(title='Quiet post title')
+        busy = self.create_post(title='Busy post title')
+        self.assertEqual(ForumPost.objects.refresh_hot_scores(), 0)
+
+        ForumPost.objects.filter(pk=busy.pk).update(like_count=5, view_count=40)
+        with self.assertNumQueries(3):
+            # Stale rows, their bulk update, and the empty next batch
+            self.assertEqual(ForumPost.objects.refresh_hot_scores(), 1)
+        self.assertEqual(ForumPost.objects.refresh_hot_scores(), 0)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('forum-post-trending'), {'pagination': 'cursor'})
+        self.assertEqual([row['id'] for row in response.data['results']], [busy.id, quiet.id])
+
+    def test_bulk_created_posts_are_scored(self):
+        ForumPost.objects.bulk_create([
+            ForumPost(title='Imported post', content='Imported content', author=self.user, category=self.category)
+        ])
+        self.assertEqual(ForumPost.objects.refresh_hot_scores(), 1)
+        self.assertNotEqual(ForumPost.objects.get().hot_score, 0)
+
+
+class ChatSocket:
+    """Drives the chat ASGI application like a WebSocket client"""
+
+    def __init__(self, user, room_id, query_string=b''):
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        scope = {
+            'type': 'websocket', 'path': f'/ws/chat/{room_id}/',
+            'query_string': query_string, 'headers': [],
+        }
+        if user is not None:
+            scope['user'] = user
+        self.task = asyncio.create_task(chat_application(scope, self.inbox.get, self.outbox.put))
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outbox.get(), timeout=2)
+
+    async def receive_json(self):
+        return json.loads((await self.receive())['text'])
+
+    async def connect(self):
+        await self.inbox.put({'type': 'websocket.connect'})
+        return await self.receive()
+
+    async def send_json(self, data):
+        await self.inbox.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def disconnect(self):
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, timeout=2)
+
+
+class ChatSocketTest(CommunityTestCase):
+    """WebSocket chat: fan-out, seat limits, presence and batched storage"""
+
+    def setUp(self):
+        super().setUp()
+        reset_broker()
+        reset_presence()
+        reset_writer()
+        self.room = ChatRoom.objects.create(name='Evening check-in', description='Talk', max_participants=2)
+
+    async def test_messages_fan_out_and_are_stored_in_batches(self):
+        alice = ChatSocket(self.user, self.room.id)
+        bob = ChatSocket(self.admin, self.room.id)
+        self.assertEqual((await alice.connect())['type'], 'websocket.accept')
+        self.assertEqual((await alice.receive_json())['count'], 1)
+        await bob.connect()
+        self.assertEqual((await alice.receive_json())['count'], 2)
+        self.assertEqual(participant_counts([self.room.id]), {self.room.id: 2})
+
+        await alice.send_json({'type': 'message', 'content': 'Hi everyone', 'nonce': 'n1'})
+        await alice.send_json({'type': 'message', 'content': 'How is today?', 'is_anonymous': False})
+        first = await alice.receive_json()
+        self.assertEqual(first['message']['content'], 'Hi everyone')
+        self.assertEqual(first['message']['nonce'], 'n1')
+        await bob.receive_json()  # bob's own presence frame
+        self.assertEqual((await bob.receive_json())['message']['content'], 'Hi everyone')
+        self.assertFalse((await bob.receive_json())['message']['is_anonymous'])
+
+        # Both messages go out in one bulk_create
+        self.assertEqual(await get_writer().flush(), 2)
+        await bob.disconnect()
+        await alice.receive_json()  # bob's second message copy
+        self.assertEqual((await alice.receive_json())['count'], 1)
+        await alice.disconnect()
+        self.assertEqual(await ChatMessage.objects.filter(room=self.room).acount(), 2)
+
+    async def test_seat_limit(self):
+        sockets = [ChatSocket(self.user, self.room.id), ChatSocket(self.user, self.room.id)]
+        for socket in sockets:
+            self.assertEqual((await socket.connect())['type'], 'websocket.accept')
+        # Both tabs of one user take a single seat
+        self.assertEqual(participant_counts([self.room.id]), {self.room.id: 1})
+
+        other = await sync_to_async(User.objects.create_user)(
+            email='third@example.com', username='third', password='pass12345'
+        )
+        sockets.append(ChatSocket(self.admin, self.room.id))
+        await sockets[-1].connect()
+        full = ChatSocket(other, self.room.id)
+        self.assertEqual(await full.connect(), {'type': 'websocket.close', 'code': 4003})
+        for socket in sockets:
+            await socket.disconnect()
+        self.assertEqual(participant_counts([self.room.id]), {self.room.id: 0})
+
+    async def test_authentication_and_missing_room(self):
+        refused = ChatSocket(None, self.room.id)
+        self.assertEqual(await refused.connect(), {'type': 'websocket.close', 'code': 4001})
+
+        token = str(AccessToken.for_user(self.user))
+        socket = ChatSocket(None, self.room.id, query_string=f'token={token}'.encode())
+        self.assertEqual((await socket.connect())['type'], 'websocket.accept')
+        await socket.send_json({'type': 'message', 'content': ''})
+        await socket.receive_json()  # presence
+        self.assertEqual((await socket.receive_json())['type'], 'error')
+        await socket.disconnect()
+
+        missing = ChatSocket(self.user, 999)
+        self.assertEqual(await missing.connect(), {'type': 'websocket.close', 'code': 4004})
+
+
+    async def test_rejected_messages_do_not_block_the_writer(self):
+        writer = MessageWriter(max_pending=3)
+        good = ChatMessage(room_id=self.room.id, author_id=self.user.id, content='Still here')
+        # NOT NULL content: this message can never be stored
+        bad = ChatMessage(room_id=self.room.id, author_id=self.user.id, content=None)
+        writer.add(bad)
+        writer.add(good)
+        writer.task.cancel()
+        with self.assertLogs('performance', level='ERROR'):
+            for _ in range(MAX_ATTEMPTS):
+                self.assertEqual(await writer.flush(), 0)
+            self.assertEqual(len(writer.pending), 2)
+            # Then row by row: the good message is stored, the bad one dropped
+            self.assertEqual(await writer.flush(), 1)
+        self.assertEqual(writer.pending, [])
+        self.assertEqual(await ChatMessage.objects.filter(room=self.room).acount(), 1)
+
+        with self.assertLogs('performance', level='ERROR'):
+            for i in range(4):
+                writer.add(ChatMessage(room_id=self.room.id, author_id=self.user.id, content=f'Message {i}'))
+        writer.task.cancel()
+        self.assertEqual((len(writer.pending), writer.dropped), (3, 1))
+
+    async def test_screening_errors_do_not_store_a_batch_twice(self):
+        writer = MessageWriter()
+        writer.add(ChatMessage(room_id=self.room.id, author_id=self.user.id, content='Only once'))
+        writer.task.cancel()
+        with patch('community.chat.persistence.screen_chat_messages', side_effect=RuntimeError('screening down')):
+            with self.assertLogs('performance', level='ERROR'):
+                self.assertEqual(await writer.flush(), 1)
+        self.assertEqual((writer.pending, writer.failures), ([], 0))
+        self.assertEqual(await ChatMessage.objects.filter(room=self.room).acount(), 1)
+
+
+
+@skipUnless(settings.CHAT_REDIS_URL, 'needs a Redis server (CHAT_REDIS_URL)')
+class RedisPresenceTest(SimpleTestCase):
+    """Seats of sockets that stopped sending heartbeats are pruned"""
+
+    async def test_stale_seats_are_pruned(self):
+        presence = RedisPresence(settings.CHAT_REDIS_URL)
+        room_id = f'test-{id(self)}'
+        self.addCleanup(presence.sync_redis.delete, *presence.keys(room_id))
+
+        self.assertEqual(await presence.join(room_id, 1, 2), 1)
+        self.assertEqual(await presence.join(room_id, 2, 2), 2)
+        self.assertIsNone(await presence.join(room_id, 3, 2))
+        # User 2's worker died without leaving: its heartbeat stops
+        presence.sync_redis.zadd(presence.keys(room_id)[1], {'2': 0})
+        self.assertEqual(presence.counts([room_id]), {room_id: 1})
+        self.assertEqual(await presence.join(room_id, 3, 2), 2)
+        await presence.touch(room_id, 1)
+        self.assertEqual(await presence.leave(room_id, 3), 1)
+
+class ChatHistoryTest(CommunityTestCase):
+    """Keyset scrollback across the message table and the daily archives"""
+
+    def setUp(self):
+        super().setUp()
+        self.room = ChatRoom.objects.create(name='Evening check-in', description='Talk')
+        self.url = reverse('chat-room-history', args=[self.room.pk])
+        # Midday, so minute offsets never cross into another day
+        now = timezone.make_aware(datetime.combine(timezone.localdate(), time(12)))
+        messages = ChatMessage.objects.bulk_create([
+            ChatMessage(room=self.room, author=self.user, content=f'Message {i}') for i in range(6)
+        ])
+        # Two messages on each of three days: 40, 35 and 0 days ago
+        for message, days_ago in zip(messages, [40, 40, 35, 35, 0, 0]):
+            message.created_at = now - timedelta(days=days_ago, minutes=10 - message.id)
+        ChatMessage.objects.bulk_update(messages, ['created_at'])
+        self.ids = [message.id for message in messages]
+        self.oldest = messages[0].created_at
+
+    def scroll(self, limit):
+        seen, cursor = [], None
+        while True:
+            params = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get(self.url, params)
+            seen.extend(row['id'] for row in response.data['results'])
+            cursor = response.data['next']
+            if not cursor:
+                return seen
+
+    def test_scrollback_spans_hot_table_and_archives(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual([row['id'] for row in response.data['results']], self.ids[:3:-1])
+
+        self.assertEqual(compact(older_than_days=30), (2, 4))
+        self.assertEqual(ChatMessage.objects.count(), 2)
+        self.assertEqual(ChatArchive.objects.get(day=timezone.localdate() - timedelta(days=35)).message_count, 2)
+
+        # The same scrollback, whether or not messages were archived
+        for limit in (1, 3, 10):
+            self.assertEqual(self.scroll(limit), self.ids[::-1])
+
+    def test_invalid_cursors(self):
+        compact(older_than_days=30)
+        naive = encode_cursor({'created_at': datetime(2026, 1, 1), 'id': 5})
+        for cursor in ('bogus', naive):
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 400)
+
+    def test_archive_streams_and_merges_late_arrivals(self):
+        compact(older_than_days=30)
+        day = timezone.localdate() - timedelta(days=40)
+        late = ChatMessage.objects.create(room=self.room, author=self.admin, content='Late arrival')
+        ChatMessage.objects.filter(pk=late.pk).update(created_at=self.oldest - timedelta(minutes=30))
+        compact(older_than_days=30)
+
+        response = self.client.get(reverse('chat-room-archive', args=[self.room.pk, day.isoformat()]))
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([line['id'] for line in lines], [late.id] + self.ids[:2])
+
+        for invalid in ('yesterday', '2024-02-30'):
+            response = self.client.get(reverse('chat-room-archive', args=[self.room.pk, invalid]))
+            self.assertEqual(response.status_code, 400)
+
+
+class ModerationTestCase(CommunityTestCase):
+    """Reports of every severity and two moderators"""
+
+    def setUp(self):
+        super().setUp()
+        self.guide = User.objects.create_user(
+            email='guide@example.com', username='guide', password='pass12345', role='guide'
+        )
+        self.guide_client = APIClient()
+        self.guide_client.force_authenticate(self.guide)
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+        post = self.create_post()
+        self.reports = {
+            report_type: ModerationReport.objects.create(
+                reporter=self.user, report_type=report_type, description='Please look', reported_post=post
+            )
+            for report_type in ['spam', 'crisis', 'harassment', 'self_harm']
+        }
+
+    def ids(self, *report_types):
+        return [self.reports[report_type].id for report_type in report_types]
+
+
+class ModerationQueueTest(ModerationTestCase):
+    """Severity-ordered moderation queue with claim/lease semantics"""
+
+    def test_queue_is_severity_ordered_and_eager_loaded(self):
+        response = self.client.get(reverse('moderation-queue'))
+        self.assertEqual(response.status_code, 403)
+
+        with self.assertNumQueries(2):
+            response = self.guide_client.get(reverse('moderation-queue'))
+        self.assertEqual(
+            [row['id'] for row in response.data['results']], self.ids('crisis', 'self_harm', 'harassment', 'spam')
+        )
+        with self.assertNumQueries(2):
+            self.guide_client.get(reverse('moderation-reports'))
+
+    def test_claims_are_disjoint_and_leased(self):
+        response = self.guide_client.post(reverse('moderation-claim'), {'limit': 2}, format='json')
+        self.assertEqual([row['id'] for row in response.data['results']], self.ids('crisis', 'self_harm'))
+        response = self.admin_client.post(reverse('moderation-claim'), {'limit': 3}, format='json')
+        self.assertEqual([row['id'] for row in response.data['results']], self.ids('harassment', 'spam'))
+
+        # Pulling again renews the same claims instead of taking more
+        response = self.guide_client.post(reverse('moderation-claim'), {'limit': 2}, format='json')
+        self.assertEqual([row['id'] for row in response.data['results']], self.ids('crisis', 'self_harm'))
+
+        # Claimed reports can't be closed by someone else until the lease runs out
+        url = reverse('admin-moderation', args=[self.reports['crisis'].id])
+        self.assertEqual(self.admin_client.post(url, {'action': 'resolve'}, format='json').status_code, 409)
+        ModerationReport.objects.filter(claimed_by=self.guide).update(
+            claim_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.admin_client.post(reverse('moderation-claim'), {'limit': 3}, format='json')
+        self.assertEqual([row['id'] for row in response.data['results']], self.ids('crisis', 'harassment', 'spam'))
+
+        self.assertEqual(self.admin_client.post(url, {'action': 'resolve'}, format='json').status_code, 200)
+        self.assertEqual(self.admin_client.post(url, {'action': 'dismiss'}, format='json').status_code, 409)
+        resolved = ModerationReport.objects.get(pk=self.reports['crisis'].id)
+        self.assertEqual((resolved.status, resolved.moderator, resolved.claimed_by), ('resolved', self.admin, None))
+
+        response = self.admin_client.delete(reverse('moderation-claim'), {'reports': self.ids('spam')}, format='json')
+        self.assertEqual(response.data['released'], 1)
+        response = self.guide_client.get(reverse('moderation-queue'), {'claimable': 'true'})
+        self.assertEqual([row['id'] for row in response.data['results']], self.ids('self_harm', 'spam'))
+
+
+class ModerationBulkActionTest(ModerationTestCase):
+    """Set-based moderation actions over many reports"""
+
+    def test_bulk_hide_updates_reports_posts_and_counters(self):
+        spam_post = self.create_post(title='Buy cheap pills')
+        spam = [
+            ModerationReport.objects.create(
+                reporter=self.user, report_type='spam', description='Spam', reported_post=spam_post
+            )
+            for _ in range(3)
+        ]
+        ModerationReport.objects.filter(pk=spam[2].pk).update(
+            claimed_by=self.admin, claim_expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        reconcile(['community.reports.pending', 'community.posts.approved'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.guide_client.post(reverse('moderation-bulk'), {
+                'action': 'hide_post', 'reports': [spam[0].pk, spam[1].pk, spam[2].pk, 999],
+            }, format='json')
+        self.assertEqual(response.data['applied'], 2)
+        self.assertEqual(response.data['posts_changed'], 1)
+        self.assertEqual(response.data['results'], {
+            str(spam[0].pk): 'resolved', str(spam[1].pk): 'resolved', str(spam[2].pk): 'claimed', '999': 'not_found',
+        })
+        self.assertFalse(ForumPost.objects.get(pk=spam_post.pk).is_approved)
+        self.assertEqual(ModerationReport.objects.get(pk=spam[0].pk).action_taken, 'Post hidden')
+        self.assertEqual(
+            read_counters(['community.reports.pending', 'community.posts.approved']),
+            {'community.reports.pending': 5, 'community.posts.approved': 1},
+        )
+
+        # Filters pick up every open report of a kind, skipping the claimed one
+        response = self.guide_client.post(
+            reverse('moderation-bulk'), {'action': 'dismiss', 'filter': {'report_type': 'spam'}}, format='json'
+        )
+        self.assertEqual(response.data['results'], {
+            str(self.reports['spam'].pk): 'dismissed', str(spam[2].pk): 'claimed',
+        })
+
+    def test_hiding_a_reported_comment_keeps_the_thread(self):
+        post = self.create_post()
+        with self.captureOnCommitCallbacks(execute=True):
+            reply = ForumComment.objects.create(post=post, author=self.admin, content='Kind words')
+            abuse = ForumComment.objects.create(post=post, author=self.guide, content='Abuse')
+        reports = [
+            ModerationReport.objects.create(
+                reporter=self.user, report_type='harassment', description='Rude', reported_comment=abuse
+            )
+            for _ in range(2)
+        ]
+        reconcile(['community.posts.approved', 'community.comments.approved'])
+        thread_url = reverse('forum-post-thread', args=[post.pk])
+        self.assertIn('Abuse', json.dumps(self.client.get(thread_url).data, default=str))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.guide_client.post(reverse('moderation-bulk'), {
+                'action': 'hide_post', 'reports': [report.pk for report in reports],
+            }, format='json')
+        self.assertEqual((response.data['posts_changed'], response.data['comments_changed']), (0, 1))
+        post.refresh_from_db()
+        self.assertTrue(post.is_approved)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(
+            list(ForumComment.objects.filter(is_approved=True).values_list('pk', flat=True)), [reply.pk]
+        )
+        self.assertEqual(ModerationReport.objects.get(pk=reports[0].pk).action_taken, 'Comment hidden')
+        self.assertEqual(
+            read_counters(['community.posts.approved', 'community.comments.approved']),
+            {'community.posts.approved': 2, 'community.comments.approved': 1},
+        )
+        self.assertNotIn('Abuse', json.dumps(self.client.get(thread_url).data, default=str))
+
+        # Locking still acts on the comment's thread
+        report = ModerationReport.objects.create(
+            reporter=self.user, report_type='harassment', description='Rude', reported_comment=reply
+        )
+        response = self.admin_client.post(
+            reverse('admin-moderation', args=[report.pk]), {'action': 'lock_thread'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(ForumPost.objects.get(pk=post.pk).is_locked)
+
+    def test_locked_threads_refuse_comments(self):
+        report = self.reports['harassment']
+        response = self.admin_client.post(
+            reverse('admin-moderation', args=[report.pk]), {'action': 'lock_thread'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(ForumPost.objects.get(pk=report.reported_post_id).is_locked)
+        response = self.client.post(
+            reverse('forum-comment-list'), {'post': report.reported_post_id, 'content': 'Still talking'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_requests(self):
+        url = reverse('moderation-bulk')
+        for payload in [
+            {'action': 'delete_everything', 'reports': [1]},
+            {'action': 'resolve'},
+            {'action': 'resolve', 'reports': [1], 'filter': {'report_type': 'spam'}},
+            {'action': 'resolve', 'filter': {'status': 'resolved'}},
+            {'action': 'resolve', 'filter': {'reported_user': 'me'}},
+        ]:
+            self.assertEqual(self.guide_client.post(url, payload, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'action': 'resolve', 'reports': [1]}, format='json').status_code, 403)
+
+
+class ContentScreeningTest(CommunityTestCase):
+    """Keyword and classifier screening of new posts, comments and chat messages"""
+
+    def test_matcher_finds_whole_words_in_one_pass(self):
+        matcher = get_matcher()
+        found = matcher.find("Honestly I have a SUICIDE  plan and\nwant to die")
+        self.assertEqual(
+            [(match.term, match.severity) for match in found],
+            [('suicide', 'high'), ('suicide plan', 'imminent'), ('want to die', 'high')],
+        )
+        self.assertEqual(matcher.find('My skill myself is a typo; the overdosed plant is fine'), [])
+        self.assertEqual([match.term for match in matcher.find('I can’t go on')], ["can't go on"])
+
+    def test_new_content_raises_alerts_and_reports(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post(title='Rough week', content='I just want to die, nothing helps')
+            comment = ForumComment.objects.create(post=post, author=self.admin, content='Feeling hopeless too')
+            self.create_post(title='Study tips', content='Flashcards and sleep help a lot')
+            self.create_post(title='Still here', content='Thinking about self-harm again')
+
+        # One alert per user within the cooldown; hopelessness alone only raises a report
+        alert = CrisisAlert.objects.get()
+        self.assertEqual((alert.user, alert.alert_type, alert.severity_level), (self.user, 'keyword_detected', 'high'))
+        self.assertEqual(alert.context_data['object_id'], post.pk)
+        self.assertEqual(alert.context_data['terms'], ['want to die'])
+
+        reports = ModerationReport.objects.order_by('pk')
+        self.assertEqual(
+            [(report.reported_post_id, report.reported_comment_id, report.reporter) for report in reports],
+            [(post.pk, None, None), (None, comment.pk, None), (post.pk + 2, None, None)],
+        )
+        self.assertEqual({report.priority for report in reports}, {ModerationReport.SEVERITY['self_harm']})
+        moderator = APIClient()
+        moderator.force_authenticate(self.admin)
+        rows = moderator.get(reverse('moderation-queue')).data['results']
+        self.assertEqual([row['reporter'] for row in rows], [None] * 3)
+
+    def test_inline_screening_errors_are_logged(self):
+        reset_pipeline()
+        self.addCleanup(reset_pipeline)
+        with patch.object(ScreeningPipeline, 'record', side_effect=DatabaseError('alerts table locked')):
+            with self.assertLogs('performance', level='ERROR'), self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post(title='Rough week', content='I just want to die')
+        self.assertTrue(ForumPost.objects.filter(pk=post.pk).exists())
+        self.assertFalse(CrisisAlert.objects.exists())
+
+    def test_chat_messages_and_classifier(self):
+        room = ChatRoom.objects.create(name='Evening check-in', description='Talk')
+        messages = ChatMessage.objects.bulk_create([
+            ChatMessage(room=room, author=self.admin, content="I'm going to kill myself tonight"),
+            ChatMessage(room=room, author=self.user, content='Welcome', is_system_message=True),
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            screen_chat_messages(messages)
+        alert = CrisisAlert.objects.get()
+        self.assertEqual(
+            (alert.user, alert.severity_level, alert.context_data['room_id']), (self.admin, 'imminent', room.pk)
+        )
+        self.assertEqual(ModerationReport.objects.get().report_type, 'crisis')
+
+        pipeline = ScreeningPipeline(
+            workers=0, classifier=lambda texts: [0.97 if 'gone' in text else 0.1 for text in texts]
+        )
+        flagged = pipeline.screen([
+            Item('chat_message', 101, self.user.pk, 'Soon I will be gone', {'room_id': room.pk}),
+            Item('chat_message', 102, self.user.pk, 'See you tomorrow', {'room_id': room.pk}),
+        ])
+        self.assertEqual(len(flagged), 1)
+        self.assertEqual(
+            CrisisAlert.objects.filter(alert_type='sentiment_detected').get().severity_level, 'high'
+        )
+        self.assertEqual(pipeline.metrics.snapshot()['screened'], 2)
+
+
+class PeerMatchingTest(CommunityTestCase):
+    """Bitset-indexed matching of peer-support requests with supporters"""
+
+    def setUp(self):
+        super().setUp()
+        # self.user and self.admin are eligible supporters too; keep them out of the pool
+        User.objects.filter(pk__in=[self.user.pk, self.admin.pk]).update(allow_peer_matching=False)
+
+    def supporter(self, name, **kwargs):
+        return User.objects.create_user(
+            email=f'{name}@example.com', username=name, password='pass12345', **kwargs
+        )
+
+    def request(self, requester, **kwargs):
+        return PeerSupportMatch.objects.create(requester=requester, **kwargs)
+
+    def test_constraints_topics_and_capacity(self):
+        young = self.supporter('young', age=14, gender='female', specializations=['sleep'])
+        stressed = self.supporter('stressed', age=19, gender='female', specializations=['stress'])
+        anxious = self.supporter('anxious', age=20, gender='female', specializations=['anxiety', 'stress'])
+        male = self.supporter('male', age=20, gender='male', specializations=['anxiety', 'stress'])
+        requesters = [self.supporter(f'requester{i}', allow_peer_matching=False) for i in range(5)]
+        requests = [
+            self.request(requester, preferred_topics=['anxiety', 'stress'],
+                         preferred_age_range='18-23', preferred_gender='female')
+            for requester in requesters
+        ]
+
+        reconcile(['community.peer_matches.active'])
+        with self.captureOnCommitCallbacks(execute=True):
+            assigned = run_matching()
+        # Best topic overlap first, then the next best once it is full
+        self.assertEqual([assigned.get(request.pk) for request in requests],
+                         [anxious.pk] * MAX_ACTIVE_MATCHES + [stressed.pk] * 2)
+        self.assertNotIn(young.pk, assigned.values())
+        self.assertNotIn(male.pk, assigned.values())
+        self.assertEqual(PeerSupportMatch.objects.filter(status='active').count(), 5)
+        self.assertEqual(read_counters(['community.peer_matches.active']), {'community.peer_matches.active': 5})
+        self.assertEqual(run_matching(), {})
+
+    def test_requester_is_never_their_own_supporter(self):
+        lonely = self.supporter('lonely', age=18)
+        self.request(lonely)
+        # Waiting for support themselves, so not a supporter either
+        self.assertEqual(run_matching(), {})
+
+    def test_request_is_matched_on_creation(self):
+        helper = self.supporter('helper', age=18, specializations=['exams'])
+        response = self.client.post(reverse('peer-support-matching'), {'preferred_topics': ['exams']}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'active')
+        self.assertEqual(response.data['supporter'], helper.pk)
+
+    def test_on_demand_candidates_are_eligible_supporters(self):
+        helper = self.supporter('helper', age=18)
+        # More recently active members who cannot support anyone
+        User.objects.bulk_create([
+            User(email=f'busy{i}@example.com', username=f'busy{i}', allow_peer_matching=False)
+            for i in range(ON_DEMAND_CANDIDATES + 5)
+        ])
+        User.objects.filter(username__startswith='busy').update(last_active=timezone.now() + timedelta(hours=1))
+        response = self.client.post(reverse('peer-support-matching'), {}, format='json')
+        self.assertEqual(response.data['supporter'], helper.pk)
+
+    def test_accept_is_compare_and_set(self):
+        match = self.request(self.admin)
+        url = reverse('peer-support-match-action', args=[match.pk])
+        helper = self.supporter('helper')
+        late = APIClient()
+        late.force_authenticate(helper)
+
+        reconcile(['community.peer_matches.active'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.patch(url, {'action': 'accept'}, format='json').status_code, 200)
+        self.assertEqual(read_counters(['community.peer_matches.active']), {'community.peer_matches.active': 1})
+        self.assertEqual(late.patch(url, {'action': 'accept'}, format='json').status_code, 400)
+        # Lost the race after reading the match as still pending
+        PeerSupportMatch.objects.filter(pk=match.pk).update(status='pending')
+        with patch.object(PeerSupportMatch.objects, 'get', return_value=PeerSupportMatch(pk=match.pk)):
+            self.assertEqual(late.patch(url, {'action': 'accept'}, format='json').status_code, 409)
+        self.assertEqual(PeerSupportMatch.objects.get(pk=match.pk).supporter, self.user)
+
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        own = self.request(self.admin)
+        response = admin.patch(reverse('peer-support-match-action', args=[own.pk]), {'action': 'accept'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ActivityFeedTest(CommunityTestCase):
+    """The activity endpoint merges a member's events into one keyset-paged stream"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('user-forum-activity')
+        self.base = timezone.now() - timedelta(days=1)
+
+    def at(self, minutes):
+        return self.base + timedelta(minutes=minutes)
+
+    def build_history(self):
+        post = self.create_post(title='My first post')
+        other = self.create_post(author=self.admin, title='Somebody else')
+        comment = ForumComment.objects.create(post=other, author=self.user, content='Thanks for sharing')
+        ForumComment.objects.create(post=other, author=self.user, content='Hidden reply', is_approved=False)
+        post_like = PostLike.objects.create(user=self.user, post=other)
+        comment_like = CommentLike.objects.create(
+            user=self.user, comment=ForumComment.objects.create(post=post, author=self.admin, content='Welcome!'),
+        )
+        request = PeerSupportMatch.objects.create(requester=self.user)
+        helped = PeerSupportMatch.objects.create(
+            requester=self.admin, supporter=self.user, status='active', matched_at=self.at(5),
+        )
+        ForumPost.objects.filter(pk=post.pk).update(created_at=self.at(0))
+        ForumComment.objects.filter(pk=comment.pk).update(created_at=self.at(1))
+        PostLike.objects.filter(pk=post_like.pk).update(created_at=self.at(2))
+        # Same instant: ordered by kind
+        CommentLike.objects.filter(pk=comment_like.pk).update(created_at=self.at(3))
+        PeerSupportMatch.objects.filter(pk=request.pk).update(created_at=self.at(3))
+        return [
+            ('peer_support', helped.pk), ('peer_request', request.pk), ('comment_like', comment_like.pk),
+            ('post_like', post_like.pk), ('comment', comment.pk), ('post', post.pk),
+        ]
+
+    def test_merged_stream_and_counts(self):
+        expected = self.build_history()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(event['kind'], event['id']) for event in response.data['results']], expected)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(response.data['results'][3]['title'], 'Somebody else')
+        self.assertEqual(response.data['results'][0]['status'], 'active')
+        self.assertEqual(response.data['counts'], {
+            'posts': 1, 'comments': 1, 'post_likes': 1, 'comment_likes': 1, 'peer_requests': 1, 'peer_supported': 1,
+        })
+        self.assertEqual(response.data['total_posts'], 1)
+
+    def test_keyset_pages(self):
+        expected = self.build_history()
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(self.url, {'limit': 4, 'cursor': cursor} if cursor else {'limit': 4})
+            seen += [(event['kind'], event['id']) for event in response.data['results']]
+            cursor = response.data['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_one_query_per_page_with_cached_counts(self):
+        self.build_history()
+        self.client.get(self.url)
+        # Authentication is forced, so the page and nothing else hits the database
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_writes_refresh_counts(self):
+        self.assertEqual(self.client.get(self.url).data['counts']['posts'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+        self.assertEqual(self.client.get(self.url).data['counts']['posts'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('post-like', args=[post.pk]))
+        self.assertEqual(self.client.get(self.url).data['counts']['post_likes'], 1)
+
+        report = ModerationReport.objects.create(
+            reporter=self.admin, reported_user=self.user, reported_post=post, report_type='spam',
+        )
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.post(reverse('moderation-bulk'), {'action': 'hide_post', 'reports': [report.pk]}, format='json')
+        counts = self.client.get(self.url).data['counts']
+        self.assertEqual((counts['posts'], counts['post_likes']), (0, 0))
+
+
+class ForumSearchFTS5Test(TransactionTestCase):
+    """Ranked search through the SQLite FTS5 shadow tables"""
+
+    def setUp(self):
+        with connection.schema_editor() as schema_editor:
+            install_search_index(schema_editor)
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.category = ForumCategory.objects.create(name='General', description='General talk')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        with connection.schema_editor() as schema_editor:
+            uninstall_search_index(schema_editor)
+
+    def create_post(self, title, content):
+        return ForumPost.objects.create(
+            title=title, content=content, author=self.user, category=self.category
+        )
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(search_backend(), 'fts5')
+        in_content = self.create_post('Weekly check in', 'Talking about panic attacks today')
+        in_title = self.create_post('Panic attacks at school', 'What helped me get through it')
+        self.create_post('Sleep routines', 'Winding down before bed helps')
+
+        response = self.client.get(reverse('forum-search'), {'q': 'panic'})
+        results = response.data['results']
+        self.assertEqual([row['id'] for row in results], [in_title.id, in_content.id])
+        self.assertIn('<mark>Panic</mark>', results[0]['title_highlight'])
+
+    def test_index_follows_edits_and_comments(self):
+        post = self.create_post('Weekly check in', 'Nothing much to report here')
+        post.content = 'Started journaling every evening'
+        post.save()
+        response = self.client.get(reverse('forum-search'), {'q': 'journal'})
+        self.assertEqual([row['id'] for row in response.data['results']], [post.id])
+
+        comment = ForumComment.objects.create(post=post, author=self.user, content='Journaling helps me too')
+        response = self.client.get(reverse('forum-search'), {'q': 'journal', 'type': 'comments'})
+        self.assertEqual([row['id'] for row in response.data['results']], [comment.id])
+        self.assertEqual(response.data['results'][0]['post_title'], 'Weekly check in')
+
+
+    def test_posts_indexed_after_a_table_rebuild(self):
+        # Adding a column makes SQLite rebuild the post table, dropping its triggers
+        field = models.IntegerField(null=True, default=0)
+        field.set_attributes_from_name('rebuild_probe')
+        with connection.schema_editor() as schema_editor:
+            schema_editor.add_field(ForumPost, field)
+        self.addCleanup(self.remove_field, field)
+        self.assertTrue(missing_triggers())
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        self.assertEqual(missing_triggers(), [])
+        post = self.create_post('Breathing exercises', 'Box breathing before exams')
+        response = self.client.get(reverse('forum-search'), {'q': 'breathing'})
+        self.assertEqual([row['id'] for row in response.data['results']], [post.id])
+        response = self.client.get(reverse('forum-post-list'), {'search': 'box'})
+        self.assertEqual([row['id'] for row in response.data['results']], [post.id])
+
+    def remove_field(self, field):
+        with connection.schema_editor() as schema_editor:
+            schema_editor.remove_field(ForumPost, field)
+
+    def test_ranked_search_composes_with_filters(self):
+        other = ForumCategory.objects.create(name='School', description='School life')
+        posts = [
+            self.create_post('Exam stress', 'Stress before every exam'),
+            self.create_post('Stress', 'Stress and more stress'),
+        ]
+        ForumPost.objects.create(title='Exam stress too', content='Same here', author=self.user, category=other)
+
+        queryset = search_posts(ForumPost.objects.filter(category=self.category), 'stress', rank=True)
+        self.assertEqual(queryset.count(), 2)
+        scored = {post.id: post.score for post in queryset}
+        self.assertEqual(set(scored), {post.id for post in posts})
+        self.assertGreater(scored[posts[1].id], scored[posts[0].id])
+        ordered = ranked(queryset, '-last_activity').values_list('id', flat=True)
+        self.assertEqual(list(ordered), [posts[1].id, posts[0].id])
+
+        response = self.client.get(reverse('forum-search'), {'q': 'exam stress', 'category': other.id})
+        self.assertEqual(len(response.data['results']), 1)
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Threaded comment trees for forum posts.
+
+Every comment carries its ``post_id``, so a post's whole tree is loaded
+with a single indexed query (no recursive CTE or per-level ``replies``
+lookups) and assembled in one pass over the rows. The assembled tree is
+cached per post as serialized nodes plus ordered child lists, and is
+dropped whenever a comment of the post is written. Requests then render
+a nested slice of it: ``depth`` levels deep, ``replies`` children per
+node, with opaque cursors for loading the rest of a branch.
+"""
+import base64
+import binascii
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ForumComment
+from .serializers import ForumCommentSerializer
+
+logger = logging.getLogger('performance')
+
+CACHE_PREFIX = 'forum:thread'
+CACHE_TTL = 300  # seconds; writes invalidate explicitly, the TTL only bounds staleness of author names
+ROOT = 0  # child list key of top-level comments
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 10
+DEFAULT_REPLIES = 5
+MAX_REPLIES = 50
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _cache_key(post_id):
+    return f'{CACHE_PREFIX}:{post_id}'
+
+
+def build_tree(rows):
+    """
+    Index serialized comment ``rows`` by id and group child ids under their
+    parent (``ROOT`` for top-level comments), keeping the row order.
+
+    Replies whose parent is missing from ``rows`` (e.g. an unapproved
+    comment) are dropped together with their own replies.
+    """
+    nodes = {}
+    children = defaultdict(list)
+    for row in rows:
+        nodes[row['id']] = row
+        children[row['parent_comment'] or ROOT].append(row['id'])
+
+    # Keep only what is reachable from the top level
+    reachable = {}
+    pending = [ROOT]
+    while pending:
+        parent = pending.pop()
+        for child in children.get(parent, ()):
+            reachable[child] = nodes[child]
+            pending.append(child)
+
+    return {
+        'nodes': reachable,
+        'children': {
+            parent: ids for parent, ids in children.items()
+            if parent == ROOT or parent in reachable
+        },
+    }
+
+
+def load_tree(post_id):
+    """Return the cached tree of ``post_id``, building it on a miss"""
+    key = _cache_key(post_id)
+    tree = cache.get(key)
+    if tree is not None:
+        return tree
+
+    comments = (
+        ForumComment.objects
+        .filter(post_id=post_id, is_approved=True)
+        .select_related('author')
+        .order_by('created_at', 'id')
+    )
+    rows = [dict(row) for row in ForumCommentSerializer(comments, many=True).data]
+    tree = build_tree(rows)
+    cache.set(key, tree, timeout=CACHE_TTL)
+    logger.debug(f"Built comment tree of post {post_id} with {len(tree['nodes'])} comments")
+    return tree
+
+
+def invalidate_tree(post_id):
+    """Drop the cached tree of ``post_id`` once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(_cache_key(post_id)))
+
+
+def encode_cursor(parent, after):
+    raw = f'{parent}:{after or ""}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        parent, after = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        return int(parent), int(after) if after else None
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def _page(tree, parent, after, limit):
+    ids = tree['children'].get(parent, [])
+    start = 0
+    if after is not None:
+        try:
+            start = ids.index(after) + 1
+        except ValueError:
+            raise InvalidCursor(after)
+    page = ids[start:start + limit]
+    remaining = len(ids) - start - len(page)
+    more = None
+    if remaining > 0:
+        more = {'count': remaining, 'cursor': encode_cursor(parent, page[-1] if page else after)}
+    return page, more
+
+
+def _render(tree, comment_id, depth, replies):
+    node = dict(tree['nodes'][comment_id])
+    child_ids = tree['children'].get(comment_id, [])
+    node['reply_count'] = len(child_ids)
+
+    if depth <= 1:
+        node['replies'] = []
+        node['more_replies'] = (
+            {'count': len(child_ids), 'cursor': encode_cursor(comment_id, None)} if child_ids else None
+        )
+        return node
+
+    page, more = _page(tree, comment_id, None, replies)
+    node['replies'] = [_render(tree, child, depth - 1, replies) for child in page]
+    node['more_replies'] = more
+    return node
+
+
+def render_thread(tree, parent=ROOT, after=None, depth=DEFAULT_DEPTH, replies=DEFAULT_REPLIES,
+                  limit=DEFAULT_LIMIT):
+    """
+    Render the children of ``parent`` after the comment ``after`` as nested
+    dicts, ``depth`` levels deep with at most ``replies`` replies per
+    comment. Truncated branches carry a ``more_replies`` cursor.
+    """
+    if parent != ROOT and parent not in tree['nodes']:
+        raise InvalidCursor(parent)
+    page, more = _page(tree, parent, after, limit if parent == ROOT else replies)
+    return {
+        'comments': [_render(tree, comment_id, depth, replies) for comment_id in page],
+        'more': more,
+    }
+
+
+def walk(comments):
+    """Yield every rendered comment node, replies included"""
+    for node in comments:
+        yield node
+        yield from walk(node['replies'])
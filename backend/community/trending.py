@@ -0,0 +1,72 @@
+"""
+Hot ranking for the forum "Trending" feed.
+
+A post's hot score is the log of its engagement plus its creation time
+scaled by ``DECAY_SECONDS``::
+
+    hot = log10(max(points, 1)) + (created_at - EPOCH) / DECAY_SECONDS
+
+so ten times the engagement is worth ``DECAY_SECONDS`` of recency. Older
+posts decay relative to newer ones without their own score changing,
+which means a score only has to be recomputed when the post's engagement
+changes. The engagement a score was computed from is stored next to it
+(``hot_engagement``), and the periodic refresh only touches rows where
+the two differ. The feed itself is an index range scan over ``hot_score``.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import F, Q
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+DECAY_SECONDS = 45000  # 12.5 hours
+
+LIKE_POINTS = 10
+COMMENT_POINTS = 20
+VIEW_POINTS = 1
+
+
+def engagement_expression():
+    """Engagement points of a post as a database expression"""
+    return (
+        F('like_count') * LIKE_POINTS +
+        F('comment_count') * COMMENT_POINTS +
+        F('view_count') * VIEW_POINTS
+    )
+
+
+def engagement(like_count=0, comment_count=0, view_count=0):
+    return like_count * LIKE_POINTS + comment_count * COMMENT_POINTS + view_count * VIEW_POINTS
+
+
+def hot_score(points, created_at):
+    age = (created_at - EPOCH).total_seconds()
+    return round(math.log10(max(points, 1)) + age / DECAY_SECONDS, 7)
+
+
+def refresh_hot_scores(queryset, batch_size=1000):
+    """
+    Recompute hot_score of the posts in ``queryset`` whose engagement
+    changed since it was last computed (or that were never scored, e.g.
+    bulk created); returns the number of posts updated
+    """
+    model = queryset.model
+    stale = (
+        queryset.alias(points=engagement_expression())
+        .filter(~Q(hot_engagement=F('points')) | Q(hot_score=0))
+        .values_list('pk', 'created_at', 'like_count', 'comment_count', 'view_count')
+    )
+    updated = 0
+    last_pk = 0
+    while True:
+        # Keyset batches rather than one streaming cursor, since the rows are
+        # written back while iterating
+        rows = list(stale.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not rows:
+            return updated
+        batch = []
+        for pk, created_at, likes, comments, views in rows:
+            points = engagement(likes, comments, views)
+            batch.append(model(pk=pk, hot_score=hot_score(points, created_at), hot_engagement=points))
+        updated += model._base_manager.bulk_update(batch, ['hot_score', 'hot_engagement'])
+        last_pk = rows[-1][0]
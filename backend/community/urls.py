@@ -3,9 +3,10 @@ from .views import (
     CommunityHubView, ForumCategoryListView, ForumPostListView, 
     ForumPostDetailView, ForumCommentListView, PeerSupportView, 
     ChatRoomListView, ChatRoomDetailView, PostLikeView, CommentLikeView,
-    ModerationReportView, AdminModerationView, AdminForumCategoryView,
+    ModerationReportView, ModerationQueueView, ModerationClaimView, ModerationBulkActionView, AdminModerationView, AdminForumCategoryView,
     AdminForumCategoryDetailView, AdminChatRoomView, AdminChatRoomDetailView,
-    CommunityStatsView, UserForumActivityView, PeerSupportMatchingView
+    CommunityStatsView, UserForumActivityView, PeerSupportMatchingView, ForumSearchView,
+    ForumCommentThreadView, ForumTrendingView, ChatHistoryView, ChatArchiveView
 )
 
 urlpatterns = [
@@ -17,10 +18,13 @@ urlpatterns = [
     
     # Forum posts
     path('posts/', ForumPostListView.as_view(), name='forum-post-list'),
+    path('posts/trending/', ForumTrendingView.as_view(), name='forum-post-trending'),
     path('posts/<int:pk>/', ForumPostDetailView.as_view(), name='forum-post-detail'),
+    path('search/', ForumSearchView.as_view(), name='forum-search'),
     
     # Forum comments
     path('comments/', ForumCommentListView.as_view(), name='forum-comment-list'),
+    path('posts/<int:pk>/thread/', ForumCommentThreadView.as_view(), name='forum-post-thread'),
     
     # Peer support
     path('peer-support/', PeerSupportView.as_view(), name='peer-support'),
@@ -28,6 +32,8 @@ urlpatterns = [
     # Chat rooms
     path('chatrooms/', ChatRoomListView.as_view(), name='chat-room-list'),
     path('chatrooms/<int:pk>/', ChatRoomDetailView.as_view(), name='chat-room-detail'),
+    path('chatrooms/<int:pk>/messages/', ChatHistoryView.as_view(), name='chat-room-history'),
+    path('chatrooms/<int:pk>/archive/<str:day>/', ChatArchiveView.as_view(), name='chat-room-archive'),
     
     # Engagement (likes)
     path('posts/<int:post_id>/like/', PostLikeView.as_view(), name='post-like'),
@@ -35,6 +41,9 @@ urlpatterns = [
     
     # Moderation
     path('reports/', ModerationReportView.as_view(), name='moderation-reports'),
+    path('reports/queue/', ModerationQueueView.as_view(), name='moderation-queue'),
+    path('reports/claim/', ModerationClaimView.as_view(), name='moderation-claim'),
+    path('reports/bulk/', ModerationBulkActionView.as_view(), name='moderation-bulk'),
     path('reports/<int:report_id>/moderate/', AdminModerationView.as_view(), name='admin-moderation'),
     
     # Statistics and activity
@@ -3,18 +3,31 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q, Count, F
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
+from django.db.models import Q, Count
+from backend.stats import build_dashboard, conditional_counts
+from counters.hits import record_hit
+from counters.services import counter_stats
+from accounts.permissions import Capability, IsPlatformAdmin, require
 from .models import (
     ForumCategory, ForumPost, ForumComment, ChatRoom, 
-    ChatMessage, PeerSupportMatch, ModerationReport, PostLike, CommentLike
+    ChatMessage, PeerSupportMatch, ModerationReport, ChatArchive
 )
 from .serializers import (
     ForumCategorySerializer, ForumPostSerializer, ForumCommentSerializer,
     ChatRoomSerializer, ChatMessageSerializer, PeerSupportMatchSerializer,
-    ModerationReportSerializer
+    ModerationReportSerializer, ForumPostSearchSerializer, ForumCommentSearchSerializer
 )
+from .search import filter_forum, ranked, search_comments, search_posts, tokenize
+from . import activity, categories, likes, matching, moderation, threads
+from .chat import history
+from .chat.archive import iter_lines
+
+CanModerate = require(Capability.MODERATE, "Moderator access required")
 
 
 class CommunityHubView(generics.GenericAPIView):
@@ -35,40 +48,112 @@ class CommunityHubView(generics.GenericAPIView):
 
 
 class ForumCategoryListView(generics.ListAPIView):
-    """List all forum categories"""
+    """
+    List all forum categories.
+
+    The plain listing is served from the pre-serialized cache (see
+    community.categories) with an ETag; ``If-None-Match`` gets a 304.
+    """
     permission_classes = [IsAuthenticated]
     serializer_class = ForumCategorySerializer
-    queryset = ForumCategory.objects.filter(is_active=True)
+
+    def get_queryset(self):
+        return categories.listed_categories()
+
+    def list(self, request, *args, **kwargs):
+        listing = categories.get_listing()
+        if request.query_params or (self.paginator and listing['count'] > self.paginator.page_size):
+            return super().list(request, *args, **kwargs)
+        if listing['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(listing['body'], content_type='application/json')
+        response['ETag'] = listing['etag']
+        # Cacheable by the client only, and always revalidated
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 class ForumPostListView(generics.ListCreateAPIView):
     """List and create forum posts"""
     permission_classes = [IsAuthenticated]
     serializer_class = ForumPostSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'content']
-    ordering_fields = ['created_at', 'last_activity', 'like_count']
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['created_at', 'last_activity', 'like_count', 'hot_score']
     ordering = ['-last_activity']
+    keyset_ordering = '-last_activity'
 
     def get_queryset(self):
-        queryset = ForumPost.objects.filter(is_approved=True)
+        queryset = ForumPost.objects.for_listing().filter(is_approved=True)
+        category = self.request.query_params.get('category', None)
+        if category:
+            queryset = queryset.filter(category_id=category)
+        # Index-backed match; use ForumSearchView for relevance ranking
+        return search_posts(queryset, self.request.query_params.get('search'))
+
+
+class ForumTrendingView(generics.ListAPIView):
+    """Trending posts by precomputed hot score (see community.trending)"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = ForumPostSerializer
+    keyset_ordering = ('-hot_score', '-id')
+
+    def get_queryset(self):
+        queryset = ForumPost.objects.for_listing().trending()
         category = self.request.query_params.get('category', None)
         if category:
             queryset = queryset.filter(category_id=category)
         return queryset
 
 
+class ForumSearchView(generics.ListAPIView):
+    """Ranked full-text search over forum posts or comments"""
+    permission_classes = [IsAuthenticated]
+
+    def get_search_type(self):
+        return 'comments' if self.request.query_params.get('type') == 'comments' else 'posts'
+
+    def get_serializer_class(self):
+        if self.get_search_type() == 'comments':
+            return ForumCommentSearchSerializer
+        return ForumPostSearchSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['search_term'] = self.request.query_params.get('q', '')
+        return context
+
+    def get_queryset(self):
+        params = self.request.query_params
+        term = params.get('q', '')
+
+        if self.get_search_type() == 'comments':
+            queryset = ForumComment.objects.filter(
+                is_approved=True, post__is_approved=True
+            ).select_related('author', 'post')
+            queryset = filter_forum(queryset, params, prefix='post__')
+            if not tokenize(term):
+                return queryset.none()
+            return ranked(search_comments(queryset, term, rank=True), '-created_at')
+
+        queryset = ForumPost.objects.for_listing().filter(is_approved=True)
+        queryset = filter_forum(queryset, params)
+        if not tokenize(term):
+            return queryset.none()
+        return ranked(search_posts(queryset, term, rank=True), '-last_activity')
+
+
 class ForumPostDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a forum post"""
     permission_classes = [IsAuthenticated]
     serializer_class = ForumPostSerializer
-    queryset = ForumPost.objects.filter(is_approved=True)
+    queryset = ForumPost.objects.for_listing().filter(is_approved=True)
 
     def get_object(self):
         obj = super().get_object()
-        # Increment view count
-        obj.view_count += 1
-        obj.save(update_fields=['view_count'])
+        if self.request.method == 'GET':
+            # Buffered; the response shows the approximate live count
+            record_hit(obj, 'view_count')
         return obj
 
 
@@ -79,12 +164,63 @@ class ForumCommentListView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         post_id = self.request.query_params.get('post', None)
-        queryset = ForumComment.objects.filter(is_approved=True)
+        queryset = ForumComment.objects.filter(is_approved=True).select_related('author')
         if post_id:
             queryset = queryset.filter(post_id=post_id)
         return queryset
 
 
+def _bounded_param(params, name, default, maximum):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(1, min(value, maximum))
+
+
+class ForumCommentThreadView(APIView):
+    """
+    Nested comment tree of a post.
+
+    ``depth`` limits how many reply levels are expanded, ``replies`` how
+    many replies each comment shows and ``limit`` how many top-level
+    comments are returned. Truncated branches return a cursor; pass it as
+    ``?cursor=`` to load the rest of that branch.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        post = get_object_or_404(ForumPost.objects.only('id', 'comment_count'), pk=pk, is_approved=True)
+        params = request.query_params
+        depth = _bounded_param(params, 'depth', threads.DEFAULT_DEPTH, threads.MAX_DEPTH)
+        replies = _bounded_param(params, 'replies', threads.DEFAULT_REPLIES, threads.MAX_REPLIES)
+        limit = _bounded_param(params, 'limit', threads.DEFAULT_LIMIT, threads.MAX_LIMIT)
+
+        tree = threads.load_tree(post.id)
+        try:
+            parent, after = threads.ROOT, None
+            if params.get('cursor'):
+                parent, after = threads.decode_cursor(params['cursor'])
+            thread = threads.render_thread(
+                tree, parent=parent, after=after, depth=depth, replies=replies, limit=limit
+            )
+        except threads.InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The tree is shared by all users; like state is added per request
+        nodes = list(threads.walk(thread['comments']))
+        liked = likes.liked_ids(request.user, likes.COMMENT, [node['id'] for node in nodes])
+        for node in nodes:
+            node['liked_by_me'] = node['id'] in liked
+
+        return Response({
+            'post': post.id,
+            'comment_count': post.comment_count,
+            'parent_comment': parent or None,
+            **thread,
+        })
+
+
 class ChatRoomListView(generics.ListAPIView):
     """List available chat rooms"""
     permission_classes = [IsAuthenticated]
@@ -99,6 +235,43 @@ class ChatRoomDetailView(generics.RetrieveAPIView):
     queryset = ChatRoom.objects.filter(is_active=True)
 
 
+class ChatHistoryView(APIView):
+    """
+    Message history of a chat room, newest first. Follow ``next`` as
+    ``?cursor=`` to scroll back; older days are read from the archives.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        room = get_object_or_404(ChatRoom.objects.only('id'), pk=pk, is_active=True)
+        limit = _bounded_param(request.query_params, 'limit', history.DEFAULT_LIMIT, history.MAX_LIMIT)
+        try:
+            messages, next_cursor = history.history_page(room.id, request.query_params.get('cursor'), limit)
+        except history.InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'next': next_cursor, 'results': messages})
+
+
+class ChatArchiveView(APIView):
+    """Stream one archived day of a chat room as newline-delimited JSON"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, day):
+        try:
+            day = parse_date(day)
+        except ValueError:
+            # Well formed but not a real date, e.g. 2024-02-30
+            day = None
+        if day is None:
+            return Response({'error': 'Use a YYYY-MM-DD date'}, status=status.HTTP_400_BAD_REQUEST)
+        archive = get_object_or_404(ChatArchive, room_id=pk, room__is_active=True, day=day)
+        response = StreamingHttpResponse(
+            (line + b'\n' for line in iter_lines(archive)), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="chat-{pk}-{day}.ndjson"'
+        return response
+
+
 class PeerSupportView(generics.ListCreateAPIView):
     """Peer support matching requests"""
     permission_classes = [IsAuthenticated]
@@ -107,59 +280,60 @@ class PeerSupportView(generics.ListCreateAPIView):
     def get_queryset(self):
         return PeerSupportMatch.objects.filter(requester=self.request.user)
 
+    def perform_create(self, serializer):
+        matching.match_now(serializer.save())
+
 # COMPREHENSIVE COMMUNITY API ENDPOINTS
 
-class PostLikeView(APIView):
-    """Like/unlike a forum post"""
+class LikeView(APIView):
+    """
+    Like state of a post or comment for the current user.
+
+    ``PUT`` likes and ``DELETE`` unlikes (both idempotent); ``POST``
+    toggles.
+    """
     permission_classes = [IsAuthenticated]
-    
-    def post(self, request, post_id):
+    like_kind = None
+    lookup_url_kwarg = None
+    not_found_message = 'Not found'
+
+    def respond(self, liked):
+        label = self.like_kind.name.capitalize()
+        return Response({'liked': liked, 'message': f"{label} {'liked' if liked else 'unliked'}"})
+
+    def apply(self, request, liked, **kwargs):
+        target_id = kwargs[self.lookup_url_kwarg]
         try:
-            post = ForumPost.objects.get(id=post_id, is_approved=True)
-            like, created = PostLike.objects.get_or_create(
-                user=request.user, 
-                post=post
-            )
-            
-            if not created:
-                # Unlike if already liked
-                like.delete()
-                post.like_count = F('like_count') - 1
-                post.save(update_fields=['like_count'])
-                return Response({'liked': False, 'message': 'Post unliked'})
+            if liked is None:
+                liked = likes.toggle_like(request.user, self.like_kind, target_id)
             else:
-                # Like the post
-                post.like_count = F('like_count') + 1
-                post.save(update_fields=['like_count'])
-                return Response({'liked': True, 'message': 'Post liked'})
-                
-        except ForumPost.DoesNotExist:
-            return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
+                likes.set_like(request.user, self.like_kind, target_id, liked)
+        except likes.LikeTargetNotFound:
+            return Response({'error': self.not_found_message}, status=status.HTTP_404_NOT_FOUND)
+        return self.respond(liked)
 
-class CommentLikeView(APIView):
+    def post(self, request, **kwargs):
+        return self.apply(request, None, **kwargs)
+
+    def put(self, request, **kwargs):
+        return self.apply(request, True, **kwargs)
+
+    def delete(self, request, **kwargs):
+        return self.apply(request, False, **kwargs)
+
+
+class PostLikeView(LikeView):
+    """Like/unlike a forum post"""
+    like_kind = likes.POST
+    lookup_url_kwarg = 'post_id'
+    not_found_message = 'Post not found'
+
+
+class CommentLikeView(LikeView):
     """Like/unlike a forum comment"""
-    permission_classes = [IsAuthenticated]
-    
-    def post(self, request, comment_id):
-        try:
-            comment = ForumComment.objects.get(id=comment_id, is_approved=True)
-            like, created = CommentLike.objects.get_or_create(
-                user=request.user, 
-                comment=comment
-            )
-            
-            if not created:
-                like.delete()
-                comment.like_count = F('like_count') - 1
-                comment.save(update_fields=['like_count'])
-                return Response({'liked': False, 'message': 'Comment unliked'})
-            else:
-                comment.like_count = F('like_count') + 1
-                comment.save(update_fields=['like_count'])
-                return Response({'liked': True, 'message': 'Comment liked'})
-                
-        except ForumComment.DoesNotExist:
-            return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
+    like_kind = likes.COMMENT
+    lookup_url_kwarg = 'comment_id'
+    not_found_message = 'Comment not found'
 
 class ModerationReportView(generics.ListCreateAPIView):
     """Create and view moderation reports"""
@@ -167,150 +341,211 @@ class ModerationReportView(generics.ListCreateAPIView):
     serializer_class = ModerationReportSerializer
     
     def get_queryset(self):
-        if self.request.user.role in ['guide', 'admin']:
-            return ModerationReport.objects.all()
-        return ModerationReport.objects.filter(reporter=self.request.user)
+        if self.request.user.has_capability(Capability.MODERATE):
+            return ModerationReport.objects.for_listing().order_by('-priority', '-created_at', '-id')
+        return ModerationReport.objects.filter(reporter=self.request.user).for_listing()
+
+class ModerationQueueView(generics.ListAPIView):
+    """Pending reports in triage order (see community.moderation)"""
+    permission_classes = [IsAuthenticated, CanModerate]
+    serializer_class = ModerationReportSerializer
+
+    def get_queryset(self):
+        queryset = ModerationReport.objects.queue().for_listing()
+        if self.request.query_params.get('claimable', '').lower() in ('1', 'true', 'yes'):
+            queryset = queryset.claimable()
+        return queryset
+
+class ModerationClaimView(APIView):
+    """Claim the next reports of the queue (POST) or hand claims back (DELETE)"""
+    permission_classes = [IsAuthenticated, CanModerate]
+
+    def post(self, request):
+        limit = _bounded_param(request.data, 'limit', moderation.DEFAULT_CLAIM, moderation.MAX_CLAIM)
+        reports = moderation.claim(request.user, limit)
+        return Response({
+            'results': ModerationReportSerializer(reports, many=True, context={'request': request}).data,
+        })
+
+    def delete(self, request):
+        report_ids = request.data.get('reports')
+        if report_ids is not None and not (
+            isinstance(report_ids, list) and all(isinstance(pk, int) for pk in report_ids)
+        ):
+            return Response({'error': 'reports must be a list of report ids'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'released': moderation.release(request.user, report_ids)})
+
+class ModerationBulkActionView(APIView):
+    """
+    Apply one moderation action to many reports at once.
+
+    Send ``action`` (``resolve``, ``dismiss``, ``hide_post`` or
+    ``lock_thread``) with either ``reports``, a list of report ids, or
+    ``filter``, e.g. ``{"report_type": "spam"}`` to act on every open
+    report of a kind. Each report gets an outcome in ``results``.
+    ``hide_post`` on a comment report hides only the reported comment.
+    """
+    permission_classes = [IsAuthenticated, CanModerate]
+
+    def post(self, request):
+        action = request.data.get('action')
+        if action not in moderation.ACTIONS:
+            return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
+
+        report_ids, filters = request.data.get('reports'), request.data.get('filter')
+        if (report_ids is None) == (filters is None):
+            return Response({'error': 'Send either reports or filter'}, status=status.HTTP_400_BAD_REQUEST)
+        if report_ids is not None and not (
+            isinstance(report_ids, list) and 0 < len(report_ids) <= moderation.MAX_BULK
+            and all(isinstance(pk, int) for pk in report_ids)
+        ):
+            return Response(
+                {'error': f'reports must be a list of at most {moderation.MAX_BULK} report ids'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if filters is not None and not (
+            isinstance(filters, dict) and filters and all(
+                isinstance(value, moderation.BULK_FILTERS.get(field, ())) for field, value in filters.items()
+            )
+        ):
+            return Response(
+                {'error': f"filter may use {', '.join(sorted(moderation.BULK_FILTERS))}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        outcomes, posts_changed, comments_changed = moderation.bulk_apply(
+            request.user, action, report_ids=report_ids, filters=filters,
+            notes=request.data.get('moderator_notes', ''),
+        )
+        report_status = moderation.ACTIONS[action][0]
+        return Response({
+            'action': action,
+            'applied': sum(1 for outcome in outcomes.values() if outcome == report_status),
+            'posts_changed': posts_changed,
+            'comments_changed': comments_changed,
+            'results': {str(pk): outcome for pk, outcome in outcomes.items()},
+        })
 
 class AdminModerationView(APIView):
     """Admin/Guide moderation actions"""
     permission_classes = [IsAuthenticated]
+    messages = {
+        'resolve': 'Report resolved successfully',
+        'dismiss': 'Report dismissed',
+        'hide_post': 'Report resolved and post hidden',
+        'lock_thread': 'Report resolved and thread locked',
+    }
+    conflicts = {
+        moderation.CLAIMED: 'Report is claimed by another moderator',
+        moderation.ALREADY_CLOSED: 'Report is already closed',
+        moderation.NO_POST: 'Report is not about a post or comment',
+    }
     
     def post(self, request, report_id):
-        if request.user.role not in ['guide', 'admin']:
+        if not request.user.has_capability(Capability.MODERATE):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        try:
-            report = ModerationReport.objects.get(id=report_id)
-            action = request.data.get('action')
-            moderator_notes = request.data.get('moderator_notes', '')
-            
-            if action == 'resolve':
-                report.status = 'resolved'
-                report.moderator = request.user
-                report.moderator_notes = moderator_notes
-                report.resolved_at = timezone.now()
-                report.save()
-                
-                return Response({'message': 'Report resolved successfully'})
-            elif action == 'dismiss':
-                report.status = 'dismissed'
-                report.moderator = request.user
-                report.moderator_notes = moderator_notes
-                report.resolved_at = timezone.now()
-                report.save()
-                
-                return Response({'message': 'Report dismissed'})
-            else:
-                return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
-                
-        except ModerationReport.DoesNotExist:
+        action = request.data.get('action')
+        if action not in moderation.ACTIONS:
+            return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
+        outcomes, *_ = moderation.bulk_apply(
+            request.user, action, report_ids=[report_id], notes=request.data.get('moderator_notes', '')
+        )
+        outcome = outcomes[report_id]
+        if outcome == moderation.NOT_FOUND:
             return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
+        if outcome in self.conflicts:
+            return Response({'error': self.conflicts[outcome]}, status=status.HTTP_409_CONFLICT)
+        return Response({'message': self.messages[action]})
 
 class AdminForumCategoryView(generics.ListCreateAPIView):
     """Admin can manage forum categories"""
     serializer_class = ForumCategorySerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return ForumCategory.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = ForumCategory.objects.all()
 
 class AdminForumCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete forum categories"""
     serializer_class = ForumCategorySerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return ForumCategory.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = ForumCategory.objects.all()
 
 class AdminChatRoomView(generics.ListCreateAPIView):
     """Admin can manage chat rooms"""
     serializer_class = ChatRoomSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return ChatRoom.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = ChatRoom.objects.all()
 
 class AdminChatRoomDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete chat rooms"""
     serializer_class = ChatRoomSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return ChatRoom.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = ChatRoom.objects.all()
 
 class CommunityStatsView(APIView):
     """Community statistics for dashboard"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user_role = request.user.role
+        user = request.user
         
         # Basic stats for all users
-        stats = {
-            'total_posts': ForumPost.objects.filter(is_approved=True).count(),
-            'total_comments': ForumComment.objects.filter(is_approved=True).count(),
-            'active_chat_rooms': ChatRoom.objects.filter(is_active=True).count(),
-            'user_posts': ForumPost.objects.filter(author=request.user, is_approved=True).count(),
+        counters = {
+            'total_posts': 'community.posts.approved',
+            'total_comments': 'community.comments.approved',
+            'active_chat_rooms': 'community.chat_rooms.active',
         }
         
         # Additional stats for guides and admins
-        if user_role in ['guide', 'admin']:
-            stats.update({
-                'pending_reports': ModerationReport.objects.filter(status='pending').count(),
-                'total_reports': ModerationReport.objects.count(),
-                'active_peer_matches': PeerSupportMatch.objects.filter(status='active').count(),
+        if user.has_capability(Capability.VIEW_STATS):
+            counters.update({
+                'pending_reports': 'community.reports.pending',
+                'total_reports': 'community.reports.total',
+                'active_peer_matches': 'community.peer_matches.active',
             })
+        if user.has_capability(Capability.VIEW_ADMIN_STATS):
+            counters['total_categories'] = 'community.categories.total'
         
-        # Admin-only stats
-        if user_role == 'admin':
-            stats.update({
-                'total_categories': ForumCategory.objects.count(),
-                'total_users_active': ForumPost.objects.values('author').distinct().count(),
-                'posts_this_week': ForumPost.objects.filter(
-                    created_at__gte=timezone.now() - timezone.timedelta(days=7)
-                ).count(),
+        stats, read_ms = counter_stats(counters)
+        compute_time_ms = {'counters': read_ms}
+        
+        # Admin-only windowed stats are aggregated and cached
+        if user.has_capability(Capability.VIEW_ADMIN_STATS):
+            window_stats, window_time_ms = build_dashboard('community', {
+                'posts': lambda: conditional_counts(
+                    ForumPost.objects.all(),
+                    total_users_active=Count('author', distinct=True),
+                    posts_this_week=Q(created_at__gte=timezone.now() - timezone.timedelta(days=7)),
+                ),
             })
+            stats.update(window_stats)
+            compute_time_ms.update(window_time_ms)
         
+        stats['user_posts'] = ForumPost.objects.filter(author=request.user, is_approved=True).count()
+        stats['compute_time_ms'] = compute_time_ms
         return Response(stats)
 
 class UserForumActivityView(APIView):
-    """Get user's forum activity"""
+    """
+    The user's community activity: posts, comments, likes and peer-support
+    events newest first, with their totals. Follow ``next`` as ``?cursor=``
+    for older events.
+    """
     permission_classes = [IsAuthenticated]
-    
+
     def get(self, request):
-        user_posts = ForumPost.objects.filter(
-            author=request.user, 
-            is_approved=True
-        ).order_by('-created_at')[:5]
-        
-        user_comments = ForumComment.objects.filter(
-            author=request.user,
-            is_approved=True
-        ).order_by('-created_at')[:5]
-        
+        limit = _bounded_param(request.query_params, 'limit', activity.DEFAULT_LIMIT, activity.MAX_LIMIT)
+        try:
+            events, next_cursor = activity.feed_page(request.user.id, request.query_params.get('cursor'), limit)
+        except activity.InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        counts = activity.activity_counts(request.user.id)
         return Response({
-            'recent_posts': ForumPostSerializer(user_posts, many=True).data,
-            'recent_comments': ForumCommentSerializer(user_comments, many=True).data,
-            'total_posts': ForumPost.objects.filter(author=request.user, is_approved=True).count(),
-            'total_comments': ForumComment.objects.filter(author=request.user, is_approved=True).count(),
+            'counts': counts,
+            'total_posts': counts['posts'],
+            'total_comments': counts['comments'],
+            'next': next_cursor,
+            'results': events,
         })
 
 class PeerSupportMatchingView(APIView):
@@ -322,20 +557,16 @@ class PeerSupportMatchingView(APIView):
         serializer = PeerSupportMatchSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             match = serializer.save()
-            
-            # Simple matching logic - find available supporters
-            # In a real system, this would be more sophisticated
-            available_supporters = PeerSupportMatch.objects.filter(
-                status='pending',
-                supporter__isnull=True
-            ).exclude(requester=request.user)
-            
+            # Try to match right away; the periodic job picks up the rest
+            supporter_id = matching.match_now(match)
+
             return Response({
                 'message': 'Peer support request created successfully',
                 'match_id': match.id,
-                'status': match.status
+                'status': 'active' if supporter_id else match.status,
+                'supporter': supporter_id,
             }, status=status.HTTP_201_CREATED)
-        
+
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def patch(self, request, match_id):
@@ -344,14 +575,18 @@ class PeerSupportMatchingView(APIView):
             match = PeerSupportMatch.objects.get(id=match_id)
             action = request.data.get('action')
             
+            if action == 'accept' and match.requester_id == request.user.id:
+                return Response(
+                    {'error': 'You cannot support your own request'}, status=status.HTTP_400_BAD_REQUEST
+                )
+
             if action == 'accept' and match.supporter is None:
-                match.supporter = request.user
-                match.status = 'active'
-                match.matched_at = timezone.now()
-                match.save()
-                
+                if not matching.accept(match.id, request.user):
+                    return Response(
+                        {'error': 'This request has already been matched'}, status=status.HTTP_409_CONFLICT
+                    )
                 return Response({'message': 'Peer support match accepted'})
-            
+
             elif action == 'complete' and match.supporter == request.user:
                 match.status = 'completed'
                 match.completed_at = timezone.now()
@@ -0,0 +1,11 @@
+from counters.registry import register
+from .models import Article, Video, AudioContent, ContentCategory, ContentEngagement
+
+register('content.articles.total', Article)
+register('content.articles.published', Article, is_published=True)
+register('content.videos.total', Video)
+register('content.videos.published', Video, is_published=True)
+register('content.audio.total', AudioContent)
+register('content.audio.published', AudioContent, is_published=True)
+register('content.categories.total', ContentCategory)
+register('content.engagements.total', ContentEngagement)
@@ -6,7 +6,9 @@ from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from accounts.permissions import IsGuideOrAdmin
+from accounts.permissions import Capability, IsGuideOrAdmin, IsPlatformAdmin, require
+from counters.hits import record_hit
+from counters.services import counter_stats
 from .models import (
     ContentCategory, Article, Video, AudioContent, MentalHealthResource,
     ContentEngagement, UserBookmark
@@ -16,6 +18,11 @@ from .serializers import (
     AudioContentSerializer, MentalHealthResourceSerializer
 )
 
+CanCreateContent = require(
+    Capability.CREATE_CONTENT, "Only guides and admins can create content", methods=('POST',)
+)
+CanManageCategories = require(Capability.MANAGE_PLATFORM, "Admin access required", methods=('POST',))
+
 class EducationCenterView(generics.GenericAPIView):
     """
     Education center with mental health resources and learning materials.
@@ -63,7 +70,7 @@ class ResourceDirectoryView(generics.GenericAPIView):
 class ArticleListView(generics.ListCreateAPIView):
     """List and create articles"""
     serializer_class = ArticleSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, CanCreateContent]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'content', 'tags']
     ordering_fields = ['created_at', 'published_at', 'view_count', 'like_count']
@@ -71,20 +78,16 @@ class ArticleListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         # Regular users see only published articles
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return Article.objects.filter(is_published=True)
         # Guides and admins see all articles
         return Article.objects.all()
     
     def perform_create(self, serializer):
-        # Only guides and admins can create articles
-        if self.request.user.role not in ['guide', 'admin']:
-            raise permissions.PermissionDenied("Only guides and admins can create articles")
-        
         article = serializer.save(author=self.request.user)
         
         # Auto-publish for admins, require approval for guides
-        if self.request.user.role == 'admin':
+        if self.request.user.has_capability(Capability.PUBLISH_CONTENT):
             article.is_published = True
             article.published_at = timezone.now()
             article.save()
@@ -95,7 +98,7 @@ class ArticleDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return Article.objects.filter(is_published=True)
         return Article.objects.all()
     
@@ -103,45 +106,41 @@ class ArticleDetailView(generics.RetrieveUpdateDestroyAPIView):
         obj = super().get_object()
         # Increment view count for published articles
         if obj.is_published and self.request.method == 'GET':
-            obj.view_count += 1
-            obj.save(update_fields=['view_count'])
+            record_hit(obj, 'view_count')
         return obj
     
     def perform_update(self, serializer):
         # Only author, guides, and admins can update
         if (self.request.user != serializer.instance.author and 
-            self.request.user.role not in ['guide', 'admin']):
+            not self.request.user.has_capability(Capability.EDIT_ANY_CONTENT)):
             raise permissions.PermissionDenied("Permission denied")
         serializer.save()
     
     def perform_destroy(self, instance):
         # Only author and admins can delete
         if (self.request.user != instance.author and 
-            self.request.user.role != 'admin'):
+            not self.request.user.has_capability(Capability.DELETE_ANY_CONTENT)):
             raise permissions.PermissionDenied("Permission denied")
         instance.delete()
 
 class VideoListView(generics.ListCreateAPIView):
     """List and create videos with upload capability"""
     serializer_class = VideoSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, CanCreateContent]
     parser_classes = [MultiPartParser, FormParser]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'description', 'tags']
     ordering = ['-published_at']
     
     def get_queryset(self):
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return Video.objects.filter(is_published=True)
         return Video.objects.all()
     
     def perform_create(self, serializer):
-        if self.request.user.role not in ['guide', 'admin']:
-            raise permissions.PermissionDenied("Only guides and admins can create videos")
-        
         video = serializer.save(author=self.request.user)
         
-        if self.request.user.role == 'admin':
+        if self.request.user.has_capability(Capability.PUBLISH_CONTENT):
             video.is_published = True
             video.published_at = timezone.now()
             video.save()
@@ -153,33 +152,32 @@ class VideoDetailView(generics.RetrieveUpdateDestroyAPIView):
     parser_classes = [MultiPartParser, FormParser]
     
     def get_queryset(self):
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return Video.objects.filter(is_published=True)
         return Video.objects.all()
     
     def get_object(self):
         obj = super().get_object()
         if obj.is_published and self.request.method == 'GET':
-            obj.view_count += 1
-            obj.save(update_fields=['view_count'])
+            record_hit(obj, 'view_count')
         return obj
     
     def perform_update(self, serializer):
         if (self.request.user != serializer.instance.author and 
-            self.request.user.role not in ['guide', 'admin']):
+            not self.request.user.has_capability(Capability.EDIT_ANY_CONTENT)):
             raise permissions.PermissionDenied("Permission denied")
         serializer.save()
     
     def perform_destroy(self, instance):
         if (self.request.user != instance.author and 
-            self.request.user.role != 'admin'):
+            not self.request.user.has_capability(Capability.DELETE_ANY_CONTENT)):
             raise permissions.PermissionDenied("Permission denied")
         instance.delete()
 
 class AudioContentListView(generics.ListCreateAPIView):
     """List and create audio content with upload capability"""
     serializer_class = AudioContentSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, CanCreateContent]
     parser_classes = [MultiPartParser, FormParser]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'description', 'tags']
@@ -187,7 +185,7 @@ class AudioContentListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         audio_type = self.request.query_params.get('type')
-        queryset = AudioContent.objects.filter(is_published=True) if self.request.user.role == 'user' else AudioContent.objects.all()
+        queryset = AudioContent.objects.all() if self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT) else AudioContent.objects.filter(is_published=True)
         
         if audio_type:
             queryset = queryset.filter(audio_type=audio_type)
@@ -195,12 +193,9 @@ class AudioContentListView(generics.ListCreateAPIView):
         return queryset
     
     def perform_create(self, serializer):
-        if self.request.user.role not in ['guide', 'admin']:
-            raise permissions.PermissionDenied("Only guides and admins can create audio content")
-        
         audio = serializer.save(author=self.request.user)
         
-        if self.request.user.role == 'admin':
+        if self.request.user.has_capability(Capability.PUBLISH_CONTENT):
             audio.is_published = True
             audio.published_at = timezone.now()
             audio.save()
@@ -212,26 +207,25 @@ class AudioContentDetailView(generics.RetrieveUpdateDestroyAPIView):
     parser_classes = [MultiPartParser, FormParser]
     
     def get_queryset(self):
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return AudioContent.objects.filter(is_published=True)
         return AudioContent.objects.all()
     
     def get_object(self):
         obj = super().get_object()
         if obj.is_published and self.request.method == 'GET':
-            obj.play_count += 1
-            obj.save(update_fields=['play_count'])
+            record_hit(obj, 'play_count')
         return obj
     
     def perform_update(self, serializer):
         if (self.request.user != serializer.instance.author and 
-            self.request.user.role not in ['guide', 'admin']):
+            not self.request.user.has_capability(Capability.EDIT_ANY_CONTENT)):
             raise permissions.PermissionDenied("Permission denied")
         serializer.save()
     
     def perform_destroy(self, instance):
         if (self.request.user != instance.author and 
-            self.request.user.role != 'admin'):
+            not self.request.user.has_capability(Capability.DELETE_ANY_CONTENT)):
             raise permissions.PermissionDenied("Permission denied")
         instance.delete()
 
@@ -242,7 +236,7 @@ class AdminContentApprovalView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, content_type, content_id):
-        if request.user.role != 'admin':
+        if not request.user.has_capability(Capability.PUBLISH_CONTENT):
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
         action = request.data.get('action')  # 'approve' or 'reject'
@@ -276,40 +270,22 @@ class AdminContentApprovalView(APIView):
 class ContentCategoryListView(generics.ListCreateAPIView):
     """List and create content categories"""
     serializer_class = ContentCategorySerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, CanManageCategories]
     
     def get_queryset(self):
         return ContentCategory.objects.filter(is_active=True)
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
 
 class AdminContentCategoryView(generics.ListCreateAPIView):
     """Admin management of content categories"""
     serializer_class = ContentCategorySerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return ContentCategory.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = ContentCategory.objects.all()
 
 class AdminContentCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete content categories"""
     serializer_class = ContentCategorySerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return ContentCategory.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = ContentCategory.objects.all()
 
 # CONTENT ENGAGEMENT
 
@@ -388,31 +364,35 @@ class ContentStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user_role = request.user.role
+        is_admin = request.user.has_capability(Capability.VIEW_ADMIN_STATS)
         
-        if user_role not in ['guide', 'admin']:
+        if not request.user.has_capability(Capability.VIEW_STATS):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        stats = {
-            'total_articles': Article.objects.count(),
-            'published_articles': Article.objects.filter(is_published=True).count(),
-            'total_videos': Video.objects.count(),
-            'published_videos': Video.objects.filter(is_published=True).count(),
-            'total_audio': AudioContent.objects.count(),
-            'published_audio': AudioContent.objects.filter(is_published=True).count(),
+        counters = {
+            'total_articles': 'content.articles.total',
+            'published_articles': 'content.articles.published',
+            'total_videos': 'content.videos.total',
+            'published_videos': 'content.videos.published',
+            'total_audio': 'content.audio.total',
+            'published_audio': 'content.audio.published',
         }
-        
-        if user_role == 'admin':
-            stats.update({
-                'pending_approval': (
-                    Article.objects.filter(is_published=False).count() +
-                    Video.objects.filter(is_published=False).count() +
-                    AudioContent.objects.filter(is_published=False).count()
-                ),
-                'total_categories': ContentCategory.objects.count(),
-                'total_engagements': ContentEngagement.objects.count(),
+        if is_admin:
+            counters.update({
+                'total_categories': 'content.categories.total',
+                'total_engagements': 'content.engagements.total',
             })
         
+        stats, read_ms = counter_stats(counters)
+        
+        if is_admin:
+            stats['pending_approval'] = (
+                stats['total_articles'] - stats['published_articles'] +
+                stats['total_videos'] - stats['published_videos'] +
+                stats['total_audio'] - stats['published_audio']
+            )
+        
+        stats['compute_time_ms'] = {'counters': read_ms}
         return Response(stats)
 
 
@@ -458,7 +438,7 @@ class ArticleListCreateView(generics.ListCreateAPIView):
         queryset = Article.objects.all()
         
         # Filter by published status for regular users
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             queryset = queryset.filter(is_published=True)
         
         # Optional filters
@@ -489,15 +469,14 @@ class ArticleDetailView(generics.RetrieveUpdateDestroyAPIView):
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        if self.request.user.role in ['guide', 'admin']:
+        if self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return Article.objects.all()
         return Article.objects.filter(is_published=True)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Increment view count
-        instance.view_count += 1
-        instance.save(update_fields=['view_count'])
+        # Count the view; buffered and flushed in batches
+        record_hit(instance, 'view_count')
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -519,7 +498,7 @@ class VideoListCreateView(generics.ListCreateAPIView):
         queryset = Video.objects.all()
         
         # Filter by published status for regular users
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             queryset = queryset.filter(is_published=True)
         
         # Optional filters
@@ -550,15 +529,14 @@ class VideoDetailView(generics.RetrieveUpdateDestroyAPIView):
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        if self.request.user.role in ['guide', 'admin']:
+        if self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return Video.objects.all()
         return Video.objects.filter(is_published=True)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Increment view count
-        instance.view_count += 1
-        instance.save(update_fields=['view_count'])
+        # Count the view; buffered and flushed in batches
+        record_hit(instance, 'view_count')
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -580,7 +558,7 @@ class AudioContentListCreateView(generics.ListCreateAPIView):
         queryset = AudioContent.objects.all()
         
         # Filter by published status for regular users
-        if self.request.user.role == 'user':
+        if not self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             queryset = queryset.filter(is_published=True)
         
         # Optional filters
@@ -611,15 +589,14 @@ class AudioContentDetailView(generics.RetrieveUpdateDestroyAPIView):
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        if self.request.user.role in ['guide', 'admin']:
+        if self.request.user.has_capability(Capability.VIEW_UNPUBLISHED_CONTENT):
             return AudioContent.objects.all()
         return AudioContent.objects.filter(is_published=True)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Increment play count
-        instance.play_count += 1
-        instance.save(update_fields=['play_count'])
+        # Count the play; buffered and flushed in batches
+        record_hit(instance, 'play_count')
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
         
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Counter
+
+
+@admin.register(Counter)
+class CounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'reconciled_at', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['reconciled_at', 'updated_at']
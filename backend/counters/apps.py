@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class CountersConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'counters'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+        from . import signals
+
+        # Each app declares its dashboard counters in a ``counters`` module
+        autodiscover_modules('counters')
+        signals.connect_registered_models()
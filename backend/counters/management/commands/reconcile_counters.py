@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from counters.models import Counter
+from counters.services import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute dashboard counters from their source tables (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Counter names to reconcile (default: all registered counters)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or None
+        before = dict(Counter.objects.values_list('name', 'value'))
+        values = reconcile(names)
+
+        drifted = 0
+        for name, value in sorted(values.items()):
+            previous = before.get(name)
+            if previous is not None and previous != value:
+                drifted += 1
+                self.stdout.write(f'{name}: {previous} -> {value}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {len(values)} counters ({drifted} drifted)'
+        ))
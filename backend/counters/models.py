@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class Counter(models.Model):
+    """Materialized named counter read by the dashboards"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'counters_counter'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
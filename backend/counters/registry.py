@@ -0,0 +1,57 @@
+"""
+Registry of named dashboard counters.
+
+A counter counts the rows of one model matching a set of simple field
+lookups (exact values or ``__in`` lists). The same lookups are evaluated in
+Python by the signal handlers and as a ``Q`` object by the reconcile job.
+"""
+from django.db.models import Q
+
+
+class CounterSpec:
+    def __init__(self, name, model, filters):
+        self.name = name
+        self.model = model
+        self.filters = filters
+        self.fields = {lookup.split('__')[0] for lookup in filters}
+
+    @property
+    def condition(self):
+        return Q(**self.filters) if self.filters else None
+
+    def matches(self, instance):
+        for lookup, expected in self.filters.items():
+            field, _, operator = lookup.partition('__')
+            value = getattr(instance, field)
+            if operator == 'in':
+                if value not in expected:
+                    return False
+            elif operator:
+                raise ValueError(f"Unsupported counter lookup: {lookup}")
+            elif value != expected:
+                return False
+        return True
+
+
+_registry = {}
+
+
+def register(name, model, **filters):
+    """Declare a counter of ``model`` rows matching ``filters``"""
+    _registry[name] = CounterSpec(name, model, filters)
+
+
+def get_spec(name):
+    return _registry[name]
+
+
+def all_specs():
+    return list(_registry.values())
+
+
+def specs_for_model(model):
+    return [spec for spec in _registry.values() if spec.model is model]
+
+
+def registered_models():
+    return {spec.model for spec in _registry.values()}
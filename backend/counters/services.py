@@ -0,0 +1,268 @@
+"""
+Delta buffering, flushing, reading and reconciling of dashboard counters.
+
+Signal handlers never write counter rows directly. They queue deltas in a
+per-process buffer once the surrounding transaction commits, and the
+buffer is flushed as one ``UPDATE ... CASE`` statement when it grows past
+``FLUSH_THRESHOLD`` events, right before counters are read, and at the
+latest ``FLUSH_INTERVAL`` seconds after the first pending delta: a
+``FlushTimer`` thread flushes a worker that has gone quiet, so other
+workers never read stale counts for longer than that. Deltas lost to a
+crashed process or to bulk queryset operations are corrected by
+:func:`reconcile`.
+"""
+import atexit
+import threading
+import time
+import logging
+from collections import defaultdict
+
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from backend.stats import conditional_counts
+from . import registry
+from .models import Counter
+
+logger = logging.getLogger('performance')
+
+FLUSH_THRESHOLD = 100
+FLUSH_INTERVAL = 5.0
+
+
+class FlushTimer:
+    """
+    Calls ``flush`` on a daemon thread ``interval`` seconds after being
+    armed. Arming an armed timer does nothing, so the flush happens at the
+    latest ``interval`` seconds after the first buffered update.
+    """
+
+    def __init__(self, flush, interval):
+        self.flush = flush
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def arm(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.interval, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            # Logged by the buffer, which re-arms the timer to retry
+            pass
+        finally:
+            # Database connections are per thread; don't leak this one
+            connections.close_all()
+
+
+class DeltaBuffer:
+    """Thread-safe accumulator of pending counter deltas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas = defaultdict(int)
+        self._events = 0
+        self._last_flush = time.monotonic()
+        self.timer = FlushTimer(self.flush, FLUSH_INTERVAL)
+
+    def add(self, deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._deltas[name] += delta
+            self._events += 1
+            due = (
+                self._events >= FLUSH_THRESHOLD or
+                time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+            )
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # Called once a write has committed; the failure is logged and
+                # the deltas are kept for the re-armed timer
+                pass
+        else:
+            self.timer.arm()
+
+    def drain(self):
+        with self._lock:
+            deltas = {name: delta for name, delta in self._deltas.items() if delta}
+            self._deltas.clear()
+            self._events = 0
+            self._last_flush = time.monotonic()
+        return deltas
+
+    def restore(self, deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._deltas[name] += delta
+
+    def flush(self):
+        """Apply the pending deltas; on failure they are kept, the timer re-armed and the error raised"""
+        deltas = self.drain()
+        if not deltas:
+            return 0
+        try:
+            apply_deltas(deltas)
+        except Exception:
+            # Keep the deltas for the next flush rather than losing them
+            self.restore(deltas)
+            self.timer.arm()
+            logger.exception("Counter flush failed")
+            raise
+        return len(deltas)
+
+
+buffer = DeltaBuffer()
+
+
+def bulk_increment(queryset, field, deltas, key='pk', **extra):
+    """
+    Add ``{key value: delta}`` to ``field`` of the matching rows with a
+    single ``UPDATE ... SET field = field + CASE ... END`` statement
+    """
+    return queryset.filter(**{f'{key}__in': list(deltas)}).update(
+        **{field: F(field) + Case(
+            *[When(**{key: value}, then=Value(delta)) for value, delta in deltas.items()],
+            default=Value(0),
+            output_field=models.BigIntegerField(),
+        )},
+        **extra
+    )
+
+
+def apply_deltas(deltas):
+    """Apply ``{name: delta}`` to the counter table in one UPDATE statement"""
+    with transaction.atomic():
+        Counter.objects.bulk_create(
+            [Counter(name=name) for name in deltas],
+            ignore_conflicts=True,
+        )
+        bulk_increment(Counter.objects.all(), 'value', deltas, key='name', updated_at=timezone.now())
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception("Flushing counters at exit failed")
+
+
+def record(deltas):
+    """Queue counter deltas once the current transaction commits"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: buffer.add(deltas))
+
+
+def record_created(instances):
+    """Count rows inserted with ``bulk_create``, which sends no signals"""
+    deltas = defaultdict(int)
+    for instance in instances:
+        for spec in registry.specs_for_model(type(instance)):
+            if spec.matches(instance):
+                deltas[spec.name] += 1
+    record(deltas)
+
+
+def adjust(name, delta):
+    """Adjust a counter by hand, e.g. after a bulk ``queryset.update()``"""
+    record({name: delta})
+
+
+def flush():
+    return buffer.flush()
+
+
+def read_counters(names):
+    """
+    Return ``{name: value}`` for the given counters, reading one row each.
+
+    Counters that have never been reconciled are computed from the source
+    tables first, so a fresh deployment starts from correct values.
+    """
+    buffer.flush()
+    rows = {
+        row['name']: row
+        for row in Counter.objects.filter(name__in=names).values('name', 'value', 'reconciled_at')
+    }
+    missing = [name for name in names if name not in rows or rows[name]['reconciled_at'] is None]
+    if missing:
+        values = {name: row['value'] for name, row in rows.items()}
+        values.update(reconcile(missing))
+        return {name: values.get(name, 0) for name in names}
+    return {name: rows[name]['value'] for name in names}
+
+
+def counter_stats(keys):
+    """
+    Read dashboard values for ``keys`` (response key -> counter name).
+
+    Returns the values keyed by response key and the read time in ms, in
+    the same shape as :func:`backend.stats.build_dashboard` tiles.
+    """
+    started = time.perf_counter()
+    values = read_counters(list(keys.values()))
+    read_ms = round((time.perf_counter() - started) * 1000, 2)
+    return {key: values[name] for key, name in keys.items()}, read_ms
+
+
+def compute_actual(specs):
+    """Count the true values of ``specs`` with one aggregate query per model"""
+    by_model = defaultdict(list)
+    for spec in specs:
+        by_model[spec.model].append(spec)
+
+    actual = {}
+    for model, model_specs in by_model.items():
+        actual.update(conditional_counts(
+            model.objects.all(),
+            **{spec.name: spec.condition for spec in model_specs}
+        ))
+    return actual
+
+
+def reconcile(names=None):
+    """
+    Recompute counters from their source tables and overwrite stored values.
+
+    Returns ``{name: value}``; drift between the stored and actual values is
+    logged so silent signal gaps show up in the performance log.
+    """
+    buffer.flush()
+    specs = registry.all_specs() if names is None else [registry.get_spec(name) for name in names]
+    actual = compute_actual(specs)
+    now = timezone.now()
+
+    with transaction.atomic():
+        existing = {
+            counter.name: counter
+            for counter in Counter.objects.select_for_update().filter(name__in=actual)
+        }
+        to_create = []
+        to_update = []
+        for name, value in actual.items():
+            counter = existing.get(name)
+            if counter is None:
+                to_create.append(Counter(name=name, value=value, reconciled_at=now))
+                continue
+            if counter.reconciled_at is not None and counter.value != value:
+                logger.warning(f"Counter {name} drifted by {counter.value - value}")
+            counter.value = value
+            counter.reconciled_at = now
+            counter.updated_at = now
+            to_update.append(counter)
+        Counter.objects.bulk_create(to_create, ignore_conflicts=True)
+        Counter.objects.bulk_update(to_update, ['value', 'reconciled_at', 'updated_at'])
+    return actual
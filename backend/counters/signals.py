@@ -0,0 +1,86 @@
+"""
+Signal handlers keeping registered counters in step with model writes.
+
+Models with filtered counters remember the values of the filtered fields
+when an instance is loaded (``post_init``), a plain read of the instance
+``__dict__`` so list endpoints pay next to nothing per row; saves and
+deletes turn the difference in matched counters into deltas. Models whose
+counters are all unfiltered only count creates and deletes and get no
+``post_init`` handler. Instances loaded with deferred counter fields are
+skipped and left to the reconcile job.
+"""
+from types import SimpleNamespace
+
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import registry, services
+
+STATE_ATTR = '_counter_values'
+_DEFERRED = object()
+
+# model -> ((field name, attname), ...) of the fields its counters filter on
+_tracked_fields = {}
+
+
+def _matches(instance):
+    specs = registry.specs_for_model(type(instance))
+    deferred = instance.get_deferred_fields()
+    if any(spec.fields & deferred for spec in specs):
+        return None
+    return frozenset(spec.name for spec in specs if spec.matches(instance))
+
+
+def _loaded_matches(instance):
+    """Counters the instance matched when loaded, or None if unknown"""
+    values = getattr(instance, STATE_ATTR, None)
+    if values is None or _DEFERRED in values:
+        return None
+    fields = _tracked_fields[type(instance)]
+    loaded = SimpleNamespace(**{name: value for (name, _), value in zip(fields, values)})
+    return frozenset(
+        spec.name for spec in registry.specs_for_model(type(instance))
+        if not spec.filters or spec.matches(loaded)
+    )
+
+
+def snapshot_counters(sender, instance, **kwargs):
+    loaded = instance.__dict__
+    setattr(instance, STATE_ATTR, tuple(loaded.get(attname, _DEFERRED) for _, attname in _tracked_fields[sender]))
+
+
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    tracked = sender in _tracked_fields
+    if not created and not tracked:
+        # Only unfiltered counters, which an update cannot change
+        return
+    current = _matches(instance)
+    previous = frozenset() if created else _loaded_matches(instance)
+    if tracked:
+        snapshot_counters(sender, instance)
+    if current is None or previous is None:
+        return
+
+    deltas = {name: 1 for name in current - previous}
+    deltas.update({name: -1 for name in previous - current})
+    services.record(deltas)
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    current = _matches(instance)
+    if current:
+        services.record({name: -1 for name in current})
+
+
+def connect_registered_models():
+    for model in registry.registered_models():
+        uid = f'counters:{model._meta.label}'
+        fields = set().union(*(spec.fields for spec in registry.specs_for_model(model)))
+        if fields:
+            _tracked_fields[model] = tuple(
+                (name, model._meta.get_field(name).attname) for name in sorted(fields)
+            )
+            post_init.connect(snapshot_counters, sender=model, dispatch_uid=uid)
+        post_save.connect(update_counters_on_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(update_counters_on_delete, sender=model, dispatch_uid=uid)
@@ -0,0 +1,174 @@
+import threading
+from unittest.mock import patch
+
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from community.models import ForumCategory, ForumPost
+from crisis.models import CrisisAlert, UserSafetyPlan
+from . import hits, services, signals
+from .models import Counter
+
+
+class CounterTestCase(TestCase):
+    """Counters maintained by signals, flushed in batches and reconciled"""
+
+    names = ['crisis.alerts.total', 'crisis.alerts.active', 'crisis.alerts.resolved']
+
+    def setUp(self):
+        services.buffer.drain()
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        # Start from reconciled rows so reads come straight from the table
+        services.reconcile(self.names)
+
+    def create_alert(self, **kwargs):
+        defaults = {'user': self.user, 'alert_type': 'self_reported', 'severity_level': 'high'}
+        defaults.update(kwargs)
+        with self.captureOnCommitCallbacks(execute=True):
+            return CrisisAlert.objects.create(**defaults)
+
+    def test_signals_track_creates_updates_and_deletes(self):
+        alert = self.create_alert()
+        self.create_alert()
+        self.assertEqual(services.read_counters(self.names), {
+            'crisis.alerts.total': 2,
+            'crisis.alerts.active': 2,
+            'crisis.alerts.resolved': 0,
+        })
+
+        alert = CrisisAlert.objects.get(pk=alert.pk)
+        alert.status = 'resolved'
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            CrisisAlert.objects.filter(status='active').first().delete()
+
+        self.assertEqual(services.read_counters(self.names), {
+            'crisis.alerts.total': 1,
+            'crisis.alerts.active': 0,
+            'crisis.alerts.resolved': 1,
+        })
+
+    def test_deltas_are_flushed_in_one_update(self):
+        for _ in range(3):
+            self.create_alert()
+        # Below the flush threshold the deltas are still buffered
+        self.assertEqual(Counter.objects.get(name='crisis.alerts.total').value, 0)
+        with self.assertNumQueries(4):
+            # savepoint, insert-or-ignore, update, release
+            services.flush()
+        self.assertEqual(Counter.objects.get(name='crisis.alerts.total').value, 3)
+
+    def test_bulk_created_rows_are_recorded(self):
+        alerts = CrisisAlert.objects.bulk_create([
+            CrisisAlert(user=self.user, alert_type='keyword_detected', severity_level='high', status=status)
+            for status in ['active', 'active', 'resolved']
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            services.record_created(alerts)
+        self.assertEqual(services.read_counters(self.names), {
+            'crisis.alerts.total': 3,
+            'crisis.alerts.active': 2,
+            'crisis.alerts.resolved': 1,
+        })
+
+    def test_reconcile_corrects_drift(self):
+        self.create_alert()
+        # Bulk updates bypass the signals
+        CrisisAlert.objects.update(status='resolved')
+        self.assertEqual(services.read_counters(self.names)['crisis.alerts.resolved'], 0)
+
+        with self.assertLogs('performance', level='WARNING'):
+            actual = services.reconcile(self.names)
+        self.assertEqual(actual['crisis.alerts.resolved'], 1)
+        self.assertEqual(services.read_counters(self.names)['crisis.alerts.active'], 0)
+
+    def test_only_filtered_fields_are_snapshot(self):
+        alert = CrisisAlert.objects.get(pk=self.create_alert().pk)
+        self.assertEqual(getattr(alert, signals.STATE_ATTR), ('high', 'active'))
+        # Unfiltered counters only count creates and deletes
+        self.assertNotIn(UserSafetyPlan, signals._tracked_fields)
+
+    def test_idle_buffer_is_flushed_by_the_timer(self):
+        buffer = services.DeltaBuffer()
+        flushed = threading.Event()
+        buffer.timer.flush = flushed.set
+        buffer.timer.interval = 0.01
+        buffer.add({'crisis.alerts.total': 1})
+        self.assertTrue(flushed.wait(timeout=2))
+
+
+    def test_failed_flush_on_add_keeps_the_deltas(self):
+        buffer = services.DeltaBuffer()
+        buffer._events = services.FLUSH_THRESHOLD
+        with patch.object(services, 'apply_deltas', side_effect=DatabaseError('counter table locked')):
+            with self.assertLogs('performance', level='ERROR'):
+                buffer.add({'crisis.alerts.total': 1})
+            self.assertIsNotNone(buffer.timer._timer)
+            buffer.timer._timer.cancel()
+            # Explicit flushes still report the failure
+            with self.assertLogs('performance', level='ERROR'), self.assertRaises(DatabaseError):
+                buffer.flush()
+        buffer.timer._timer.cancel()
+        self.assertEqual(buffer.drain(), {'crisis.alerts.total': 1})
+
+
+class HitBufferTest(TestCase):
+    """View counts are buffered in memory and flushed in batches"""
+
+    def setUp(self):
+        # Also restarts the flush interval so nothing flushes mid-test
+        hits.flush_hits()
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.category = ForumCategory.objects.create(name='General', description='General talk')
+        self.posts = [
+            ForumPost.objects.create(
+                title=f'Post number {i}', content='Some post content here',
+                author=self.user, category=self.category,
+            )
+            for i in range(3)
+        ]
+
+    def test_hits_are_not_written_per_read(self):
+        post = ForumPost.objects.get(pk=self.posts[0].pk)
+        with self.assertNumQueries(0):
+            hits.record_hit(post)
+            hits.record_hit(post)
+        self.assertEqual(post.view_count, 2)
+        self.assertEqual(ForumPost.objects.get(pk=post.pk).view_count, 0)
+        self.assertEqual(hits.live_count(ForumPost.objects.get(pk=post.pk)), 2)
+
+    def test_flush_writes_one_update_per_field(self):
+        for i, post in enumerate(self.posts):
+            for _ in range(i + 1):
+                hits.record_hit(post)
+        with self.assertNumQueries(1):
+            hits.flush_hits()
+        self.assertEqual(
+            list(ForumPost.objects.order_by('pk').values_list('view_count', flat=True)),
+            [1, 2, 3],
+        )
+        self.assertEqual(hits.live_count(ForumPost.objects.get(pk=self.posts[2].pk)), 3)
+
+    def test_detail_endpoint_reports_live_count(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('forum-post-detail', args=[self.posts[0].pk])
+        client.get(url)
+        response = client.get(url)
+        self.assertEqual(response.data['view_count'], 2)
+
+    def test_idle_hits_are_flushed_by_the_timer(self):
+        buffer = hits.HitBuffer()
+        flushed = threading.Event()
+        buffer.timer.flush = flushed.set
+        buffer.timer.interval = 0.01
+        buffer.add(('community.ForumPost', 'view_count', self.posts[0].pk))
+        self.assertTrue(flushed.wait(timeout=2))
@@ -0,0 +1,8 @@
+from counters.registry import register
+from .models import CrisisAlert, UserSafetyPlan
+
+register('crisis.alerts.total', CrisisAlert)
+register('crisis.alerts.active', CrisisAlert, status='active')
+register('crisis.alerts.high_risk', CrisisAlert, severity_level__in=['high', 'imminent'])
+register('crisis.alerts.resolved', CrisisAlert, status='resolved')
+register('crisis.safety_plans.total', UserSafetyPlan)
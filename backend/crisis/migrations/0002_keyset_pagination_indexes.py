@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crisis', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='crisisalert',
+            index=models.Index(fields=['-created_at'], name='crisis_alert_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='crisisalert',
+            index=models.Index(fields=['user', '-created_at'], name='crisis_alert_user_idx'),
+        ),
+    ]
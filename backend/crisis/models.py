@@ -139,6 +139,10 @@ class CrisisAlert(models.Model):
     class Meta:
         db_table = 'crisis_alert'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='crisis_alert_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='crisis_alert_user_idx'),
+        ]
 
     def __str__(self):
         return f"Crisis Alert: {self.user.username} - {self.severity_level} ({self.status})"
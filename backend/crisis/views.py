@@ -5,6 +5,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
 from django.utils import timezone
 from django.db.models import Count, Q
+from backend.stats import build_dashboard, conditional_counts
+from counters.services import counter_stats
+from accounts.permissions import Capability, IsPlatformAdmin
 from datetime import timedelta
 from .models import CrisisHotline, CrisisResource, CrisisAlert, UserSafetyPlan
 from .serializers import (
@@ -40,6 +43,7 @@ class CrisisResourceListView(generics.ListAPIView):
 class CrisisAlertListView(generics.ListCreateAPIView):
     """List and create crisis alerts"""
     permission_classes = [IsAuthenticated]
+    keyset_ordering = '-created_at'
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -49,15 +53,12 @@ class CrisisAlertListView(generics.ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         
-        # Users can only see their own alerts
-        if user.role == 'user':
-            return CrisisAlert.objects.filter(user=user)
-        
         # Guides and admins can see all alerts
-        elif user.role in ['guide', 'admin']:
+        if user.has_capability(Capability.VIEW_ALL_CRISIS_ALERTS):
             return CrisisAlert.objects.all().order_by('-created_at')
         
-        return CrisisAlert.objects.none()
+        # Users can only see their own alerts
+        return CrisisAlert.objects.filter(user=user)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -70,12 +71,9 @@ class CrisisAlertDetailView(generics.RetrieveUpdateAPIView):
     def get_queryset(self):
         user = self.request.user
         
-        if user.role == 'user':
-            return CrisisAlert.objects.filter(user=user)
-        elif user.role in ['guide', 'admin']:
+        if user.has_capability(Capability.VIEW_ALL_CRISIS_ALERTS):
             return CrisisAlert.objects.all()
-        
-        return CrisisAlert.objects.none()
+        return CrisisAlert.objects.filter(user=user)
 
 class UserSafetyPlanView(APIView):
     """Get or create user's safety plan"""
@@ -129,7 +127,7 @@ class CrisisResponseView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, alert_id):
-        if request.user.role not in ['guide', 'admin']:
+        if not request.user.has_capability(Capability.RESPOND_TO_CRISIS):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
         try:
@@ -170,52 +168,26 @@ class CrisisResponseView(APIView):
 class AdminCrisisHotlineView(generics.ListCreateAPIView):
     """Admin can manage crisis hotlines"""
     serializer_class = CrisisHotlineSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return CrisisHotline.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = CrisisHotline.objects.all()
 
 class AdminCrisisHotlineDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete crisis hotlines"""
     serializer_class = CrisisHotlineSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return CrisisHotline.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = CrisisHotline.objects.all()
 
 class AdminCrisisResourceView(generics.ListCreateAPIView):
     """Admin can manage crisis resources"""
     serializer_class = CrisisResourceSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return CrisisResource.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = CrisisResource.objects.all()
 
 class AdminCrisisResourceDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete crisis resources"""
     serializer_class = CrisisResourceSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return CrisisResource.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = CrisisResource.objects.all()
 
 # STATISTICS AND DASHBOARD ENDPOINTS
 
@@ -224,39 +196,31 @@ class CrisisStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user_role = request.user.role
-        
-        if user_role not in ['guide', 'admin']:
+        if not request.user.has_capability(Capability.VIEW_STATS):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Calculate statistics
-        total_alerts = CrisisAlert.objects.count()
-        active_alerts = CrisisAlert.objects.filter(status='active').count()
-        high_risk_alerts = CrisisAlert.objects.filter(
-            severity_level__in=['high', 'imminent']
-        ).count()
-        resolved_alerts = CrisisAlert.objects.filter(status='resolved').count()
-        
-        users_with_safety_plans = UserSafetyPlan.objects.count()
+        # Calculate statistics from materialized counters
+        counters = {
+            'total_alerts': 'crisis.alerts.total',
+            'active_alerts': 'crisis.alerts.active',
+            'high_risk_alerts': 'crisis.alerts.high_risk',
+            'resolved_alerts': 'crisis.alerts.resolved',
+            'users_with_safety_plans': 'crisis.safety_plans.total',
+        }
+        stats, read_ms = counter_stats(counters)
         
-        # Alerts this week
-        week_ago = timezone.now() - timedelta(days=7)
-        alerts_this_week = CrisisAlert.objects.filter(
-            created_at__gte=week_ago
-        ).count()
+        # Alerts this week (index range scan, cached briefly)
+        window_stats, compute_time_ms = build_dashboard('crisis', {
+            'alerts_this_week': lambda: conditional_counts(
+                CrisisAlert.objects.filter(created_at__gte=timezone.now() - timedelta(days=7)),
+                alerts_this_week=None,
+            ),
+        })
+        stats.update(window_stats)
         
         # Average response time (mock calculation)
-        response_time_avg = 15.5  # minutes
-        
-        stats = {
-            'total_alerts': total_alerts,
-            'active_alerts': active_alerts,
-            'high_risk_alerts': high_risk_alerts,
-            'resolved_alerts': resolved_alerts,
-            'users_with_safety_plans': users_with_safety_plans,
-            'alerts_this_week': alerts_this_week,
-            'response_time_avg': response_time_avg
-        }
+        stats['response_time_avg'] = 15.5  # minutes
+        stats['compute_time_ms'] = {'counters': read_ms, **compute_time_ms}
         
         return Response(stats)
 
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth import get_user_model
+from accounts.permissions import Capability
 from datetime import datetime, timedelta
 import random
 
@@ -16,7 +17,7 @@ def get_clients(request):
     """
     Get guide's assigned clients - matches frontend guideService.getClients()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     # Return mock client data (replace with real database query)
@@ -87,7 +88,7 @@ def get_client(request, client_id):
     """
     Get specific client details - matches frontend guideService.getClient()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     # Return mock client data (replace with real database query)
@@ -114,7 +115,7 @@ def get_crisis_alerts(request):
     """
     Get crisis alerts for guide - matches frontend guideService.getCrisisAlerts()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     # Return mock crisis alerts (replace with real database query)
@@ -168,7 +169,7 @@ def get_analytics(request):
     """
     Get guide analytics - matches frontend guideService.getAnalytics()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     time_range = request.GET.get('range', '30d')
@@ -210,7 +211,7 @@ def contact_client(request):
     """
     Log client contact - matches frontend guideService.contactClient()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     contact_data = request.data
@@ -228,7 +229,7 @@ def get_client_contacts(request, client_id):
     """
     Get client contact history - matches frontend guideService.getClientContacts()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     # Return mock contact history (replace with real database query)
@@ -259,7 +260,7 @@ def schedule_follow_up(request):
     """
     Schedule follow-up - matches frontend guideService.scheduleFollowUp()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     follow_up_data = request.data
@@ -277,7 +278,7 @@ def get_follow_ups(request):
     """
     Get scheduled follow-ups - matches frontend guideService.getFollowUps()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     # Return mock follow-ups (replace with real database query)
@@ -308,7 +309,7 @@ def update_client(request, client_id):
     """
     Update client information - matches frontend guideService.updateClient()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     update_data = request.data
@@ -326,7 +327,7 @@ def assign_client(request, client_id):
     """
     Assign client to guide - matches frontend guideService.assignClient()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     # Add logic to assign client to guide
@@ -342,7 +343,7 @@ def unassign_client(request, client_id):
     """
     Unassign client from guide - matches frontend guideService.unassignClient()
     """
-    if request.user.role != 'guide':
+    if not request.user.has_capability(Capability.GUIDE_WORKSPACE):
         return Response({'error': 'Permission denied'}, status=403)
     
     reason = request.data.get('reason', '')
@@ -0,0 +1,272 @@
+"""
+Vectorized mood analytics for one member or a cohort.
+
+``load_frame`` reads the mood entries of a set of users over a date range
+into a ``MoodFrame``: one NumPy array per column (user, day, mood,
+energy, anxiety, sleep) plus the ``activities``/``triggers`` tags as
+(entry, tag) pairs. Every statistic is then a handful of whole-array
+operations, and per-user aggregates are ``np.bincount`` over the user
+column, so a cohort of 50k members over a year (18M entries) is
+processed in seconds without a Python loop over entries or users.
+
+* ``rolling_means``: daily means of the selection and their trailing
+  ``window``-day means.
+* ``correlations``: within-person Pearson correlation of mood with
+  energy, anxiety and sleep. Each value has the member's own mean
+  subtracted first, so differences between members do not show up as
+  correlation.
+* ``tag_effects``: for each activity and trigger, the within-person mood
+  difference between entries with and without it, and its Cohen's d.
+* ``anomalies``: entries whose mood is at least ``Z_THRESHOLD`` standard
+  deviations away from the member's own mean.
+
+``analyze`` runs all of them and caches the result per selection for
+``CACHE_TTL``.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from functools import cached_property
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import MoodEntry
+
+logger = logging.getLogger('performance')
+
+CACHE_PREFIX = 'wellness:analytics'
+CACHE_TTL = 900
+LOAD_BATCH = 1000  # users per query
+METRICS = {'mood': 'mood_rating', 'energy': 'energy_level', 'anxiety': 'anxiety_level', 'sleep': 'sleep_quality'}
+TAG_KINDS = {'activity': 'activities', 'trigger': 'triggers'}
+DEFAULT_WINDOW = 7
+Z_THRESHOLD = 2.0
+MIN_BASELINE = 7  # entries before a member's mood can be flagged
+MIN_TAG_ENTRIES = 5  # entries on each side before a tag effect is reported
+MAX_ANOMALIES = 100
+
+
+class MoodFrame:
+    """
+    Columnar mood entries. ``user`` indexes ``user_ids``, ``day`` counts
+    days from ``start``; tags are parallel ``tag_entry``/``tag_id`` arrays
+    indexing the entries and ``tags`` (``(kind, name)`` pairs).
+    """
+
+    def __init__(self, start, days, user_ids, user, day, columns, tags=(), tag_entry=None, tag_id=None):
+        self.start = start
+        self.days = days
+        self.user_ids = np.asarray(user_ids)
+        self.user = np.asarray(user, dtype=np.int64)
+        self.day = np.asarray(day, dtype=np.int64)
+        self.columns = {metric: np.asarray(columns[metric], dtype=np.float64) for metric in METRICS}
+        self.tags = list(tags)
+        self.tag_entry = np.asarray(tag_entry if tag_entry is not None else [], dtype=np.int64)
+        self.tag_id = np.asarray(tag_id if tag_id is not None else [], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.user)
+
+    @cached_property
+    def user_counts(self):
+        return np.bincount(self.user, minlength=len(self.user_ids))
+
+    def user_means(self, values):
+        return np.bincount(self.user, weights=values, minlength=len(self.user_ids)) / np.maximum(self.user_counts, 1)
+
+    def user_stats(self, values):
+        """Per-user ``(count, mean, std)`` of ``values``"""
+        mean = self.user_means(values)
+        squares = self.user_means(values * values)
+        return self.user_counts, mean, np.sqrt(np.maximum(squares - mean * mean, 0))
+
+    def demeaned(self, values):
+        return values - self.user_means(values)[self.user]
+
+
+def load_frame(user_ids, start, end):
+    """Read the users' entries dated ``start`` to ``end`` (inclusive) into a ``MoodFrame``"""
+    user_ids = sorted(set(user_ids))
+    index = {user_id: position for position, user_id in enumerate(user_ids)}
+    fields = ['user_id', 'date', *METRICS.values(), *TAG_KINDS.values()]
+    parts = {name: [] for name in ('user', 'day', *METRICS)}
+    tags, tag_ids, tag_entry, tag_id = [], {}, [], []
+    loaded = 0
+    # Converted to arrays batch by batch so rows never pile up as tuples
+    for offset in range(0, len(user_ids), LOAD_BATCH):
+        rows = list(MoodEntry.objects.filter(
+            user_id__in=user_ids[offset:offset + LOAD_BATCH], date__gte=start, date__lte=end,
+        ).order_by().values_list(*fields))
+        if not rows:
+            continue
+        columns = list(zip(*rows))
+        parts['user'].append(np.fromiter((index[user_id] for user_id in columns[0]), np.int64, len(rows)))
+        parts['day'].append(
+            (np.array(columns[1], dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+        )
+        for i, metric in enumerate(METRICS):
+            parts[metric].append(np.array(columns[2 + i], dtype=np.float64))
+        for k, kind in enumerate(TAG_KINDS):
+            for entry, names in enumerate(columns[2 + len(METRICS) + k], start=loaded):
+                for name in {str(name).strip().lower() for name in names or ()}:
+                    if (kind, name) not in tag_ids:
+                        tag_ids[kind, name] = len(tags)
+                        tags.append((kind, name))
+                    tag_entry.append(entry)
+                    tag_id.append(tag_ids[kind, name])
+        loaded += len(rows)
+
+    def joined(name, dtype):
+        return np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=dtype)
+
+    return MoodFrame(
+        start, (end - start).days + 1, user_ids, joined('user', np.int64), joined('day', np.int64),
+        {metric: joined(metric, np.float64) for metric in METRICS}, tags, tag_entry, tag_id,
+    )
+
+
+def _column(values, digits=3):
+    """JSON-ready list; NaN becomes None"""
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def rolling_means(frame, window=DEFAULT_WINDOW):
+    """Daily means of every metric and their trailing ``window``-day means, as parallel arrays"""
+    days = frame.days
+    ends = np.arange(1, days + 1)
+    starts = np.maximum(ends - window, 0)
+    counts = np.bincount(frame.day, minlength=days)[:days]
+    running_count = np.concatenate(([0], np.cumsum(counts)))
+    window_count = running_count[ends] - running_count[starts]
+
+    result = {
+        'date': [(frame.start + timedelta(days=offset)).isoformat() for offset in range(days)],
+        'entries': counts.tolist(),
+    }
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for metric, values in frame.columns.items():
+            sums = np.bincount(frame.day, weights=values, minlength=days)[:days]
+            running_sum = np.concatenate(([0.0], np.cumsum(sums)))
+            result[metric] = _column(np.where(counts > 0, sums / counts, np.nan))
+            result[f'{metric}_rolling'] = _column(
+                np.where(window_count > 0, (running_sum[ends] - running_sum[starts]) / window_count, np.nan)
+            )
+    return result
+
+
+def correlations(frame):
+    """Within-person Pearson correlation of mood with each other metric"""
+    mood = frame.demeaned(frame.columns['mood'])
+    result = {}
+    for metric in ('energy', 'anxiety', 'sleep'):
+        other = frame.demeaned(frame.columns[metric])
+        denominator = np.sqrt(np.dot(mood, mood) * np.dot(other, other))
+        result[metric] = round(float(np.dot(mood, other) / denominator), 3) if denominator else None
+    return result
+
+
+def tag_effects(frame, min_entries=MIN_TAG_ENTRIES):
+    """
+    Per tag, the mean within-person mood with the tag minus without it,
+    and that difference over the pooled standard deviation (Cohen's d);
+    strongest effects first
+    """
+    if not frame.tags or not len(frame):
+        return []
+    size = len(frame.tags)
+    mood = frame.demeaned(frame.columns['mood'])
+    tagged = mood[frame.tag_entry]
+    with_count = np.bincount(frame.tag_id, minlength=size)
+    with_sum = np.bincount(frame.tag_id, weights=tagged, minlength=size)
+    with_squares = np.bincount(frame.tag_id, weights=tagged * tagged, minlength=size)
+    without_count = len(mood) - with_count
+    without_sum = mood.sum() - with_sum
+    without_squares = np.dot(mood, mood) - with_squares
+
+    reported = (with_count >= min_entries) & (without_count >= min_entries)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        with_mean = with_sum / with_count
+        without_mean = without_sum / without_count
+        difference = with_mean - without_mean
+        # Population variances of both groups, pooled by size
+        pooled = (
+            with_squares - with_count * with_mean ** 2 + without_squares - without_count * without_mean ** 2
+        ) / len(mood)
+        effect = np.where(pooled > 0, difference / np.sqrt(np.maximum(pooled, 0)), np.nan)
+
+    order = [i for i in np.argsort(-np.abs(np.nan_to_num(effect))) if reported[i]]
+    return [
+        {
+            'kind': frame.tags[i][0], 'tag': frame.tags[i][1], 'entries': int(with_count[i]),
+            'mood_difference': round(float(difference[i]), 3),
+            'effect_size': None if np.isnan(effect[i]) else round(float(effect[i]), 3),
+        }
+        for i in order
+    ]
+
+
+def anomalies(frame, threshold=Z_THRESHOLD, min_entries=MIN_BASELINE, limit=MAX_ANOMALIES):
+    """Entries at least ``threshold`` standard deviations from the member's mean mood, most extreme first"""
+    mood = frame.columns['mood']
+    count, mean, std = frame.user_stats(mood)
+    baseline = (count >= min_entries) & (std > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(baseline[frame.user], (mood - mean[frame.user]) / std[frame.user], 0.0)
+    flagged = np.flatnonzero(np.abs(z) >= threshold)
+    flagged = flagged[np.argsort(-np.abs(z[flagged]), kind='stable')][:limit]
+    return [
+        {
+            'user': int(frame.user_ids[frame.user[i]]),
+            'date': (frame.start + timedelta(days=int(frame.day[i]))).isoformat(),
+            'mood': int(mood[i]), 'z': round(float(z[i]), 2),
+        }
+        for i in flagged
+    ]
+
+
+def summarize(frame, window=DEFAULT_WINDOW):
+    timings = {}
+
+    def timed(name, compute, *args):
+        started = time.perf_counter()
+        value = compute(frame, *args)
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        return value
+
+    result = {
+        'users': len(frame.user_ids),
+        'entries': len(frame),
+        'start': frame.start.isoformat(),
+        'end': (frame.start + timedelta(days=frame.days - 1)).isoformat(),
+        'rolling': timed('rolling', rolling_means, window),
+        'correlations': timed('correlations', correlations),
+        'tag_effects': timed('tag_effects', tag_effects),
+        'anomalies': timed('anomalies', anomalies),
+    }
+    logger.debug(f"Mood analytics of {len(frame)} entries: {timings} (ms)")
+    return result
+
+
+def _cache_key(user_ids, start, end, window):
+    selection = ','.join(map(str, sorted(set(user_ids))))
+    digest = hashlib.blake2b(f'{selection}|{start}|{end}|{window}'.encode(), digest_size=16).hexdigest()
+    return f'{CACHE_PREFIX}:{digest}'
+
+
+def analyze(user_ids, start, end, window=DEFAULT_WINDOW):
+    """All analytics of the users' entries from ``start`` to ``end``, cached for ``CACHE_TTL``"""
+    key = _cache_key(user_ids, start, end, window)
+    result = cache.get(key)
+    if result is None:
+        started = time.perf_counter()
+        frame = load_frame(user_ids, start, end)
+        loaded = time.perf_counter()
+        result = summarize(frame, window)
+        logger.info(
+            f"Mood analytics of {len(frame.user_ids)} users, {len(frame)} entries: "
+            f"loaded in {(loaded - started) * 1000:.0f}ms, computed in {(time.perf_counter() - loaded) * 1000:.0f}ms"
+        )
+        cache.set(key, result, timeout=CACHE_TTL)
+    return result
@@ -0,0 +1,160 @@
+"""
+Population mood summary for admins.
+
+``summarize`` streams mood entries ordered by user and date in chunks of
+``CHUNK_SIZE`` through ``QuerySet.iterator``, which reads from a
+server-side (named) cursor on PostgreSQL. Each chunk becomes a few NumPy
+arrays and is added into dense accumulators over (week, age band,
+gender) cells with ``np.bincount``. Memory is therefore bounded by the
+chunk size and the number of cells, whatever the size of
+``wellness_mood_entry``. Distinct users per cell come from the ordering:
+a user's age band and gender are fixed, so a new (user, cell) pair
+starts whenever the user or the week changes from the previous entry.
+The stream is bounded by the first and last dates read before it, which
+size the accumulators, so an entry written in between for a later (or
+earlier) day waits for the next run instead of falling outside them.
+
+The totals replace the ``MoodCohortSummary`` rows of the summarized weeks
+in one transaction. ``summarize_mood_cohorts`` runs the job
+periodically, and the admin endpoint only reads the summary table. Age
+bands use the member's current age.
+"""
+import logging
+import time
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import MoodCohortSummary, MoodEntry
+
+logger = logging.getLogger('performance')
+
+CHUNK_SIZE = 5000
+AGE_BANDS = [('13-15', 13, 15), ('16-18', 16, 18), ('19-21', 19, 21), ('22-23', 22, 23)]
+UNKNOWN_AGE = 'unknown'
+UNSPECIFIED_GENDER = 'unspecified'
+BAND_NAMES = [name for name, _, _ in AGE_BANDS] + [UNKNOWN_AGE]
+GENDERS = [value for value, _ in get_user_model().GENDER_CHOICES] + [UNSPECIFIED_GENDER]
+LOW_MOOD = 2
+MIN_CELL_USERS = 5  # smaller cells are reported without averages
+STATS = ['entries', 'users', 'mood_sum', 'energy_sum', 'anxiety_sum', 'sleep_sum', 'low_mood_entries']
+METRIC_FIELDS = ['mood_rating', 'energy_level', 'anxiety_level', 'sleep_quality']
+
+# Age (0-255) to band index; anything outside the bands is unknown
+_AGE_TO_BAND = np.full(256, len(AGE_BANDS), dtype=np.int64)
+for _band, (_, _low, _high) in enumerate(AGE_BANDS):
+    _AGE_TO_BAND[_low:_high + 1] = _band
+_GENDER_INDEX = {gender: index for index, gender in enumerate(GENDERS)}
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _chunks(rows, size):
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class CohortTotals:
+    """Dense per-cell accumulators over ``weeks`` weeks from ``first_week``"""
+
+    def __init__(self, first_week, weeks):
+        self.first_week = first_week
+        self.shape = (weeks, len(BAND_NAMES), len(GENDERS))
+        self.totals = {stat: np.zeros(int(np.prod(self.shape)), dtype=np.int64) for stat in STATS}
+        self._last = (None, None)  # (user, week) of the previous chunk's last entry
+
+    def add(self, chunk):
+        users, dates, ages, genders, mood, energy, anxiety, sleep = zip(*chunk)
+        users = np.array(users, dtype=np.int64)
+        week = (np.array(dates, dtype='datetime64[D]') - np.datetime64(self.first_week, 'D')).astype(np.int64) // 7
+        ages = np.array([age or 0 for age in ages], dtype=np.int64)
+        band = _AGE_TO_BAND[np.clip(ages, 0, len(_AGE_TO_BAND) - 1)]
+        gender = np.fromiter(
+            (_GENDER_INDEX.get(value, _GENDER_INDEX[UNSPECIFIED_GENDER]) for value in genders),
+            dtype=np.int64, count=len(chunk),
+        )
+        cell = (week * len(BAND_NAMES) + band) * len(GENDERS) + gender
+
+        first_of_pair = np.empty(len(chunk), dtype=bool)
+        first_of_pair[0] = (users[0], week[0]) != self._last
+        first_of_pair[1:] = (users[1:] != users[:-1]) | (week[1:] != week[:-1])
+        self._last = (users[-1], week[-1])
+
+        mood = np.array(mood, dtype=np.int64)
+        size = len(self.totals['entries'])
+        self.totals['entries'] += np.bincount(cell, minlength=size)
+        self.totals['users'] += np.bincount(cell[first_of_pair], minlength=size)
+        self.totals['low_mood_entries'] += np.bincount(cell[mood <= LOW_MOOD], minlength=size)
+        for stat, values in zip(STATS[2:6], (mood, energy, anxiety, sleep)):
+            self.totals[stat] += np.bincount(cell, weights=values, minlength=size).astype(np.int64)
+
+    def rows(self, computed_at):
+        """Unsaved summary rows of the non-empty cells"""
+        rows = []
+        for flat in np.flatnonzero(self.totals['entries']):
+            week, band, gender = np.unravel_index(flat, self.shape)
+            rows.append(MoodCohortSummary(
+                week=self.first_week + timedelta(weeks=int(week)), age_band=BAND_NAMES[band],
+                gender=GENDERS[gender], computed_at=computed_at,
+                **{stat: int(values[flat]) for stat, values in self.totals.items()},
+            ))
+        return rows
+
+
+def summarize(since=None, chunk_size=CHUNK_SIZE):
+    """
+    Recompute the summary of the weeks from the one containing ``since``
+    (all weeks by default); returns the number of summary rows written
+    """
+    started = time.perf_counter()
+    entries = MoodEntry.objects.all()
+    if since is not None:
+        since = week_start(since)
+        entries = entries.filter(date__gte=since)
+
+    bounds = entries.aggregate(first=Min('date'), last=Max('date'))
+    rows, streamed = [], 0
+    if bounds['first'] is not None:
+        first_week = week_start(bounds['first'])
+        totals = CohortTotals(first_week, (week_start(bounds['last']) - first_week).days // 7 + 1)
+        stream = entries.filter(date__gte=bounds['first'], date__lte=bounds['last'])
+        stream = stream.order_by('user_id', 'date').values_list(
+            'user_id', 'date', 'user__age', 'user__gender', *METRIC_FIELDS,
+        ).iterator(chunk_size=chunk_size)
+        for chunk in _chunks(stream, chunk_size):
+            totals.add(chunk)
+            streamed += len(chunk)
+        rows = totals.rows(timezone.now())
+
+    with transaction.atomic():
+        stale = MoodCohortSummary.objects.all()
+        if since is not None:
+            stale = stale.filter(week__gte=since)
+        stale.delete()
+        MoodCohortSummary.objects.bulk_create(rows, batch_size=1000)
+
+    logger.info(
+        f"Summarized {streamed} mood entries into {len(rows)} cohort cells "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return len(rows)
+
+
+def serialize(row):
+    """Averages of one summary row; cells under ``MIN_CELL_USERS`` users get none"""
+    shown = row.users >= MIN_CELL_USERS
+    data = {
+        'week': row.week.isoformat(), 'age_band': row.age_band, 'gender': row.gender,
+        'entries': row.entries, 'users': row.users, 'suppressed': not shown,
+    }
+    for metric in ('mood', 'energy', 'anxiety', 'sleep'):
+        data[f'average_{metric}'] = round(getattr(row, f'{metric}_sum') / row.entries, 2) if shown else None
+    data['low_mood_share'] = round(row.low_mood_entries / row.entries, 3) if shown else None
+    return data
@@ -0,0 +1,116 @@
+"""
+Wellness center dashboard.
+
+The dashboard is assembled from a fixed number of queries whatever the
+size of the member's history: the points row and all totals in one
+(scalar subqueries per table), then recent moods, active challenges,
+today's completions and recent achievements. Today's completions are
+read once as a set of challenge ids and handed to
+``DailyChallengeSerializer``, instead of one ``exists()`` per challenge.
+
+The rendered dashboard is cached per member and day. Mood entries,
+challenge completions, achievements and points drop it once their write
+commits (see ``signals``; ``streaks.award`` updates points with a queryset
+update and drops it itself); edits to the challenge catalogue show after
+``CACHE_TTL``.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DailyChallenge, MoodEntry, UserAchievement, UserChallengeCompletion, UserPoints
+from .serializers import (
+    DailyChallengeSerializer, MoodEntrySerializer, UserAchievementSerializer, UserPointsSerializer,
+)
+
+CACHE_PREFIX = 'wellness:dashboard'
+CACHE_TTL = 300
+RECENT_MOODS = 7
+RECENT_ACHIEVEMENTS = 5
+
+
+def _count(queryset, condition=None):
+    counted = queryset.filter(user=OuterRef('pk'))
+    if condition is not None:
+        counted = counted.filter(condition)
+    counted = counted.order_by().values('user').annotate(total=models.Count('pk')).values('total')
+    return Coalesce(Subquery(counted), 0)
+
+
+def load_summary(user_id, today=None):
+    """
+    Return ``(points, totals)`` in one query; ``points`` is an unsaved
+    default row for members who have not earned any yet
+    """
+    today = today or timezone.now().date()
+    user = get_user_model().objects.select_related('points').annotate(
+        mood_entries_count=_count(MoodEntry.objects.all()),
+        achievements_count=_count(UserAchievement.objects.all()),
+        challenges_completed_total=_count(UserChallengeCompletion.objects.all()),
+        challenges_completed_today=_count(UserChallengeCompletion.objects.all(), Q(completion_date=today)),
+    ).get(pk=user_id)
+    try:
+        points = user.points
+    except UserPoints.DoesNotExist:
+        points = UserPoints(user=user)
+    totals = {
+        name: getattr(user, name)
+        for name in (
+            'mood_entries_count', 'achievements_count', 'challenges_completed_total', 'challenges_completed_today',
+        )
+    }
+    return points, totals
+
+
+def completed_today(user_id, today):
+    """Ids of the challenges the member completed on ``today``"""
+    return set(
+        UserChallengeCompletion.objects.filter(user_id=user_id, completion_date=today)
+        .values_list('challenge_id', flat=True)
+    )
+
+
+def build_dashboard(user_id, today=None):
+    today = today or timezone.now().date()
+    points, totals = load_summary(user_id, today)
+    moods = MoodEntry.objects.filter(user_id=user_id).order_by('-date')[:RECENT_MOODS]
+    challenges = DailyChallenge.objects.filter(is_active=True)
+    achievements = (
+        UserAchievement.objects.filter(user_id=user_id).select_related('achievement')
+        .order_by('-earned_at')[:RECENT_ACHIEVEMENTS]
+    )
+    context = {'completed_today': completed_today(user_id, today)}
+    return {
+        'user_points': UserPointsSerializer(points).data,
+        'recent_moods': MoodEntrySerializer(moods, many=True).data,
+        'todays_challenges': DailyChallengeSerializer(challenges, many=True, context=context).data,
+        'recent_achievements': UserAchievementSerializer(achievements, many=True).data,
+        'stats': {
+            'total_mood_entries': totals['mood_entries_count'],
+            'challenges_completed_today': totals['challenges_completed_today'],
+            'total_achievements': totals['achievements_count'],
+        },
+    }
+
+
+def _cache_key(user_id, today):
+    return f'{CACHE_PREFIX}:{user_id}:{today.isoformat()}'
+
+
+def get_dashboard(user_id):
+    """The member's dashboard, cached until their next wellness write"""
+    today = timezone.now().date()
+    key = _cache_key(user_id, today)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user_id, today)
+        cache.set(key, dashboard, timeout=CACHE_TTL)
+    return dashboard
+
+
+def invalidate_dashboard(user_id):
+    key = _cache_key(user_id, timezone.now().date())
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,56 @@
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from wellness import analytics
+
+ACTIVITIES = ['exercise', 'reading', 'friends', 'music', 'outdoors', 'gaming']
+TRIGGERS = ['exams', 'family', 'sleep', 'social media', 'money']
+
+
+class Command(BaseCommand):
+    help = 'Measure mood analytics on a synthetic cohort (no database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--fill', type=float, default=1.0, help='Share of days with an entry')
+        parser.add_argument('--tags', type=float, default=0.3, help='Chance of each tag per entry, over all tags')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(7)
+        users, days = options['users'], options['days']
+        grid = rng.random((users, days)) < options['fill']
+        user, day = np.nonzero(grid)
+        entries = len(user)
+
+        baseline = rng.normal(3, 0.6, users)[user]
+        sleep = rng.integers(1, 6, entries)
+        energy = rng.integers(1, 6, entries)
+        anxiety = rng.integers(1, 6, entries)
+        tags = [('activity', name) for name in ACTIVITIES] + [('trigger', name) for name in TRIGGERS]
+        tagged = rng.random((entries, len(tags))) < options['tags'] / len(tags)
+        tag_entry, tag_id = np.nonzero(tagged)
+        effect = np.array([0.4] * len(ACTIVITIES) + [-0.5] * len(TRIGGERS))
+        mood = baseline + 0.3 * (sleep - 3) - 0.2 * (anxiety - 3) + (tagged * effect).sum(axis=1)
+        mood = np.clip(np.rint(mood + rng.normal(0, 0.7, entries)), 1, 5)
+
+        frame = analytics.MoodFrame(
+            date(2025, 1, 1), days, np.arange(1, users + 1), user, day,
+            {'mood': mood, 'energy': energy, 'anxiety': anxiety, 'sleep': sleep}, tags, tag_entry, tag_id,
+        )
+        self.stdout.write(f'{users} users, {days} days: {entries} entries, {len(tag_entry)} tags')
+
+        total = 0.0
+        for name, compute in [
+            ('rolling means', analytics.rolling_means), ('correlations', analytics.correlations),
+            ('tag effects', analytics.tag_effects), ('anomalies', analytics.anomalies),
+        ]:
+            started = time.perf_counter()
+            compute(frame)
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            self.stdout.write(f'{name}: {elapsed * 1000:.0f}ms')
+        self.stdout.write(self.style.SUCCESS(f'Analytics finished in {total:.2f}s ({entries / total:.0f} entries/s)'))
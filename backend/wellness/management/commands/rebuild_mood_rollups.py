@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from wellness import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user mood rollups from the mood entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help='Only rebuild these users')
+
+    def handle(self, *args, **options):
+        rows = rollups.rebuild(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} mood rollups'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from wellness import streaks
+
+
+class Command(BaseCommand):
+    help = 'Recompute streaks and levels from the mood entry and challenge completion dates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help='Only recompute these users')
+        parser.add_argument('--batch-size', type=int, default=streaks.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        rows = streaks.recompute(options['user_ids'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {rows} streaks'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from wellness import cohorts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the weekly mood summary by age band and gender'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, help='Only recompute the last N weeks (default: all)')
+        parser.add_argument('--chunk-size', type=int, default=cohorts.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['weeks']:
+            since = timezone.now().date() - timezone.timedelta(weeks=options['weeks'] - 1)
+        rows = cohorts.summarize(since, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} mood cohort summary rows'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from wellness.rollups import build_rollups
+
+
+def backfill_rollups(apps, schema_editor):
+    MoodEntry = apps.get_model('wellness', 'MoodEntry')
+    MoodRollup = apps.get_model('wellness', 'MoodRollup')
+    MoodRollup.objects.bulk_create(build_rollups(MoodEntry, MoodRollup), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('start', models.DateField(help_text='First day of the period')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mood_sum', models.PositiveIntegerField(default=0)),
+                ('energy_sum', models.PositiveIntegerField(default=0)),
+                ('anxiety_sum', models.PositiveIntegerField(default=0)),
+                ('sleep_sum', models.PositiveIntegerField(default=0)),
+                ('running_count', models.PositiveIntegerField(default=0)),
+                ('running_mood', models.PositiveIntegerField(default=0)),
+                ('running_energy', models.PositiveIntegerField(default=0)),
+                ('running_anxiety', models.PositiveIntegerField(default=0)),
+                ('running_sleep', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mood_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'wellness_mood_rollup',
+                'ordering': ['start'],
+                'unique_together': {('user', 'period', 'start')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-19 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wellness', '0002_mood_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodCohortSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(help_text='Monday of the week')),
+                ('age_band', models.CharField(max_length=10)),
+                ('gender', models.CharField(max_length=20)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('mood_sum', models.PositiveIntegerField(default=0)),
+                ('energy_sum', models.PositiveIntegerField(default=0)),
+                ('anxiety_sum', models.PositiveIntegerField(default=0)),
+                ('sleep_sum', models.PositiveIntegerField(default=0)),
+                ('low_mood_entries', models.PositiveIntegerField(default=0, help_text='Entries with a mood of 2 or lower')),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'wellness_mood_cohort_summary',
+                'ordering': ['week', 'age_band', 'gender'],
+                'unique_together': {('week', 'age_band', 'gender')},
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -50,6 +50,74 @@ class MoodEntry(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.date} (Mood: {self.mood_rating})"
 
+    def save(self, *args, **kwargs):
+        # The user's mood rollups are updated by signal handlers and must
+        # commit together with the entry
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+class MoodRollup(models.Model):
+    """Sums of a user's mood entries per day, week and month (see ``rollups``)"""
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='mood_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    start = models.DateField(help_text="First day of the period")
+
+    count = models.PositiveIntegerField(default=0)
+    mood_sum = models.PositiveIntegerField(default=0)
+    energy_sum = models.PositiveIntegerField(default=0)
+    anxiety_sum = models.PositiveIntegerField(default=0)
+    sleep_sum = models.PositiveIntegerField(default=0)
+
+    # Sums of this and all earlier periods of the user
+    running_count = models.PositiveIntegerField(default=0)
+    running_mood = models.PositiveIntegerField(default=0)
+    running_energy = models.PositiveIntegerField(default=0)
+    running_anxiety = models.PositiveIntegerField(default=0)
+    running_sleep = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'wellness_mood_rollup'
+        # Also the index for range reads
+        unique_together = ['user', 'period', 'start']
+        ordering = ['start']
+
+    def __str__(self):
+        return f"{self.user_id} - {self.period} of {self.start} ({self.count} entries)"
+
+class MoodCohortSummary(models.Model):
+    """Weekly mood totals of one age band and gender (see ``cohorts``)"""
+    week = models.DateField(help_text="Monday of the week")
+    age_band = models.CharField(max_length=10)
+    gender = models.CharField(max_length=20)
+
+    entries = models.PositiveIntegerField(default=0)
+    users = models.PositiveIntegerField(default=0)
+    mood_sum = models.PositiveIntegerField(default=0)
+    energy_sum = models.PositiveIntegerField(default=0)
+    anxiety_sum = models.PositiveIntegerField(default=0)
+    sleep_sum = models.PositiveIntegerField(default=0)
+    low_mood_entries = models.PositiveIntegerField(default=0, help_text="Entries with a mood of 2 or lower")
+
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'wellness_mood_cohort_summary'
+        unique_together = ['week', 'age_band', 'gender']
+        ordering = ['week', 'age_band', 'gender']
+
+    def __str__(self):
+        return f"{self.week} {self.age_band} {self.gender} ({self.entries} entries)"
+
 class Achievement(models.Model):
     """Available achievements for gamification"""
     CATEGORY_CHOICES = [
@@ -116,28 +184,19 @@ class UserPoints(models.Model):
     def __str__(self):
         return f"{self.user.username} - Level {self.level} ({self.total_points} points)"
 
-    def add_points(self, points, activity_type="general"):
-        """Add points and update level if necessary"""
-        self.total_points += points
-
-        # Update streak
-        today = timezone.now().date()
-        if self.last_activity_date == today - timezone.timedelta(days=1):
-            self.current_streak += 1
-        elif self.last_activity_date != today:
-            self.current_streak = 1
-
-        if self.current_streak > self.longest_streak:
-            self.longest_streak = self.current_streak
+    def active_streak(self, today=None):
+        """``current_streak`` as of ``today``; it lapses after a whole day without activity"""
+        today = today or timezone.now().date()
+        if self.last_activity_date and self.last_activity_date >= today - timezone.timedelta(days=1):
+            return self.current_streak
+        return 0
 
-        self.last_activity_date = today
-
-        # Check for level up
-        while self.total_points >= self.points_to_next_level:
-            self.level += 1
-            self.points_to_next_level = self.level * 100  # Simple progression
+    def add_points(self, points, activity_type="general"):
+        """Add points and update streak and level in one statement (see ``streaks.award``)"""
+        from .streaks import award
 
-        self.save()
+        award(self.user_id, points)
+        self.refresh_from_db()
 
 class DailyChallenge(models.Model):
     """Daily wellness challenges"""
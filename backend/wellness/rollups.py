@@ -0,0 +1,179 @@
+"""
+Incremental mood statistics.
+
+Every mood entry adds its ratings to one ``MoodRollup`` row per period: its
+day, its week (starting on Monday) and its month. Each row also carries
+running totals, the sums of that row and all earlier rows of the member
+and period. The totals of any run of periods are then the difference of
+two running totals, so an average over an arbitrary range costs the same
+as over one day. A year of statistics is a single range read on the
+``(user, period, start)`` index: at most 366 daily, 53 weekly or 12
+monthly rows.
+
+``signals`` applies each entry write, update and delete to the rollups in
+the entry's transaction. Queryset updates bypass them;
+``rebuild_mood_rollups`` recomputes the rows from the entries.
+"""
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import MoodEntry, MoodRollup
+
+logger = logging.getLogger('performance')
+
+PERIODS = ('day', 'week', 'month')
+# Trend column: MoodEntry field
+METRICS = {'mood': 'mood_rating', 'energy': 'energy_level', 'anxiety': 'anxiety_level', 'sleep': 'sleep_quality'}
+SUM_FIELDS = ['count'] + [f'{metric}_sum' for metric in METRICS]
+RUNNING_FIELDS = ['running_count'] + [f'running_{metric}' for metric in METRICS]
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def entry_values(entry):
+    """``(day, (1, mood, energy, anxiety, sleep))`` of an entry, in ``SUM_FIELDS`` order"""
+    # ``date`` defaults to a datetime until the entry is reloaded
+    day = MoodEntry._meta.get_field('date').to_python(entry.date)
+    return day, (1, *(getattr(entry, field) for field in METRICS.values()))
+
+
+def _insert(user_id, period, start, deltas):
+    previous = (
+        MoodRollup.objects.filter(user_id=user_id, period=period, start__lt=start)
+        .order_by('-start').values_list(*RUNNING_FIELDS).first()
+    ) or (0,) * len(RUNNING_FIELDS)
+    try:
+        with transaction.atomic():
+            MoodRollup.objects.create(
+                user_id=user_id, period=period, start=start,
+                **dict(zip(SUM_FIELDS, deltas)),
+                **{field: base + delta for field, base, delta in zip(RUNNING_FIELDS, previous, deltas)},
+            )
+        return True
+    except IntegrityError:
+        # Created by a concurrent write in the meantime
+        return False
+
+
+def apply(user_id, day, values, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) one entry's values on ``day``"""
+    deltas = [sign * value for value in values]
+    own = {field: F(field) + delta for field, delta in zip(SUM_FIELDS, deltas)}
+    running = {field: F(field) + delta for field, delta in zip(RUNNING_FIELDS, deltas)}
+    for period in PERIODS:
+        start = period_start(period, day)
+        rows = MoodRollup.objects.filter(user_id=user_id, period=period)
+        if not rows.filter(start=start).update(**own, **running):
+            if sign < 0:
+                logger.warning(f"Mood rollup {period} {start} of user {user_id} is missing; rebuild the rollups")
+                continue
+            if not _insert(user_id, period, start, deltas):
+                rows.filter(start=start).update(**own, **running)
+        elif sign < 0:
+            # An emptied period adds nothing to the running totals
+            rows.filter(start=start, count=0).delete()
+        rows.filter(start__gt=start).update(**running)
+
+
+def build_rollups(entry_model, rollup_model, user_ids=None):
+    """Unsaved rollup rows, running totals included, for the members' entries"""
+    entries = entry_model.objects.order_by()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    sums = {}
+    for user_id, day, *metrics in entries.values_list('user_id', 'date', *METRICS.values()).iterator():
+        for period in PERIODS:
+            totals = sums.setdefault((user_id, period, period_start(period, day)), [0] * len(SUM_FIELDS))
+            for i, value in enumerate((1, *metrics)):
+                totals[i] += value
+
+    rows = []
+    running = {}
+    for user_id, period, start in sorted(sums):
+        own = sums[user_id, period, start]
+        total = [base + value for base, value in zip(running.get((user_id, period), [0] * len(SUM_FIELDS)), own)]
+        running[user_id, period] = total
+        rows.append(rollup_model(
+            user_id=user_id, period=period, start=start,
+            **dict(zip(SUM_FIELDS, own)), **dict(zip(RUNNING_FIELDS, total)),
+        ))
+    return rows
+
+
+def rebuild(user_ids=None):
+    """Recompute the rollups of the given members (all by default); returns the number of rows"""
+    with transaction.atomic():
+        existing = MoodRollup.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        return len(MoodRollup.objects.bulk_create(build_rollups(MoodEntry, MoodRollup, user_ids), batch_size=1000))
+
+
+class MoodSeries:
+    """
+    One member's rollups of a period over a date range, as columns, with
+    totals of any sub-range taken from the running sums
+    """
+
+    def __init__(self, period, rows):
+        self.period = period
+        self.starts = [row[0] for row in rows]
+        columns = list(zip(*rows)) or [()] * (1 + len(SUM_FIELDS) + len(RUNNING_FIELDS))
+        self.sums = dict(zip(SUM_FIELDS, columns[1:1 + len(SUM_FIELDS)]))
+        self.running = dict(zip(RUNNING_FIELDS, columns[1 + len(SUM_FIELDS):]))
+
+    def totals(self, start=None, end=None):
+        """``{'count': n, 'mood': sum, ...}`` over the periods starting within ``[start, end]``"""
+        first = 0 if start is None else bisect_left(self.starts, start)
+        last = len(self.starts) - 1 if end is None else bisect_right(self.starts, end) - 1
+        names = ['count', *METRICS]
+        if first > last:
+            return dict.fromkeys(names, 0)
+        return {
+            name: self.running[running][last] - self.running[running][first] + self.sums[own][first]
+            for name, own, running in zip(names, SUM_FIELDS, RUNNING_FIELDS)
+        }
+
+    def averages(self, start=None, end=None):
+        totals = self.totals(start, end)
+        return {
+            metric: round(totals[metric] / totals['count'], 2) if totals['count'] else None
+            for metric in METRICS
+        }
+
+    def trend(self):
+        """Per-period averages as parallel arrays; periods without entries are left out"""
+        present = [i for i, count in enumerate(self.sums['count']) if count]
+        trend = {
+            'date': [self.starts[i].isoformat() for i in present],
+            'entries': [self.sums['count'][i] for i in present],
+        }
+        for metric in METRICS:
+            column = self.sums[f'{metric}_sum']
+            trend[metric] = [round(column[i] / self.sums['count'][i], 2) for i in present]
+        return trend
+
+
+def load_series(user_id, start, end, period='day'):
+    """
+    The member's ``period`` rollups from the one containing ``start`` up
+    to ``end``, in a single query
+    """
+    rows = (
+        MoodRollup.objects.filter(
+            user_id=user_id, period=period, start__gte=period_start(period, start), start__lte=end,
+        )
+        .order_by('start').values_list('start', *SUM_FIELDS, *RUNNING_FIELDS)
+    )
+    return MoodSeries(period, list(rows))
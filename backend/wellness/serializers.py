@@ -50,6 +50,8 @@ class UserAchievementSerializer(serializers.ModelSerializer):
         ]
 
 class UserPointsSerializer(serializers.ModelSerializer):
+    current_streak = serializers.SerializerMethodField()
+
     class Meta:
         model = UserPoints
         fields = [
@@ -57,6 +59,9 @@ class UserPointsSerializer(serializers.ModelSerializer):
             'level', 'points_to_next_level', 'created_at', 'updated_at'
         ]
 
+    def get_current_streak(self, obj):
+        return obj.active_streak()
+
 class DailyChallengeSerializer(serializers.ModelSerializer):
     is_completed_today = serializers.SerializerMethodField()
     
@@ -69,6 +74,10 @@ class DailyChallengeSerializer(serializers.ModelSerializer):
         ]
     
     def get_is_completed_today(self, obj):
+        # Views listing many challenges pass the ids completed today
+        completed = self.context.get('completed_today')
+        if completed is not None:
+            return obj.id in completed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             from django.utils import timezone
@@ -144,7 +153,8 @@ class MoodStatsSerializer(serializers.Serializer):
     average_sleep = serializers.FloatField()
     total_entries = serializers.IntegerField()
     current_streak = serializers.IntegerField()
-    mood_trend = serializers.ListField(child=serializers.DictField())
+    period = serializers.ChoiceField(choices=['day', 'week', 'month'])
+    mood_trend = serializers.DictField(child=serializers.ListField())
 
 class WellnessStatsSerializer(serializers.Serializer):
     """Serializer for wellness dashboard statistics"""
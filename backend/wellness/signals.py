@@ -0,0 +1,60 @@
+"""
+Drop a member's cached wellness dashboard (see ``dashboard``) whenever
+one of its parts is written: mood entries, challenge completions,
+achievements and points. Bulk queryset updates bypass these handlers and
+show after the cache expires.
+
+Mood entry writes also update the member's mood rollups (see
+``rollups``) in the entry's transaction. Creating an entry adds it,
+deleting removes it, and changing its date or ratings moves it.
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import rollups
+from .dashboard import invalidate_dashboard
+from .models import MoodEntry, UserAchievement, UserChallengeCompletion, UserPoints
+
+ROLLUP_ATTR = '_loaded_rollup_values'
+
+
+def invalidate_dashboard_on_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_dashboard(instance.user_id)
+
+
+def snapshot_mood(sender, instance, **kwargs):
+    tracked = {'user_id', 'date', *rollups.METRICS.values()}
+    if instance.pk is None or tracked & instance.get_deferred_fields():
+        value = None
+    else:
+        value = (instance.user_id, *rollups.entry_values(instance))
+    setattr(instance, ROLLUP_ATTR, value)
+
+
+def update_rollups_on_mood_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.user_id, *rollups.entry_values(instance))
+    previous = None if created else getattr(instance, ROLLUP_ATTR, None)
+    setattr(instance, ROLLUP_ATTR, current)
+    if previous == current or (previous is None and not created):
+        return
+
+    if previous is not None:
+        rollups.apply(*previous, sign=-1)
+    rollups.apply(*current)
+
+
+def update_rollups_on_mood_delete(sender, instance, **kwargs):
+    loaded = getattr(instance, ROLLUP_ATTR, None)
+    rollups.apply(*(loaded or (instance.user_id, *rollups.entry_values(instance))), sign=-1)
+
+
+for model in (MoodEntry, UserAchievement, UserChallengeCompletion, UserPoints):
+    label = model._meta.model_name
+    post_save.connect(invalidate_dashboard_on_change, sender=model, dispatch_uid=f'wellness:{label}_save')
+    post_delete.connect(invalidate_dashboard_on_change, sender=model, dispatch_uid=f'wellness:{label}_delete')
+
+post_init.connect(snapshot_mood, sender=MoodEntry, dispatch_uid='wellness:mood_rollup_snapshot')
+post_save.connect(update_rollups_on_mood_save, sender=MoodEntry, dispatch_uid='wellness:mood_rollup_save')
+post_delete.connect(update_rollups_on_mood_delete, sender=MoodEntry, dispatch_uid='wellness:mood_rollup_delete')
@@ -0,0 +1,151 @@
+"""
+Points, levels and activity streaks.
+
+``award`` applies a points award as a single ``UPDATE`` of the member's
+``UserPoints`` row. The new total, streak, longest streak, level and
+activity date are all SQL expressions of the row's current values, so
+concurrent awards are serialized by the row lock and none of them is
+lost. The streak grows when the previous activity was yesterday, stays
+the same on a second activity today, and otherwise restarts at 1. The
+level comes from the total in closed form (``level_for``): one level
+every ``POINTS_PER_LEVEL`` points.
+
+``current_streak`` is the streak as of ``last_activity_date``; readers
+use ``UserPoints.active_streak`` so a streak that has lapsed shows as 0.
+
+``recompute`` derives the streaks from the days with a mood entry or a
+challenge completion, for backfills and repairs. Each batch of members
+becomes sorted (user, day) arrays, and a run-length pass splits them
+into runs of consecutive days: the current streak is the length of the
+member's last run and the longest streak their longest one.
+``recompute_streaks`` runs it.
+"""
+import logging
+import time
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard
+from .models import MoodEntry, UserChallengeCompletion, UserPoints
+
+logger = logging.getLogger('performance')
+
+POINTS_PER_LEVEL = 100
+BATCH_SIZE = 5000  # members per recompute batch
+RECOMPUTED_FIELDS = ['current_streak', 'longest_streak', 'last_activity_date', 'level', 'points_to_next_level']
+
+
+def level_for(total_points):
+    """``(level, points_to_next_level)`` of a points total"""
+    level = total_points // POINTS_PER_LEVEL + 1
+    return level, level * POINTS_PER_LEVEL
+
+
+def _streak_after(today):
+    return Case(
+        When(last_activity_date=today, then=F('current_streak')),
+        When(last_activity_date=today - timezone.timedelta(days=1), then=F('current_streak') + 1),
+        default=Value(1),
+        output_field=PositiveIntegerField(),
+    )
+
+
+def award(user_id, points, today=None):
+    """Add ``points`` earned on ``today`` to the member's total, streak and level"""
+    today = today or timezone.now().date()
+    total = F('total_points') + points
+    # Integer division, as ``level_for``
+    level = total / POINTS_PER_LEVEL + 1
+    streak = _streak_after(today)
+    changes = {
+        'total_points': total,
+        'current_streak': streak,
+        'longest_streak': Greatest('longest_streak', streak),
+        'last_activity_date': today,
+        'level': level,
+        'points_to_next_level': level * POINTS_PER_LEVEL,
+        'updated_at': timezone.now(),
+    }
+    rows = UserPoints.objects.filter(user_id=user_id)
+    if not rows.update(**changes):
+        UserPoints.objects.get_or_create(user_id=user_id)
+        rows.update(**changes)
+    # Queryset updates do not send post_save
+    invalidate_dashboard(user_id)
+
+
+def activity_days(user_ids):
+    """Distinct ``(user, day)`` arrays of the members' activity, sorted by user then day"""
+    pairs = list(
+        MoodEntry.objects.filter(user_id__in=user_ids).order_by()
+        .values_list('user_id', 'date').distinct()
+    )
+    pairs += list(
+        UserChallengeCompletion.objects.filter(user_id__in=user_ids).order_by()
+        .values_list('user_id', 'completion_date').distinct()
+    )
+    if not pairs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    users, dates = zip(*pairs)
+    users = np.array(users, dtype=np.int64)
+    days = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+    order = np.lexsort((days, users))
+    users, days = users[order], days[order]
+    distinct = np.ones(len(users), dtype=bool)
+    distinct[1:] = (users[1:] != users[:-1]) | (days[1:] != days[:-1])
+    return users[distinct], days[distinct]
+
+
+def streak_runs(users, days):
+    """Runs of consecutive days as ``(user, last_day, length)`` arrays, in input order"""
+    starts = np.ones(len(users), dtype=bool)
+    starts[1:] = (users[1:] != users[:-1]) | (days[1:] != days[:-1] + 1)
+    first = np.flatnonzero(starts)
+    lengths = np.diff(np.append(first, len(users)))
+    return users[first], days[first] + lengths - 1, lengths
+
+
+def user_streaks(users, days):
+    """``(user, current, longest, last_day)`` arrays with one entry per member present"""
+    run_user, run_end, run_length = streak_runs(users, days)
+    if not len(run_user):
+        return run_user, run_length, run_length, run_end
+    first = np.flatnonzero(np.append(True, run_user[1:] != run_user[:-1]))
+    last = np.append(first[1:], len(run_user)) - 1
+    return run_user[first], run_length[last], np.maximum.reduceat(run_length, first), run_end[last]
+
+
+def recompute(user_ids=None, batch_size=BATCH_SIZE):
+    """
+    Rederive the streaks and levels of the members' points rows (all by
+    default); returns the number of rows updated. Cached dashboards show
+    the new values once they expire.
+    """
+    started = time.perf_counter()
+    rows = UserPoints.objects.order_by('user_id')
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    ids = list(rows.values_list('user_id', flat=True))
+
+    updated = 0
+    for offset in range(0, len(ids), batch_size):
+        batch = ids[offset:offset + batch_size]
+        users, current, longest, last_day = user_streaks(*activity_days(batch))
+        derived = dict(zip(
+            users.tolist(),
+            zip(current.tolist(), longest.tolist(), last_day.astype('datetime64[D]').tolist()),
+        ))
+        with transaction.atomic():
+            points = list(UserPoints.objects.select_for_update().filter(user_id__in=batch))
+            for row in points:
+                row.current_streak, row.longest_streak, row.last_activity_date = derived.get(row.user_id, (0, 0, None))
+                row.level, row.points_to_next_level = level_for(row.total_points)
+            UserPoints.objects.bulk_update(points, RECOMPUTED_FIELDS, batch_size=1000)
+        updated += len(points)
+
+    logger.info(f"Recomputed streaks of {updated} members in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return updated
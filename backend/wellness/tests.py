@@ -1,3 +1,441 @@
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from guide.models import ClientAssignment
+from . import analytics, cohorts, rollups, streaks
+from .models import (
+    Achievement, DailyChallenge, MoodCohortSummary, MoodEntry, MoodRollup, UserAchievement,
+    UserChallengeCompletion, UserPoints,
+)
+
+
+class WellnessDashboardTest(TestCase):
+    """The wellness center is built from a fixed number of queries and cached per member"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('wellness-center')
+        self.today = timezone.now().date()
+
+    def create_challenges(self, count):
+        return [
+            DailyChallenge.objects.create(
+                title=f'Challenge {i}', description='Breathe', challenge_type='breathing', instructions='Slowly',
+            )
+            for i in range(count)
+        ]
+
+    def create_history(self, days, start=0):
+        for day in range(start, start + days):
+            MoodEntry.objects.create(
+                user=self.user, mood_rating=3, energy_level=3, anxiety_level=2, sleep_quality=4,
+                date=self.today - timezone.timedelta(days=day),
+            )
+        for i in range(start, start + days):
+            achievement = Achievement.objects.create(
+                name=f'Achievement {i}', description='Well done', category='wellness', icon='star', criteria={},
+            )
+            UserAchievement.objects.create(user=self.user, achievement=achievement, points_earned=10)
+
+    def test_query_count_is_fixed(self):
+        challenges = self.create_challenges(3)
+        self.create_history(3)
+        UserChallengeCompletion.objects.create(user=self.user, challenge=challenges[1], points_earned=5)
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+
+        self.create_challenges(10)
+        self.create_history(10, start=3)
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+
+        completed = {row['id']: row['is_completed_today'] for row in response.data['todays_challenges']}
+        self.assertEqual(completed, {challenges[0].id: False, challenges[1].id: True, challenges[2].id: False})
+        self.assertEqual(response.data['stats'], {
+            'total_mood_entries': 3, 'challenges_completed_today': 1, 'total_achievements': 3,
+        })
+        self.assertEqual(response.data['user_points']['total_points'], 0)
+        self.assertEqual(len(response.data['recent_achievements']), 3)
+
+    def test_cached_until_a_wellness_write(self):
+        challenge = self.create_challenges(1)[0]
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('complete-challenge', args=[challenge.pk]))
+        self.assertEqual(response.status_code, 200)
+        data = self.client.get(self.url).data
+        self.assertTrue(data['todays_challenges'][0]['is_completed_today'])
+        self.assertEqual(data['user_points']['total_points'], challenge.points_reward)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('mood-entries'), {
+                'mood_rating': 4, 'energy_level': 3, 'anxiety_level': 2, 'sleep_quality': 4,
+                'date': self.today.isoformat(),
+            }, format='json')
+        self.assertEqual(self.client.get(self.url).data['stats']['total_mood_entries'], 1)
+
+    def test_stats_and_challenge_list(self):
+        challenges = self.create_challenges(2)
+        self.create_history(2)
+        UserChallengeCompletion.objects.create(user=self.user, challenge=challenges[0], points_earned=5)
+        UserChallengeCompletion.objects.create(
+            user=self.user, challenge=challenges[1], points_earned=5,
+            completion_date=self.today - timezone.timedelta(days=1),
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('wellness-stats'))
+        self.assertEqual(response.data, {
+            'total_points': 0, 'current_level': 1, 'achievements_count': 2, 'challenges_completed_today': 1,
+            'challenges_completed_total': 2, 'current_streak': 0, 'mood_entries_count': 2,
+        })
+
+        # One query for today's completions, whatever the number of challenges
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('daily-challenges'))
+        completed = {row['id']: row['is_completed_today'] for row in response.data['results']}
+        self.assertEqual(completed, {challenges[0].id: True, challenges[1].id: False})
+
+
+class MoodRollupTest(TestCase):
+    """Mood stats are answered from rollups kept in step with every entry write"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+
+    def add_entry(self, days_ago, mood, **kwargs):
+        values = {'energy_level': 3, 'anxiety_level': 2, 'sleep_quality': 4, **kwargs}
+        return MoodEntry.objects.create(
+            user=self.user, mood_rating=mood, date=self.today - timezone.timedelta(days=days_ago), **values,
+        )
+
+    def rollups(self):
+        fields = ['period', 'start', *rollups.SUM_FIELDS, *rollups.RUNNING_FIELDS]
+        return list(MoodRollup.objects.order_by('period', 'start').values_list(*fields))
+
+    def test_writes_match_a_rebuild(self):
+        entries = [self.add_entry(days_ago, mood) for days_ago, mood in [(40, 2), (9, 5), (8, 1), (1, 3), (0, 4)]]
+        entries[1].mood_rating = 4
+        entries[1].save()
+        entries[2].date = self.today - timezone.timedelta(days=60)
+        entries[2].save()
+        entries[3].delete()
+        # A backdated entry shifts the running totals of every later period
+        self.add_entry(20, 2, sleep_quality=1)
+
+        maintained = self.rollups()
+        self.assertEqual(rollups.rebuild(), len(maintained))
+        self.assertEqual(self.rollups(), maintained)
+
+    def test_range_totals_from_running_sums(self):
+        for days_ago, mood in [(30, 1), (10, 2), (5, 4), (0, 5)]:
+            self.add_entry(days_ago, mood)
+        series = rollups.load_series(self.user.id, self.today - timezone.timedelta(days=31), self.today)
+        self.assertEqual(series.totals()['count'], 4)
+        middle = series.totals(self.today - timezone.timedelta(days=10), self.today - timezone.timedelta(days=1))
+        self.assertEqual((middle['count'], middle['mood']), (2, 6))
+        self.assertEqual(series.averages(self.today, self.today)['mood'], 5)
+        self.assertEqual(series.totals(self.today + timezone.timedelta(days=1))['count'], 0)
+
+    def test_stats_endpoint(self):
+        for days_ago in range(0, 365, 7):
+            self.add_entry(days_ago, 1 + days_ago % 5)
+        url = reverse('mood-stats')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'days': 365, 'period': 'month'})
+        entries = MoodEntry.objects.filter(date__gte=self.today - timezone.timedelta(days=365))
+        self.assertEqual(response.data['total_entries'], entries.count())
+        trend = response.data['mood_trend']
+        self.assertEqual(sum(trend['entries']), entries.count())
+        self.assertEqual(len(trend['date']), len(trend['mood']))
+        self.assertLessEqual(len(trend['date']), 13)
+
+        response = self.client.get(url, {'days': 14})
+        self.assertEqual(response.data['mood_trend']['date'], [
+            (self.today - timezone.timedelta(days=days_ago)).isoformat() for days_ago in (14, 7, 0)
+        ])
+        recent = [1 + days_ago % 5 for days_ago in (14, 7, 0)]
+        self.assertEqual(response.data['average_mood'], round(sum(recent) / 3, 2))
+        self.assertEqual(self.client.get(url, {'period': 'year'}).status_code, 400)
+
+    def test_stats_window_ignores_the_rest_of_the_period(self):
+        self.add_entry(10, 1)
+        self.add_entry(0, 5)
+        url = reverse('mood-stats')
+        for period in rollups.PERIODS:
+            response = self.client.get(url, {'days': 1, 'period': period})
+            self.assertEqual((response.data['total_entries'], response.data['average_mood']), (1, 5), period)
+
+
+class MoodAnalyticsTest(TestCase):
+    """Vectorized mood analytics for a member and a guide's clients"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.guide = User.objects.create_user(
+            email='guide@example.com', username='guide', password='pass12345', role='guide'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+
+    def add_entries(self, user, days=20):
+        # Sleep drives mood; exercise lifts it, exams lower it; day 3 is a crash
+        for day in range(days):
+            sleep = 1 + day % 5
+            activities, triggers = (['Exercise'] if day % 2 else []), (['exams'] if day % 3 == 0 else [])
+            mood = min(5, max(1, sleep - (1 if triggers else 0) + (1 if activities else 0)))
+            if day == 3:
+                mood = 1
+            MoodEntry.objects.create(
+                user=user, mood_rating=mood, energy_level=3, anxiety_level=1 + (day * 7) % 5, sleep_quality=sleep,
+                activities=activities, triggers=triggers, date=self.today - timezone.timedelta(days=days - 1 - day),
+            )
+
+    def test_frame_statistics(self):
+        self.add_entries(self.user)
+        start = self.today - timezone.timedelta(days=29)
+        frame = analytics.load_frame([self.user.id], start, self.today)
+        self.assertEqual(len(frame), 20)
+
+        moods = frame.columns['mood']
+        self.assertAlmostEqual(
+            analytics.correlations(frame)['sleep'],
+            round(float(np.corrcoef(moods, frame.columns['sleep'])[0, 1]), 3),
+        )
+        self.assertIsNone(analytics.correlations(frame)['energy'])
+
+        effects = {(row['kind'], row['tag']): row for row in analytics.tag_effects(frame)}
+        self.assertGreater(effects['activity', 'exercise']['effect_size'], 0)
+        self.assertLess(effects['trigger', 'exams']['effect_size'], 0)
+
+        rolling = analytics.rolling_means(frame, window=3)
+        self.assertEqual(len(rolling['date']), 30)
+        self.assertIsNone(rolling['mood'][0])
+        self.assertEqual(rolling['mood_rolling'][-1], round(float(moods[-3:].mean()), 3))
+
+        frame = analytics.MoodFrame(
+            start, 30, [1, 2], [0] * 10 + [1] * 10, list(range(10)) * 2,
+            {
+                'mood': [3] * 9 + [1] + [2, 4] * 5, 'energy': [3] * 20, 'anxiety': [3] * 20, 'sleep': [3] * 20,
+            },
+        )
+        self.assertEqual(analytics.anomalies(frame), [
+            {'user': 1, 'date': (start + timezone.timedelta(days=9)).isoformat(), 'mood': 1, 'z': -3.0},
+        ])
+
+    def test_own_analytics_cached(self):
+        self.add_entries(self.user)
+        url = reverse('mood-analytics')
+        response = self.client.get(url, {'days': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['users'], response.data['entries']), (1, 20))
+        with self.assertNumQueries(0):
+            self.client.get(url, {'days': 30})
+
+    def test_cohort_of_active_clients(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+        former = User.objects.create_user(email='former@example.com', username='former', password='pass12345')
+        for user in (self.user, other, former):
+            self.add_entries(user)
+        ClientAssignment.objects.create(guide=self.guide, client=self.user)
+        ClientAssignment.objects.create(guide=self.guide, client=other)
+        ClientAssignment.objects.create(guide=self.guide, client=former, is_active=False)
+        url = reverse('cohort-mood-analytics')
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        guide = APIClient()
+        guide.force_authenticate(self.guide)
+        response = guide.get(url)
+        self.assertEqual((response.data['users'], response.data['entries']), (2, 40))
+        self.assertEqual(guide.get(url, {'client': other.id}).data['users'], 1)
+        self.assertEqual(guide.get(url, {'client': former.id}).status_code, 404)
+
+
+class MoodCohortSummaryTest(TestCase):
+    """Population mood summary streamed into a summary table and served to admins"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', role='admin'
+        )
+        self.today = timezone.now().date()
+        self.monday = cohorts.week_start(self.today)
+        self.members = [
+            User.objects.create_user(
+                email=f'member{i}@example.com', username=f'member{i}', password='pass12345',
+                age=14 + i % 2, gender='female' if i < 6 else '',
+            )
+            for i in range(8)
+        ]
+        for i, member in enumerate(self.members):
+            for day in range(3):
+                for week in range(2):
+                    MoodEntry.objects.create(
+                        user=member, mood_rating=1 + (i + day) % 5, energy_level=3, anxiety_level=2,
+                        sleep_quality=4, date=self.monday - timezone.timedelta(weeks=week, days=-day),
+                    )
+
+    def test_streamed_totals_match_the_entries(self):
+        # A chunk size that splits users across chunks
+        self.assertEqual(cohorts.summarize(chunk_size=4), 4)
+        for row in MoodCohortSummary.objects.all():
+            gender = '' if row.gender == cohorts.UNSPECIFIED_GENDER else row.gender
+            entries = MoodEntry.objects.filter(
+                date__gte=row.week, date__lt=row.week + timezone.timedelta(weeks=1),
+                user__age__in=[13, 14, 15], user__gender=gender,
+            )
+            self.assertEqual(row.age_band, '13-15')
+            self.assertEqual(row.entries, entries.count())
+            self.assertEqual(row.users, entries.values('user').distinct().count())
+            self.assertEqual(row.mood_sum, sum(entries.values_list('mood_rating', flat=True)))
+            self.assertEqual(row.low_mood_entries, entries.filter(mood_rating__lte=2).count())
+
+        # Recomputing recent weeks leaves older ones alone
+        MoodEntry.objects.filter(date__lt=self.monday).delete()
+        self.assertEqual(cohorts.summarize(since=self.today), 2)
+        self.assertEqual(MoodCohortSummary.objects.count(), 4)
+
+    def test_entries_written_during_the_stream_wait_for_the_next_run(self):
+        member = self.members[0]
+
+        class WrittenAfterTheBounds(cohorts.CohortTotals):
+            def __init__(self, *args):
+                super().__init__(*args)
+                MoodEntry.objects.create(
+                    user=member, mood_rating=3, energy_level=3, anxiety_level=3, sleep_quality=3,
+                    date=self.first_week + timezone.timedelta(weeks=self.shape[0]),
+                )
+
+        with patch.object(cohorts, 'CohortTotals', WrittenAfterTheBounds):
+            self.assertEqual(cohorts.summarize(), 4)
+        self.assertEqual(cohorts.summarize(), 5)
+
+    def test_admin_endpoint(self):
+        call_command('summarize_mood_cohorts', stdout=StringIO())
+        url = reverse('admin-mood-cohorts')
+        client = APIClient()
+        client.force_authenticate(self.members[0])
+        self.assertEqual(client.get(url).status_code, 403)
+
+        client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            response = client.get(url, {'weeks': 1})
+        rows = {row['gender']: row for row in response.data['results']}
+        self.assertEqual(set(rows), {'female', cohorts.UNSPECIFIED_GENDER})
+        self.assertEqual(rows['female']['users'], 6)
+        self.assertIsNotNone(rows['female']['average_mood'])
+        # Two users are too few to report
+        self.assertTrue(rows[cohorts.UNSPECIFIED_GENDER]['suppressed'])
+        self.assertIsNone(rows[cohorts.UNSPECIFIED_GENDER]['average_mood'])
+        self.assertEqual(len(client.get(url, {'gender': 'female'}).data['results']), 2)
+
+
+class StreakTest(TestCase):
+    """Points awards are single statements and streaks can be rederived from activity dates"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='member@example.com', username='member', password='pass12345'
+        )
+        self.today = timezone.now().date()
+
+    def day(self, offset):
+        return self.today + timezone.timedelta(days=offset)
+
+    def points(self):
+        return UserPoints.objects.get(user=self.user)
+
+    def test_award(self):
+        streaks.award(self.user.id, 60, self.day(-3))
+        with self.assertNumQueries(1):
+            streaks.award(self.user.id, 60, self.day(-2))
+        for offset in (-1, -1, 0):
+            streaks.award(self.user.id, 60, self.day(offset))
+        points = self.points()
+        self.assertEqual((points.total_points, points.current_streak, points.longest_streak), (300, 4, 4))
+        self.assertEqual((points.level, points.points_to_next_level), (4, 400))
+        self.assertEqual(points.active_streak(self.day(1)), 4)
+        self.assertEqual(points.active_streak(self.day(2)), 0)
+
+        streaks.award(self.user.id, 5, self.day(2))
+        points = self.points()
+        self.assertEqual((points.current_streak, points.longest_streak, points.last_activity_date), (1, 4, self.day(2)))
+
+    def test_stale_instances_do_not_lose_points(self):
+        first, second = UserPoints.objects.create(user=self.user), UserPoints.objects.get(user=self.user)
+        first.add_points(70)
+        second.add_points(50)
+        self.assertEqual((second.total_points, second.level, second.current_streak), (120, 2, 1))
+
+    def test_closed_form_level_matches_the_old_progression(self):
+        level, threshold = 1, 100
+        for total in range(1000):
+            while total >= threshold:
+                level += 1
+                threshold = level * 100
+            self.assertEqual(streaks.level_for(total), (level, threshold))
+
+    def test_recompute_from_activity_dates(self):
+        challenge = DailyChallenge.objects.create(
+            title='Breathe', description='Breathe', challenge_type='breathing', instructions='Slowly',
+        )
+        mood_days = [-20, -19, -18, -17, -10, -2, -1]
+        for offset in mood_days:
+            MoodEntry.objects.create(
+                user=self.user, mood_rating=3, energy_level=3, anxiety_level=2, sleep_quality=4,
+                date=self.day(offset),
+            )
+        # Completions fill the gap before yesterday and repeat a mood day
+        for offset in (-4, -3, -1):
+            UserChallengeCompletion.objects.create(
+                user=self.user, challenge=challenge, points_earned=5, completion_date=self.day(offset),
+            )
+        other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+        UserPoints.objects.create(user=self.user, total_points=250, current_streak=9, longest_streak=9)
+        UserPoints.objects.create(user=other, current_streak=3, longest_streak=3, last_activity_date=self.today)
+
+        out = StringIO()
+        call_command('recompute_streaks', '--batch-size', '1', stdout=out)
+        self.assertIn('Recomputed 2 streaks', out.getvalue())
+        points = self.points()
+        self.assertEqual((points.current_streak, points.longest_streak), (4, 4))
+        self.assertEqual((points.last_activity_date, points.level, points.points_to_next_level), (self.day(-1), 3, 300))
+        self.assertEqual(points.active_streak(self.today), 4)
+        other_points = UserPoints.objects.get(user=other)
+        self.assertEqual((other_points.current_streak, other_points.last_activity_date), (0, None))
 
-# Create your tests here.
+    def test_run_lengths(self):
+        users = np.array([1, 1, 1, 1, 2, 2, 3])
+        days = np.array([5, 6, 8, 9, 9, 10, 1])
+        user, current, longest, last_day = streaks.user_streaks(users, days)
+        self.assertEqual(user.tolist(), [1, 2, 3])
+        self.assertEqual(current.tolist(), [2, 2, 1])
+        self.assertEqual(longest.tolist(), [2, 2, 1])
+        self.assertEqual(last_day.tolist(), [9, 10, 1])
@@ -5,7 +5,8 @@ from .views import (
     AchievementListView, UserAchievementListView, WellnessTipListView,
     DailyWellnessTipView, MarkTipHelpfulView, AdminDailyChallengeView,
     AdminDailyChallengeDetailView, AdminAchievementView, AdminAchievementDetailView,
-    AdminWellnessTipView, AdminWellnessTipDetailView, WellnessStatsView
+    AdminWellnessTipView, AdminWellnessTipDetailView, WellnessStatsView,
+    MoodAnalyticsView, CohortMoodAnalyticsView, AdminMoodCohortView
 )
 
 urlpatterns = [
@@ -17,6 +18,8 @@ urlpatterns = [
     path('mood-entries/', MoodEntryListView.as_view(), name='mood-entries'),
     path('mood-entries/<int:pk>/', MoodEntryDetailView.as_view(), name='mood-entry-detail'),
     path('mood-stats/', MoodStatsView.as_view(), name='mood-stats'),
+    path('mood-analytics/', MoodAnalyticsView.as_view(), name='mood-analytics'),
+    path('mood-analytics/cohort/', CohortMoodAnalyticsView.as_view(), name='cohort-mood-analytics'),
     
     # Daily challenges endpoints
     path('challenges/', DailyChallengeListView.as_view(), name='daily-challenges'),
@@ -39,4 +42,5 @@ urlpatterns = [
     path('admin/achievements/<int:pk>/', AdminAchievementDetailView.as_view(), name='admin-achievement-detail'),
     path('admin/tips/', AdminWellnessTipView.as_view(), name='admin-wellness-tips'),
     path('admin/tips/<int:pk>/', AdminWellnessTipDetailView.as_view(), name='admin-wellness-tip-detail'),
+    path('admin/mood-cohorts/', AdminMoodCohortView.as_view(), name='admin-mood-cohorts'),
 ]
@@ -3,22 +3,29 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Avg, Count, Q
+from django.db.models import Q
 from datetime import datetime, timedelta
 import random
+from accounts.permissions import Capability, IsGuide, IsPlatformAdmin, require
+from guide.models import ClientAssignment
+from . import analytics, cohorts, dashboard, rollups, streaks
 from .models import (
-    MoodEntry, Achievement, UserAchievement, UserPoints,
+    MoodCohortSummary, MoodEntry, Achievement, UserAchievement, UserPoints,
     DailyChallenge, UserChallengeCompletion, WellnessTip, UserWellnessTip
 )
 from .serializers import (
     MoodEntrySerializer, CreateMoodEntrySerializer, AchievementSerializer,
-    UserAchievementSerializer, UserPointsSerializer, DailyChallengeSerializer,
+    UserAchievementSerializer, DailyChallengeSerializer,
     UserChallengeCompletionSerializer, CompleteChallengeSerializer,
     WellnessTipSerializer, UserWellnessTipSerializer, MoodStatsSerializer,
     WellnessStatsSerializer
 )
 
+CanViewAdminStats = require(Capability.VIEW_ADMIN_STATS, "Admin access required")
+
 # COMPREHENSIVE WELLNESS API ENDPOINTS
 
 class WellnessCenterView(APIView):
@@ -26,42 +33,14 @@ class WellnessCenterView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        # Get or create user points
-        user_points, created = UserPoints.objects.get_or_create(user=user)
-        
-        # Get recent mood entries
-        recent_moods = MoodEntry.objects.filter(user=user).order_by('-date')[:7]
-        
-        # Get today's challenges
-        today = timezone.now().date()
-        todays_challenges = DailyChallenge.objects.filter(is_active=True)
-        completed_today = UserChallengeCompletion.objects.filter(
-            user=user,
-            completion_date=today
-        ).values_list('challenge_id', flat=True)
-        
-        # Get recent achievements
-        recent_achievements = UserAchievement.objects.filter(user=user).order_by('-earned_at')[:5]
-        
-        return Response({
-            'user_points': UserPointsSerializer(user_points).data,
-            'recent_moods': MoodEntrySerializer(recent_moods, many=True).data,
-            'todays_challenges': DailyChallengeSerializer(todays_challenges, many=True, context={'request': request}).data,
-            'recent_achievements': UserAchievementSerializer(recent_achievements, many=True).data,
-            'stats': {
-                'total_mood_entries': MoodEntry.objects.filter(user=user).count(),
-                'challenges_completed_today': len(completed_today),
-                'total_achievements': UserAchievement.objects.filter(user=user).count(),
-            }
-        })
+        return Response(dashboard.get_dashboard(request.user.id))
 
 # MOOD TRACKING ENDPOINTS
 
 class MoodEntryListView(generics.ListCreateAPIView):
     """List and create mood entries"""
     permission_classes = [IsAuthenticated]
+    keyset_ordering = '-date'
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -75,8 +54,7 @@ class MoodEntryListView(generics.ListCreateAPIView):
         mood_entry = serializer.save(user=self.request.user)
         
         # Award points for mood tracking
-        user_points, created = UserPoints.objects.get_or_create(user=self.request.user)
-        user_points.add_points(5, "mood_tracking")
+        streaks.award(self.request.user.id, 5)
         
         return Response({
             'message': 'Mood entry saved successfully',
@@ -92,57 +70,116 @@ class MoodEntryDetailView(generics.RetrieveUpdateDestroyAPIView):
         return MoodEntry.objects.filter(user=self.request.user)
 
 class MoodStatsView(APIView):
-    """Get mood statistics and trends"""
+    """
+    Mood averages and trend over the last ``days`` days, read from the
+    user's mood rollups. The totals and averages come from the daily
+    rollups of exactly that window. ``period`` (``day``, ``week`` or
+    ``month``) sets the trend resolution; the trend is returned as
+    parallel arrays.
+    """
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         user = request.user
-        days = int(request.query_params.get('days', 30))
-        
-        # Get mood entries for the specified period
-        start_date = timezone.now().date() - timedelta(days=days)
-        mood_entries = MoodEntry.objects.filter(
-            user=user,
-            date__gte=start_date
-        ).order_by('date')
-        
-        if not mood_entries.exists():
+        try:
+            days = max(1, int(request.query_params.get('days', 30)))
+        except ValueError:
+            return Response({'error': 'days must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        period = request.query_params.get('period', 'day')
+        if period not in rollups.PERIODS:
+            return Response(
+                {'error': f"period must be one of {', '.join(rollups.PERIODS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days)
+        daily = rollups.load_series(user.id, start_date, end_date)
+        totals = daily.totals()
+        if not totals['count']:
             return Response({
                 'message': 'No mood entries found for this period',
                 'stats': None
             })
-        
-        # Calculate statistics
-        stats = mood_entries.aggregate(
-            average_mood=Avg('mood_rating'),
-            average_energy=Avg('energy_level'),
-            average_anxiety=Avg('anxiety_level'),
-            average_sleep=Avg('sleep_quality')
-        )
-        
-        # Calculate streak
+
+        averages = daily.averages()
+        # Coarser periods start before the window, so they only shape the trend
+        series = daily if period == 'day' else rollups.load_series(user.id, start_date, end_date, period)
         user_points = UserPoints.objects.filter(user=user).first()
-        current_streak = user_points.current_streak if user_points else 0
-        
-        # Prepare mood trend data
-        mood_trend = []
-        for entry in mood_entries:
-            mood_trend.append({
-                'date': entry.date.isoformat(),
-                'mood': entry.mood_rating,
-                'energy': entry.energy_level,
-                'anxiety': entry.anxiety_level,
-                'sleep': entry.sleep_quality
-            })
         
         return Response({
-            'average_mood': round(stats['average_mood'], 2) if stats['average_mood'] else 0,
-            'average_energy': round(stats['average_energy'], 2) if stats['average_energy'] else 0,
-            'average_anxiety': round(stats['average_anxiety'], 2) if stats['average_anxiety'] else 0,
-            'average_sleep': round(stats['average_sleep'], 2) if stats['average_sleep'] else 0,
-            'total_entries': mood_entries.count(),
-            'current_streak': current_streak,
-            'mood_trend': mood_trend
+            'average_mood': averages['mood'],
+            'average_energy': averages['energy'],
+            'average_anxiety': averages['anxiety'],
+            'average_sleep': averages['sleep'],
+            'total_entries': totals['count'],
+            'current_streak': user_points.active_streak(end_date) if user_points else 0,
+            'period': period,
+            'mood_trend': series.trend(),
+        })
+
+def _bounded_param(params, name, default, minimum, maximum):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(minimum, min(value, maximum))
+
+
+class MoodAnalyticsView(APIView):
+    """
+    Rolling means, correlations, activity/trigger effects and anomalous
+    days of the user's own mood entries over the last ``days`` days
+    """
+    permission_classes = [IsAuthenticated]
+    max_days = 730
+
+    def get_user_ids(self, request):
+        return [request.user.id]
+
+    def get(self, request):
+        user_ids = self.get_user_ids(request)
+        days = _bounded_param(request.query_params, 'days', 90, 1, self.max_days)
+        window = _bounded_param(request.query_params, 'window', analytics.DEFAULT_WINDOW, 1, 90)
+        end_date = timezone.now().date()
+        return Response(analytics.analyze(user_ids, end_date - timedelta(days=days - 1), end_date, window))
+
+
+class CohortMoodAnalyticsView(MoodAnalyticsView):
+    """
+    Mood analytics across the guide's active clients, or one of them with
+    ``?client=<id>``
+    """
+    permission_classes = [IsAuthenticated, IsGuide]
+
+    def get_user_ids(self, request):
+        clients = ClientAssignment.objects.filter(guide=request.user, is_active=True)
+        client = request.query_params.get('client')
+        if client is not None:
+            if not client.isdigit():
+                raise Http404
+            return [get_object_or_404(clients, client_id=client).client_id]
+        return list(clients.values_list('client_id', flat=True))
+
+class AdminMoodCohortView(APIView):
+    """
+    Weekly mood by age band and gender over the last ``weeks`` weeks,
+    read from the summary kept by ``summarize_mood_cohorts``. Filter with
+    ``age_band`` and ``gender``.
+    """
+    permission_classes = [IsAuthenticated, CanViewAdminStats]
+
+    def get(self, request):
+        weeks = _bounded_param(request.query_params, 'weeks', 12, 1, 104)
+        since = cohorts.week_start(timezone.now().date()) - timedelta(weeks=weeks - 1)
+        rows = MoodCohortSummary.objects.filter(week__gte=since)
+        for field in ('age_band', 'gender'):
+            if request.query_params.get(field):
+                rows = rows.filter(**{field: request.query_params[field]})
+        rows = list(rows)
+        return Response({
+            'computed_at': max((row.computed_at for row in rows), default=None),
+            'results': [cohorts.serialize(row) for row in rows],
         })
 
 # DAILY CHALLENGES ENDPOINTS
@@ -155,6 +192,11 @@ class DailyChallengeListView(generics.ListAPIView):
     def get_queryset(self):
         return DailyChallenge.objects.filter(is_active=True)
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['completed_today'] = dashboard.completed_today(self.request.user.id, timezone.now().date())
+        return context
+
 class CompleteChallengeView(APIView):
     """Complete a daily challenge"""
     permission_classes = [IsAuthenticated]
@@ -190,8 +232,7 @@ class CompleteChallengeView(APIView):
                 completion = serializer.save(user=user, points_earned=challenge.points_reward)
                 
                 # Award points
-                user_points, created = UserPoints.objects.get_or_create(user=user)
-                user_points.add_points(challenge.points_reward, "challenge_completion")
+                streaks.award(user.id, challenge.points_reward, today)
                 
                 return Response({
                     'message': 'Challenge completed successfully',
@@ -297,77 +338,38 @@ class MarkTipHelpfulView(APIView):
 class AdminDailyChallengeView(generics.ListCreateAPIView):
     """Admin can manage daily challenges"""
     serializer_class = DailyChallengeSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return DailyChallenge.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = DailyChallenge.objects.all()
 
 class AdminDailyChallengeDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete daily challenges"""
     serializer_class = DailyChallengeSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return DailyChallenge.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = DailyChallenge.objects.all()
 
 class AdminAchievementView(generics.ListCreateAPIView):
     """Admin can manage achievements"""
     serializer_class = AchievementSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return Achievement.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = Achievement.objects.all()
 
 class AdminAchievementDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete achievements"""
     serializer_class = AchievementSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return Achievement.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = Achievement.objects.all()
 
 class AdminWellnessTipView(generics.ListCreateAPIView):
     """Admin can manage wellness tips"""
     serializer_class = WellnessTipSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return WellnessTip.objects.all()
-    
-    def perform_create(self, serializer):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        serializer.save()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = WellnessTip.objects.all()
 
 class AdminWellnessTipDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Admin can update/delete wellness tips"""
     serializer_class = WellnessTipSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        if self.request.user.role != 'admin':
-            raise permissions.PermissionDenied("Admin access required")
-        return WellnessTip.objects.all()
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+    queryset = WellnessTip.objects.all()
 
 # STATISTICS AND DASHBOARD ENDPOINTS
 
@@ -376,29 +378,16 @@ class WellnessStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        
-        # Get user points
-        user_points = UserPoints.objects.filter(user=user).first()
-        
-        # Get counts
-        total_achievements = UserAchievement.objects.filter(user=user).count()
-        today = timezone.now().date()
-        challenges_completed_today = UserChallengeCompletion.objects.filter(
-            user=user,
-            completion_date=today
-        ).count()
-        challenges_completed_total = UserChallengeCompletion.objects.filter(user=user).count()
-        mood_entries_count = MoodEntry.objects.filter(user=user).count()
+        user_points, totals = dashboard.load_summary(request.user.id)
         
         stats = {
-            'total_points': user_points.total_points if user_points else 0,
-            'current_level': user_points.level if user_points else 1,
-            'achievements_count': total_achievements,
-            'challenges_completed_today': challenges_completed_today,
-            'challenges_completed_total': challenges_completed_total,
-            'current_streak': user_points.current_streak if user_points else 0,
-            'mood_entries_count': mood_entries_count,
+            'total_points': user_points.total_points,
+            'current_level': user_points.level,
+            'achievements_count': totals['achievements_count'],
+            'challenges_completed_today': totals['challenges_completed_today'],
+            'challenges_completed_total': totals['challenges_completed_total'],
+            'current_streak': user_points.active_streak(),
+            'mood_entries_count': totals['mood_entries_count'],
         }
         
         return Response(stats)